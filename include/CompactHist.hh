@@ -0,0 +1,49 @@
+// -*- c++ -*-
+#ifndef COMPACT_HIST_HH
+#define COMPACT_HIST_HH
+
+// Histogram that's cheap to keep in memory while filling. Most of the
+// bins in the big 2d histograms stay empty, so bins are kept in a map
+// until enough are filled to make a dense array smaller. The dense array
+// holds 32 bit counts as long as every fill has unit weight, and is
+// switched to doubles otherwise. Written out as a normal ndhist
+// Histogram, so the output file is the same.
+
+#include "Histogram.hh"
+
+#include <vector>
+#include <string>
+#include <unordered_map>
+#include <cstdint>
+#include <cstddef>		// size_t
+
+namespace H5 {
+  class CommonFG;
+}
+
+class CompactHist {
+public:
+  CompactHist(const std::vector<Axis>& axes, unsigned flags = 0);
+  CompactHist(int n_bins, double low, double high,
+	      std::string units = "", unsigned flags = 0);
+  CompactHist(CompactHist&) = delete;
+  CompactHist& operator=(CompactHist&) = delete;
+  void fill(double value, double weight = 1.0);
+  void fill(const std::vector<double>& values, double weight = 1.0);
+  void add(const CompactHist&);
+  void writeTo(H5::CommonFG&, const std::string& name) const;
+private:
+  size_t axisBin(size_t axis, double value) const;
+  void addToBin(size_t bin, double weight);
+  void makeDense();
+  std::vector<double> binCenters(size_t bin) const;
+  std::vector<Axis> m_axes;
+  unsigned m_flags;
+  size_t m_n_bins;
+  bool m_dense;
+  std::unordered_map<size_t, double> m_sparse;
+  std::vector<uint32_t> m_counts;
+  std::vector<double> m_weights;
+};
+
+#endif
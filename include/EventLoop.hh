@@ -0,0 +1,42 @@
+// -*- c++ -*-
+#ifndef EVENT_LOOP_HH
+#define EVENT_LOOP_HH
+
+#include <vector>
+#include <functional>
+
+// half-open range of entries [begin, end)
+struct EntryRange {
+  int begin;
+  int end;
+};
+
+// split n_entries into n_parts contiguous ranges (the first ones get the
+// remainder)
+std::vector<EntryRange> splitEntries(int n_entries, int n_parts);
+// same thing for the entries in a range
+std::vector<EntryRange> splitEntries(EntryRange range, int n_parts);
+
+// which entries of the chain to run over: n_entries starting from
+// first_entry (all of them if n_entries < 0), and of those only shard
+// number `shard` out of `n_shards`. The shards are split as in
+// splitEntries, so they never overlap and together cover the window.
+struct EntrySelection {
+  EntrySelection();
+  int first_entry;
+  int n_entries;
+  int shard;
+  int n_shards;
+};
+
+// range picked by the selection, from a chain with n_total entries
+EntryRange selectEntries(int n_total, const EntrySelection&);
+
+// has to be called before ROOT is used from more than one thread
+void enableRootThreads();
+
+// run each job in its own thread (the first one in the calling thread),
+// wait for all of them, and rethrow the first exception thrown
+void runThreads(const std::vector<std::function<void()> >& jobs);
+
+#endif
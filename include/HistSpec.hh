@@ -0,0 +1,28 @@
+// -*- c++ -*-
+#ifndef HIST_SPEC_HH
+#define HIST_SPEC_HH
+
+#include <vector>
+#include <string>
+
+// Which histograms to fill. The default is everything. A spec file can
+// replace any of the lists, one line per key, e.g.
+//
+//   btag: [mv1, gaiaAntiU]
+//   ctag: [gaia]
+//   pt_bins: [0, 20, 50, 100, inf]
+//
+// (lists can also be given with one '- item' per line, as in YAML).
+struct HistSpec {
+  HistSpec();
+  // 1d discriminants, filled inclusively and in each pt bin
+  std::vector<std::string> btag;
+  // ctag histograms (mostly 2d)
+  std::vector<std::string> ctag;
+  // pt bin edges in GeV
+  std::vector<double> pt_bins;
+};
+
+HistSpec readHistSpec(const std::string& file_name);
+
+#endif
@@ -1,14 +1,19 @@
 #ifndef JET_PERF_HISTS_HH
 #define JET_PERF_HISTS_HH
 
-class Histogram;
+class CompactHist;
 class Jet;
 namespace H5 {
   class CommonFG;
 }
 
+#include "HistSpec.hh"
+
 #include <vector>
 #include <map>
+#include <set>
+#include <string>
+#include <memory>
 #include <cstddef>		// size_t
 
 namespace hist {
@@ -18,51 +23,49 @@ namespace hist {
   const double GAIA_HIGH = 10.0;
 }
 
+// A histogram and what it's filled with. The known ones (and the inputs
+// they need) are registered in JetPerfHists.cxx.
+struct FilledHist {
+  typedef double (*Value)(const Jet&);
+  FilledHist(const std::string& name, CompactHist* hist,
+	     Value x, Value y = 0);
+  std::string name;
+  std::unique_ptr<CompactHist> hist;
+  Value x;
+  Value y;			// zero for 1d histograms
+};
+
 class BtagHists {
 public:
-  BtagHists();
-  ~BtagHists();
+  BtagHists(const std::vector<std::string>& names);
   BtagHists(BtagHists&) = delete;
+  BtagHists(BtagHists&&) = default;
   BtagHists& operator=(BtagHists&) = delete;
   void fill(const Jet&, double weight);
+  void add(const BtagHists&);
   void writeTo(H5::CommonFG&);
 private:
-  Histogram* m_mv1;
-  Histogram* m_mv1c;
-  Histogram* m_mvb;
-  Histogram* m_gaia_anti_light;
-  Histogram* m_gaia_anti_charm;
-  Histogram* m_gaia_gr1;
-  Histogram* m_mv2c00;
-  Histogram* m_mv2c10;
-  Histogram* m_mv2c20;
-  Histogram* m_jfc_anti_light;
-  Histogram* m_jfc_anti_charm;
-  Histogram* m_jfit_anti_light;
-  Histogram* m_jfit_anti_charm;
+  std::vector<FilledHist> m_hists;
 };
 
 class CtagHists {
 public:
-  CtagHists();
-  ~CtagHists();
+  CtagHists(const std::vector<std::string>& names);
   CtagHists(CtagHists&) = delete;
+  CtagHists(CtagHists&&) = default;
   CtagHists& operator=(CtagHists&) = delete;
   void fill(const Jet&, double weight);
+  void add(const CtagHists&);
   void writeTo(H5::CommonFG&);
 private:
-  Histogram* m_gaia;
-  Histogram* m_jfc;
-  Histogram* m_jfit;
-  Histogram* m_gaia_c;
-  Histogram* m_fabtag;
-  Histogram* m_gaia_btag;
+  std::vector<FilledHist> m_hists;
 };
 
 class FlavoredHists {
 public:
-  FlavoredHists(unsigned flags = 0);
+  FlavoredHists(const HistSpec& spec);
   void fill(const Jet&, double weight);
+  void add(const FlavoredHists&);
   void writeTo(H5::CommonFG&);
 private:
   BtagHists m_btag;
@@ -73,14 +76,19 @@ private:
 
 class JetPerfHists {
 public:
-  JetPerfHists(unsigned flags = 0);
+  JetPerfHists(const HistSpec& spec, unsigned flags = 0);
   ~JetPerfHists();
   JetPerfHists(JetPerfHists&) = delete;
   JetPerfHists& operator=(JetPerfHists&) = delete;
   void fill(const Jet&, double weight);
+  void add(const JetPerfHists&);
   void writeTo(H5::CommonFG&);
 private:
   std::vector<FlavoredHists> m_flavors;
 };
 
+// tagger inputs (i.e. "mv1", "gaia") needed to fill the histograms in
+// spec, throws std::invalid_argument if there's no histogram by some name
+std::set<std::string> requiredInputs(const HistSpec& spec);
+
 #endif
@@ -28,6 +28,7 @@ namespace peter {
     PtEfficiency(PtEfficiency&) = delete;
     PtEfficiency& operator=(PtEfficiency&) = delete;
     void fill(float pt, const TagTriple&, double weight);
+    void add(const PtEfficiency&);
     void writeTo(H5::CommonFG&);
   private:
     Histogram* m_pass;
@@ -43,6 +44,7 @@ namespace peter {
     Hists(Hists&) = delete;
     Hists& operator=(Hists&) = delete;
     void fill(const Jet&, double weight);
+    void add(const Hists&);
     void writeTo(H5::CommonFG&);
   private:
     PtEfficiency m_jfc_efficiency;
@@ -57,6 +59,7 @@ namespace peter {
     FlavoredHists(FlavoredHists&) = delete;
     FlavoredHists& operator=(FlavoredHists&) = delete;
     void fill(const Jet&, double weight);
+    void add(const FlavoredHists&);
     void writeTo(H5::CommonFG&);
   private:
     std::vector<Hists> m_flavors;
@@ -24,6 +24,8 @@ public:
   int size();
   int entry() const;
   void saveSetBranches(const std::string& file_name);
+  long long bytesRead() const;
+  long long readCalls() const;
   int n_jets;
   double jet_pt[MAX_JETS];
   double jet_eta[MAX_JETS];
@@ -1,3 +1,5 @@
+#include "EventLoop.hh"
+
 #include <vector>
 #include <string>
 #include <cstring>
@@ -6,6 +8,9 @@ struct RunConfig {
   RunConfig(int narg, char* argv[]);
   std::string out_name;
   unsigned flags;
+  int n_threads;
+  std::string hist_spec;
+  EntrySelection entries;
   std::vector<std::string> files;
 };
 
@@ -7,6 +7,13 @@
 #include <set>
 #include <stdexcept>
 
+namespace chain {
+  // read-ahead cache, the branches read in the first few entries are
+  // the ones that get cached
+  const long long CACHE_SIZE = 30*1024*1024;
+  const int CACHE_LEARN_ENTRIES = 10;
+}
+
 class SmartChain: public TChain {
 public:
   using TChain::Add;
@@ -15,6 +22,10 @@ public:
   template<typename T, typename Z>
   void SetBranch(T name, Z branch);
   std::vector<std::string> get_all_branch_names() const;
+  virtual Long64_t LoadTree(Long64_t entry);
+  // I/O counters, summed over all the files read so far
+  long long bytes_read() const;
+  long long read_calls() const;
 private:
   typedef std::vector<std::string> Strings;
   void SetBranchAddressPrivate(std::string name, void* branch);
@@ -25,6 +36,8 @@ private:
   Strings m_set_branches;
   std::set<std::string> m_set_branch_set;
   Strings m_files;
+  long long m_closed_bytes;
+  long long m_closed_calls;
 };
 
 class MissingBranchError: public std::runtime_error
@@ -6,8 +6,10 @@ class SmartChain;
 
 #include <vector>
 #include <string>
+#include <set>
 
 struct TagVectors {
+  TagVectors();
   void set(SmartChain* chain, std::string prefix);
   std::vector<float>* pu;
   std::vector<float>* pc;
@@ -16,12 +18,17 @@ struct TagVectors {
 
 class TreeBuffer {
 public:
-  TreeBuffer(const std::vector<std::string>& files);
+  // only the branches for the taggers in 'inputs' (i.e. "mv1", "gaia",
+  // see requiredInputs) are read, the others are left as null pointers
+  TreeBuffer(const std::vector<std::string>& files,
+	     const std::set<std::string>& inputs);
   ~TreeBuffer();
   void getEntry(int);
   int size();
   int entry() const;
   void saveSetBranches(const std::string& file_name);
+  long long bytesRead() const;
+  long long readCalls() const;
   std::vector<float>*  jet_pt;
   std::vector<float>*  jet_eta;
   std::vector<float>*  jet_MV1;
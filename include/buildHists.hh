@@ -1,10 +1,15 @@
 #ifndef BUILD_HISTS_HH
 #define BUILD_HISTS_HH
 
+#include "HistSpec.hh"
+#include "EventLoop.hh"
+
 #include <vector>
 #include <string>
 
 int buildHists(std::vector<std::string> files, std::string out,
-	       unsigned flags = 0);
+	       unsigned flags = 0, int n_threads = 1,
+	       const HistSpec& spec = HistSpec(),
+	       const EntrySelection& entries = EntrySelection());
 
 #endif
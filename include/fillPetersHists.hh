@@ -1,10 +1,13 @@
 #ifndef FILL_PETERS_HH
 #define FILL_PETERS_HH
 
+#include "EventLoop.hh"
+
 #include <vector>
 #include <string>
 
 int fillPetersHists(std::vector<std::string> files, std::string out,
-		    unsigned flags = 0);
+		    unsigned flags = 0, int n_threads = 1,
+		    const EntrySelection& entries = EntrySelection());
 
 #endif
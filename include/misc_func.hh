@@ -5,5 +5,6 @@
 
 bool exists(const std::string& file_name);
 std::string red(const std::string& string);
+void printIoStats(long long bytes, long long calls, int n_events);
 
 #endif
@@ -0,0 +1,24 @@
+// -*- c++ -*-
+#ifndef WRITE_CHUNKED_HH
+#define WRITE_CHUNKED_HH
+
+class Histogram;
+namespace H5 {
+  class CommonFG;
+}
+
+#include <string>
+
+namespace chunk {
+  // about 512 kB of doubles per chunk, fits in the default chunk cache
+  const unsigned long long ELEMENTS = 1 << 16;
+  const int DEFLATE = 7;
+}
+
+// Write a histogram as ndhist would (same dataset and attributes) but
+// chunked, shuffled, and compressed, so that it's small on disk and
+// parts of it can be read without reading the rest.
+void writeChunked(const Histogram& hist, H5::CommonFG& fg,
+		  const std::string& name);
+
+#endif
@@ -0,0 +1,25 @@
+// -*- c++ -*-
+#ifndef WRITE_RUN_INFO_HH
+#define WRITE_RUN_INFO_HH
+
+#include "EventLoop.hh"
+
+#include <vector>
+#include <string>
+
+namespace H5 {
+  class H5File;
+}
+
+// Save what went into an output file as attributes of its root group:
+//  - input_files: the files in the chain, in order
+//  - chain_entries: number of entries in the chain
+//  - entry_ranges: [begin, end) of the entries that were read, as a
+//    (1, 2) array (merged files list one row per input)
+//  - shard, n_shards: from the --shard option
+// With these, outputs from several shards can be checked before they're
+// added together (see tagperf merge).
+void writeRunInfo(H5::H5File& file, const std::vector<std::string>& files,
+		  int n_total, EntryRange range, const EntrySelection& sel);
+
+#endif
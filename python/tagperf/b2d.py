@@ -3,28 +3,42 @@ import numpy as np
 from os.path import isdir
 import os
 
-from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
-from matplotlib.figure import Figure
-
 from tagperf.ctaging import add_contour, label_rejrej_axes
-from tagperf.ctaging import RejRejComp
+from tagperf.ctaging import RejRejComp, build_cached
+from tagperf import rejcache
+from tagperf.rejcache import RejRejCache
+from tagperf.jobs import Task, FileTask, run_stages
 
 _fig_edge = 5.0
 _fig_size = (_fig_edge, _fig_edge * 3/4)
 
-def make_b2d(in_file_name, cache_name, out_dir, ext):
+def make_b2d(in_file_name, cache_name, out_dir, ext, cache_size=None):
     """
     Top level routine to make plots from tagger output distributions
     """
-    with h5py.File(in_file_name, 'r') as in_file:
-        with h5py.File(cache_name, 'a') as out_file:
-            _make_rejrej_btag(in_file, out_file)
-
     if not isdir(out_dir):
         os.mkdir(out_dir)
+    run_stages(plot_stages(in_file_name, cache_name, out_dir, ext,
+                           cache_size=cache_size))
+
+def plot_stages(in_file_name, cache_name, out_dir, ext, cache_size=None):
+    """
+    The work done by make_b2d, as stages of tasks (see tagperf.jobs).
+    """
+    return [
+        [Task('btag rejrej', build_rejrej_btag, in_file_name, cache_name)],
+        [FileTask('rejrej-btag', cache_name, _draw_btag_rejrej,
+                  out_dir, ext)],
+        [Task('btag cache trim', rejcache.trim, cache_name, cache_size)],
+        ]
 
-    with h5py.File(cache_name, 'r') as cache:
-        _draw_btag_rejrej(cache, out_dir, ext)
+def build_rejrej_btag(in_file_name, cache_name):
+    """
+    Fill the cache with the gaiaBtag rejrej arrays.
+    """
+    with h5py.File(in_file_name, 'r') as in_file:
+        with h5py.File(cache_name, 'a') as out_file:
+            _make_rejrej_btag(in_file, out_file)
 
 def _make_rejrej_btag(in_file, out_file, binning='all', tagger='gaiaBtag'):
     """
@@ -37,15 +51,9 @@ def _make_rejrej_btag(in_file, out_file, binning='all', tagger='gaiaBtag'):
         except KeyError as err:
             raise KeyError(err.args[0] + ' -- looking for ' + lookup_str)
 
-    if not tagger in out_file:
-        out_file.create_group(tagger)
-    if binning in out_file[tagger]:
-        print('using cached tagger {}, binning {}'.format(tagger, binning))
-        return
-
     rej_builder = RejRejComp('CUB', 25, 1500)
-    rej_builder.calculate(get_flavor)
-    rej_builder.save(out_file, tagger, binning)
+    build_cached(rej_builder, get_flavor, RejRejCache(out_file),
+                 tagger, binning)
 
 
 def _get_hist_name_btag(flavor, tagger, binning):
@@ -57,6 +65,8 @@ def _draw_btag_rejrej(in_file, out_dir, ext='.pdf', tagger='gaiaBtag',
     """
     Draw iso-efficiency contours for one tagger (no colors).
     """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
+    from matplotlib.figure import Figure
     fig = Figure(figsize=_fig_size)
     canvas = FigureCanvas(fig)
     ax = fig.add_subplot(1,1,1)
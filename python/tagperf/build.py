@@ -0,0 +1,264 @@
+"""
+Incremental rebuilds: skip plotting tasks whose outputs are up to date.
+
+While a task runs, the HDF5 datasets and groups it reads, the tagger
+colors it looks up, and the figures it prints are recorded. These go into
+a manifest (a json file in the output directory) along with the task's
+parameters, the settings that change the numbers, and a fingerprint of
+the code it runs. On the next run a task is skipped if its outputs are
+still there and nothing it depends on has changed. Tasks that don't print
+any figures (i.e. building caches) always run, they have their own
+bookkeeping.
+"""
+import hashlib
+import inspect
+import json
+import os
+import sys
+import types
+
+import h5py
+
+from tagperf import rejcache, curves, integral, tagschema
+
+MANIFEST_NAME = '.tagperf-manifest.json'
+
+# __________________________________________________________________________
+# recording what a task does
+
+class Recorder(object):
+    """
+    Context manager that records the HDF5 objects read, the colors looked
+    up, and the figures printed while it's active.
+    """
+    def __init__(self):
+        self.inputs = set()
+        self.colors = set()
+        self.outputs = []
+
+    def __enter__(self):
+        from matplotlib.backend_bases import FigureCanvasBase
+        recorder = self
+        getitem = h5py.Group.__getitem__
+        print_figure = FigureCanvasBase.print_figure
+        get_color = tagschema.ColorScheme.__getitem__
+        def recording_getitem(group, name):
+            obj = getitem(group, name)
+            if isinstance(obj, (h5py.Dataset, h5py.Group)):
+                recorder.inputs.add((obj.file.filename, obj.name))
+            return obj
+        def recording_print_figure(canvas, filename, *args, **kwargs):
+            recorder.outputs.append(os.fspath(filename))
+            return print_figure(canvas, filename, *args, **kwargs)
+        def recording_get_color(scheme, key):
+            recorder.colors.add((scheme.yaml_file, key))
+            return get_color(scheme, key)
+        self._originals = [(h5py.Group, '__getitem__', getitem),
+                           (FigureCanvasBase, 'print_figure', print_figure),
+                           (tagschema.ColorScheme, '__getitem__', get_color)]
+        h5py.Group.__getitem__ = recording_getitem
+        FigureCanvasBase.print_figure = recording_print_figure
+        tagschema.ColorScheme.__getitem__ = recording_get_color
+        return self
+
+    def __exit__(self, ex_type, ex_value, tb):
+        for owner, name, original in self._originals:
+            setattr(owner, name, original)
+
+    def record(self):
+        """
+        What gets stored in the manifest, call after the task has run.
+        """
+        if not self.outputs:
+            return dict(inputs={}, colors={}, outputs={})
+        inputs = {}
+        for file_name, obj_name in sorted(self.inputs):
+            path = os.path.realpath(file_name)
+            inputs.setdefault(path, {})[obj_name] = None
+        for path, objects in inputs.items():
+            with h5py.File(path, 'r') as h5_file:
+                for obj_name in objects:
+                    objects[obj_name] = _object_fingerprint(
+                        h5_file[obj_name])
+        colors = {}
+        for file_name, key in sorted(self.colors):
+            path = os.path.realpath(file_name)
+            colors.setdefault(path, {})[key] = None
+        for path, used in colors.items():
+            saved = _read_colors(path) or {}
+            for key in used:
+                used[key] = saved.get(key)
+        return dict(
+            inputs={path: dict(stat=_stat(path), objects=objects)
+                    for path, objects in inputs.items()},
+            colors=colors,
+            outputs={os.path.realpath(out): _stat(out)
+                     for out in self.outputs})
+
+def run_recorded(task):
+    """
+    Run a task, return the record of what it read and wrote.
+    """
+    with Recorder() as recorder:
+        task()
+    return recorder.record()
+
+# __________________________________________________________________________
+# fingerprints
+
+def _stat(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+def _read_colors(path):
+    """
+    The colors saved in a color file, None if it's not there.
+    """
+    if not os.path.isfile(path):
+        return None
+    with open(path) as color_file:
+        return tagschema._yaml().load(color_file) or {}
+
+def _object_fingerprint(obj):
+    if isinstance(obj, h5py.Dataset):
+        return rejcache.fingerprint([obj], {})
+    return hashlib.sha1(repr(sorted(obj.keys())).encode('utf-8')).hexdigest()
+
+def _describe(value):
+    """
+    repr for task parameters that doesn't change from run to run.
+    """
+    if isinstance(value, (types.FunctionType, type)):
+        return '{}.{}'.format(value.__module__, value.__qualname__)
+    if isinstance(value, dict):
+        return '{' + ', '.join('{}: {}'.format(_describe(k), _describe(v))
+                               for k, v in sorted(value.items())) + '}'
+    if isinstance(value, (list, tuple)):
+        return '[' + ', '.join(_describe(v) for v in value) + ']'
+    return repr(value)
+
+def _tagperf_modules(module, found):
+    """
+    The tagperf modules this one uses, found through its namespace.
+    """
+    if module.__name__ in found:
+        return
+    found[module.__name__] = module
+    for value in vars(module).values():
+        if isinstance(value, types.ModuleType):
+            dep = value
+        else:
+            dep = sys.modules.get(getattr(value, '__module__', None) or '')
+        if dep is not None and dep.__name__.startswith('tagperf.'):
+            _tagperf_modules(dep, found)
+
+def code_fingerprint(function):
+    """
+    Hash of the source of the function's module and the tagperf modules
+    it depends on.
+    """
+    modules = {}
+    _tagperf_modules(sys.modules[function.__module__], modules)
+    hasher = hashlib.sha1()
+    for name in sorted(modules):
+        hasher.update(name.encode('utf-8'))
+        hasher.update(inspect.getsource(modules[name]).encode('utf-8'))
+    return hasher.hexdigest()
+
+def task_key(task):
+    """
+    Parameters, settings, and code of a task, if any of them changes it
+    has to rerun.
+    """
+    params = [task.function, list(getattr(task, 'file_names', [])),
+              list(task.args), task.kwargs, curves.get_tolerance(),
+              integral.is_low_memory()]
+    hasher = hashlib.sha1(_describe(params).encode('utf-8'))
+    hasher.update(code_fingerprint(task.function).encode('utf-8'))
+    return hasher.hexdigest()
+
+# __________________________________________________________________________
+# manifest
+
+class Manifest(object):
+    """
+    Records of the tasks that have run, keyed by family and task name.
+    """
+    def __init__(self, path, force=False):
+        self.path = path
+        self.force = force
+        self.entries = {}
+        if os.path.isfile(path):
+            with open(path) as manifest:
+                self.entries = json.load(manifest)
+        self._checked = {}
+
+    def is_current(self, family, task):
+        """
+        Check if the outputs of a task are up to date.
+        """
+        if self.force:
+            return False
+        entry = self.entries.get(_entry_name(family, task))
+        if not entry or not entry['outputs']:
+            return False
+        if entry['key'] != task_key(task):
+            return False
+        for out, stat in entry['outputs'].items():
+            if _stat(out) != stat:
+                return False
+        if not all(_colors_current(path, used) for path, used in
+                   entry.get('colors', {}).items()):
+            return False
+        return all(self._input_current(path, recorded)
+                   for path, recorded in entry['inputs'].items())
+
+    def _input_current(self, path, recorded):
+        if _stat(path) is None:
+            return False
+        if _stat(path) == recorded['stat']:
+            return True
+        # the file changed, check the objects we actually read
+        try:
+            with h5py.File(path, 'r') as h5_file:
+                for obj_name, fingerprint in recorded['objects'].items():
+                    check_key = (path, _stat(path)[0], obj_name)
+                    if check_key not in self._checked:
+                        self._checked[check_key] = (
+                            obj_name in h5_file and _object_fingerprint(
+                                h5_file[obj_name]) == fingerprint)
+                    if not self._checked[check_key]:
+                        return False
+        except OSError:
+            return False
+        recorded['stat'] = _stat(path)
+        return True
+
+    def update(self, family, task, record):
+        """
+        Store the record (from run_recorded) for a task.
+        """
+        record['key'] = task_key(task)
+        self.entries[_entry_name(family, task)] = record
+
+    def save(self):
+        tmp_name = '{}.{}.tmp'.format(self.path, os.getpid())
+        with open(tmp_name, 'w') as manifest:
+            json.dump(self.entries, manifest, indent=1, sort_keys=True)
+        os.replace(tmp_name, self.path)
+
+def _colors_current(path, used):
+    """
+    Check that the colors a task used are still the ones in the file.
+    Colors assigned to other taggers since then don't matter.
+    """
+    saved = _read_colors(path)
+    if saved is None:
+        return False
+    return all(saved.get(key) == color for key, color in used.items())
+
+def _entry_name(family, task):
+    return '{}/{}'.format(family, task.name)
@@ -0,0 +1,361 @@
+"""
+The `tagperf` command, with one subcommand per drawing script.
+
+Only the standard library is imported at the top of this module, the
+tagperf modules (and through them numpy and h5py) are imported once the
+arguments are parsed, and matplotlib is only imported by the drawing
+functions themselves. So `tagperf -h` and the numbers-only subcommands
+start quickly.
+"""
+import argparse
+import os
+import sys
+
+def run(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='tagperf', description='draw tagging performance plots')
+    subparsers = parser.add_subparsers(dest='command', metavar='command')
+    for command in _commands:
+        sub = subparsers.add_parser(
+            command.name, help=command.__doc__.strip().splitlines()[0])
+        command.add_args(sub)
+        sub.set_defaults(run_command=command)
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+    if args.command is None:
+        parser.print_usage(sys.stderr)
+        sys.exit(2)
+    args.run_command(args)
+
+def run_command(command, argv=None):
+    """
+    Run one subcommand as a standalone program (for the old scripts).
+    """
+    parser = argparse.ArgumentParser(description=command.__doc__.strip())
+    command.add_args(parser)
+    command(parser.parse_args(sys.argv[1:] if argv is None else argv))
+
+def _command(name, add_args):
+    def named(function):
+        function.name = name
+        function.add_args = add_args
+        return function
+    return named
+
+# __________________________________________________________________________
+# shared options
+
+def _add_common_args(parser):
+    d = '(default %(default)s)'
+    parser.add_argument('hdf_file')
+    parser.add_argument(
+        '-o', '--out-dir', help='output dir ' + d, default='plots')
+    parser.add_argument(
+        '-e', '--ext', help='plot extension ' + d, default='.pdf')
+    parser.add_argument(
+        '--cache-size', type=float, help='trim each rejrej cache to this '
+        'many MB, dropping the least recently used maps')
+    parser.add_argument(
+        '--integral-budget', type=float, help='memory (in MB) to use for '
+        'reusing integrated histograms (default 1024)')
+    parser.add_argument(
+        '--low-memory', action='store_true', help='integrate histograms in '
+        'place and as 32 bit counts where possible, report peak memory')
+    parser.add_argument(
+        '--decimate', type=float, default=1e-3, help='drop curve points '
+        'closer than this (fraction of the axes) to the line, vector '
+        'formats only, 0 to keep all points ' + d)
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=1, help='number of worker '
+        'processes to draw with ' + d)
+    parser.add_argument(
+        '-f', '--force', action='store_true', help='redraw everything, '
+        'even the plots that are up to date')
+    parser.add_argument(
+        '--profile', action='store_true', help='time the reads, integrals, '
+        'rejrej builds, curves, contours and saves in each plot, write '
+        'profile.json (Chrome trace) and profile.txt in the output dir')
+    parser.add_argument(
+        '--profile-memory', action='store_true', help='with --profile, '
+        'trace allocations for the peak memory of each span (slower)')
+
+def configure(args):
+    """
+    Process-wide settings, also used to set up worker processes.
+    """
+    from tagperf import integral, curves
+    if args.integral_budget is not None:
+        integral.set_budget(int(args.integral_budget * 1e6))
+    if args.low_memory:
+        integral.set_low_memory()
+    curves.set_tolerance(args.decimate)
+    if getattr(args, 'profile', False):
+        from tagperf import profiling
+        profiling.start(trace_memory=args.profile_memory)
+    if getattr(args, 'helvetify', False):
+        from tagperf.bullshit import helvetify
+        helvetify()
+
+def _cache_size(args):
+    if args.cache_size is None:
+        return None
+    return int(args.cache_size * 1e6)
+
+def _run_families(args, families):
+    from tagperf import jobs, build
+    if not os.path.isdir(args.out_dir):
+        os.mkdir(args.out_dir)
+    manifest = build.Manifest(
+        os.path.join(args.out_dir, build.MANIFEST_NAME), force=args.force)
+    try:
+        failures = jobs.run(families, args.jobs, configure, (args,),
+                            manifest=manifest)
+    finally:
+        if args.profile:
+            _write_profile(args.out_dir)
+    if args.low_memory:
+        from tagperf import integral
+        peak, worker_peak = integral.peak_memory()
+        print('peak memory: {:.0f} MB'.format(peak / 1e6))
+        if args.jobs > 1:
+            print('largest worker: {:.0f} MB'.format(worker_peak / 1e6))
+    if jobs.report(failures):
+        sys.exit(1)
+
+def _write_profile(out_dir):
+    from tagperf import profiling
+    events = profiling.take_events()
+    trace_name = os.path.join(out_dir, 'profile.json')
+    summary_name = os.path.join(out_dir, 'profile.txt')
+    profiling.write(events, trace_name, summary_name)
+    print('slowest spans (self time):')
+    rows = sorted(profiling.summarize(events), key=lambda row: row[3],
+                  reverse=True)
+    for name, calls, total, own, cpu, peak in rows[:5]:
+        print('  {:<30} {:8.3f} s in {} call(s)'.format(name, own, calls))
+    print('wrote {} and {}'.format(trace_name, summary_name))
+
+# __________________________________________________________________________
+# draw (tag-draw.py)
+
+def _family(name):
+    def named(function):
+        function.name = name
+        return function
+    return named
+
+@_family('btag2d')
+def _btag2d(args):
+    from tagperf import b2d
+    cache_name = os.path.join(args.cache_dir, 'BTAG_CACHE.h5')
+    return b2d.plot_stages(args.hdf_file, cache_name, args.out_dir,
+                           args.ext, cache_size=_cache_size(args))
+
+@_family('ctag')
+def _ctag(args):
+    from tagperf import ctaging
+    print('making ctag plots')
+    cache_name = os.path.join(args.cache_dir, 'REJREJ_CACHE.h5')
+    return ctaging.plot_stages(args.hdf_file, cache_name, args.out_dir,
+                               args.ext, cache_size=_cache_size(args))
+
+@_family('c1d')
+def _c1d(args):
+    from tagperf import ctaging
+    from tagperf.jobs import Task
+    print('making ctag 1d plots')
+    b_effs = [0.125, 0.2]
+    file_args = (args.hdf_file, args.out_dir, args.ext)
+    tasks = [Task('ctag-1d-brej-overlay', ctaging.make_1d_overlay,
+                  *file_args, b_effs=b_effs, subset=args.taggers)]
+    for ef in b_effs:
+        for reject in 'UT':
+            name = '{}Rej-vs-cEff-brej{}'.format(reject.lower(), int(1/ef))
+            tasks.append(Task(name, ctaging.make_1d_plots, *file_args,
+                              b_eff=ef, reject=reject))
+    return [tasks]
+
+@_family('roc')
+def _roc(args):
+    from tagperf import tagroc
+    print('making roc plots')
+    return tagroc.plot_stages(args.hdf_file, args.out_dir, args.ext,
+                              propaganda=args.propaganda, subset=args.taggers)
+
+@_family('pt')
+def _pt(args):
+    from tagperf import tagpt
+    print('making pt plots')
+    return tagpt.plot_stages(args.hdf_file, args.out_dir, args.ext,
+                             subset=args.taggers, propaganda=args.propaganda)
+
+_draw_families = {f.name: f for f in [_ctag, _roc, _pt, _c1d, _btag2d]}
+
+def _add_draw_args(parser):
+    _add_common_args(parser)
+    parser.add_argument(
+        '-c', '--cache-dir', help='where to keep rejrej caches '
+        '(default %(default)s)', default='.')
+    parser.add_argument(
+        '-p', '--plots', help='plots to make (default %(default)s)',
+        choices=_draw_families.keys(), default='all')
+    parser.add_argument(
+        '-t', '--taggers', help='only plot a subset of b-taggers', nargs='+')
+    parser.add_argument('--propaganda', action='store_true')
+    parser.add_argument(
+        '--no-draw', action='store_true', help="only write the numbers "
+        "behind the plots to the results file, don't draw anything")
+    parser.add_argument(
+        '-r', '--results', help='results file for --no-draw '
+        '(default: results.h5 in the output dir)')
+
+@_command('draw', _add_draw_args)
+def draw(args):
+    """
+    Draw the performance plots from a tag-perf-d3pd file.
+    """
+    configure(args)
+    if args.plots == 'all':
+        plots = _draw_families.keys()
+    else:
+        plots = [args.plots]
+    if args.no_draw:
+        _export_results(args, plots)
+        return
+    families = {plt: _draw_families[plt](args) for plt in plots}
+    _run_families(args, families)
+
+def _export_results(args, plots):
+    from tagperf import results
+    if not os.path.isdir(args.out_dir):
+        os.mkdir(args.out_dir)
+    out_name = args.results or os.path.join(args.out_dir, 'results.h5')
+    results.export(args.hdf_file, out_name, plots,
+                   cache_dir=args.cache_dir, subset=args.taggers)
+    print('wrote results to {}'.format(out_name))
+
+# __________________________________________________________________________
+# draw-peter (tag-draw-peter.py)
+
+def _add_peter_args(parser):
+    _add_common_args(parser)
+    parser.add_argument(
+        '-c', '--cache', help='cache for rejrej plots (default %(default)s)',
+        default='REJREJ_CACHE.h5')
+    parser.add_argument('-a', '--approved', action='store_true')
+    parser.set_defaults(helvetify=True)
+
+@_command('draw-peter', _add_peter_args)
+def draw_peter(args):
+    """
+    Draw the c-tagging plots from a tag-perf-peter file.
+    """
+    configure(args)
+    from tagperf import cutplane, peters, cutline
+    from tagperf.jobs import Task
+    print('making ctag plots')
+
+    kwd = dict(approval=('Preliminary' if args.approved else 'Internal'))
+    file_args = (args.hdf_file, args.out_dir, args.ext)
+    families = {
+        'cutline': [[Task('cut lines', cutline.draw_cut_lines,
+                          *file_args, **kwd)]],
+        'cross-check': [[Task('cross check', peters.peters_cross_check,
+                              *file_args)]],
+        'cutplane': [[Task('cut plane', cutplane.draw_cut_plane,
+                           *file_args, **kwd)]],
+        'rejrej': peters.plot_stages(
+            args.hdf_file, args.cache, args.out_dir, args.ext,
+            cache_size=_cache_size(args), **kwd),
+        'peters-1d': [[Task('peters 1d', peters.make_peters_1d,
+                            *file_args, **kwd)]],
+        }
+    _run_families(args, families)
+
+# __________________________________________________________________________
+# ops (numbers only)
+
+def _add_ops_args(parser):
+    parser.add_argument('hdf_file')
+    parser.add_argument('tagger')
+    parser.add_argument(
+        'cuts', nargs='+', help='anti-light,anti-b cut pairs, '
+        'i.e. 0.42,-0.61')
+
+@_command('ops', _add_ops_args)
+def ops(args):
+    """
+    Print flavor efficiencies at c-tagging operating points.
+    """
+    import h5py
+    from tagperf.oppoint import OperatingPoints
+    cuts = [[float(x) for x in cut.split(',')] for cut in args.cuts]
+    flavors = 'UCB'
+    with h5py.File(args.hdf_file, 'r') as h5:
+        points = OperatingPoints(
+            {flav: h5[flav]['ctag']['all'][args.tagger] for flav in flavors})
+        effs = {flav: points.efficiency(flav, cuts) for flav in flavors}
+    print('{:>8} {:>8}  '.format('antiU', 'antiB') + ' '.join(
+            '{:>10}'.format(flav + ' eff') for flav in flavors))
+    for n, (u_cut, b_cut) in enumerate(cuts):
+        print('{:8.3f} {:8.3f}  '.format(u_cut, b_cut) + ' '.join(
+                '{:10.5f}'.format(effs[flav][n]) for flav in flavors))
+
+# __________________________________________________________________________
+# merge (tagperf-merge)
+
+def _add_merge_args(parser):
+    parser.add_argument('hdf_files', nargs='+', help='files to add up')
+    parser.add_argument('-o', '--output', required=True)
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=1, help='number of worker '
+        'processes (default %(default)s)')
+    parser.add_argument(
+        '--block-size', type=float, default=16, help='MB of each dataset '
+        'to read from every input at once (default %(default)s)')
+
+@_command('merge', _add_merge_args)
+def merge(args):
+    """
+    Add up the histograms from several tag-perf-* output files.
+    """
+    from tagperf.merge import merge as merge_files
+    try:
+        merge_files(args.hdf_files, args.output, n_jobs=args.jobs,
+                    block_bytes=int(args.block_size * 1024**2))
+    except ValueError as err:
+        sys.exit('tagperf merge: {}'.format(err))
+    print('merged {} files into {}'.format(len(args.hdf_files), args.output))
+
+# __________________________________________________________________________
+# fill (python version of tag-perf-d3pd)
+
+def _add_fill_args(parser):
+    parser.add_argument(
+        'jets', help='HDF5 file or directory of .npy files with one '
+        'entry per jet')
+    parser.add_argument('-o', '--output', required=True)
+    parser.add_argument(
+        '-g', '--group', help='group holding the columns in an HDF5 input '
+        '(default: top level)')
+    parser.add_argument(
+        '-s', '--spec', help='only fill the histograms listed in this '
+        'file (same format as tag-perf-d3pd -c)')
+    parser.add_argument(
+        '--chunk-size', type=int, default=1000000, help='jets to read at '
+        'once (default %(default)s)')
+
+@_command('fill', _add_fill_args)
+def fill(args):
+    """
+    Fill the tag-perf-d3pd histograms from columnar jets, without ROOT.
+    """
+    from tagperf import fill as filling
+    try:
+        spec = filling.read_spec(args.spec) if args.spec else None
+        n_jets = filling.fill(args.jets, args.output, spec=spec,
+                              group=args.group, chunk_size=args.chunk_size)
+    except (ValueError, KeyError, IOError) as err:
+        sys.exit('tagperf fill: {}'.format(err))
+    print('filled {} from {} jets'.format(args.output, n_jets))
+
+_commands = [draw, draw_peter, ops, merge, fill]
@@ -3,19 +3,19 @@ import numpy as np
 import h5py
 import math
 import warnings
-import os, sys
-
-from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
-from matplotlib.figure import Figure
-from mpl_toolkits.axes_grid1 import make_axes_locatable
-from matplotlib.colorbar import Colorbar
-from matplotlib.ticker import FuncFormatter
-from matplotlib.lines import Line2D
-from matplotlib.legend import Legend
+import os
 
 from tagperf.tagschema import long_particle_names
 from tagperf.tagschema import leg_labels_colors, mv1uc_name, mv1uc_disp
 from tagperf.pr import add_atlas, add_official_garbage, log_formatting
+from tagperf import rejcache, curves
+from tagperf.rejcache import RejRejCache
+from tagperf import integral, h5map
+from tagperf.integral import get_integral
+from tagperf.oppoint import OperatingPoints
+from tagperf.pareto import ParetoFrontier
+from tagperf.jobs import Task, FileTask, run_stages
+from tagperf.profiling import span
 
 _text_size = 12
 _fig_edge = 5.0
@@ -28,45 +28,68 @@ _jfc_run1_op = [0.95, -0.9]
 # __________________________________________________________________________
 # top level functions
 
-def make_plots(in_file_name, cache_name, out_dir, ext):
+def make_plots(in_file_name, cache_name, out_dir, ext, cache_size=None):
     """
-    Top level routine to make plots from tagger output distributions
+    Top level routine to make plots from tagger output distributions.
+    If cache_size (in bytes) is given, the cache is trimmed to that size
+    once the plots are drawn.
     """
-    with h5py.File(in_file_name, 'r') as in_file:
-        with h5py.File(cache_name, 'a') as out_file:
-            make_rejrej(in_file, out_file, tagger='gaia')
-            make_rejrej(in_file, out_file, tagger='jfc')
-            make_rejrej(in_file, out_file, tagger='jfit')
-            make_rejrej(in_file, out_file, tagger=mv1uc_name)
-        jfc_urbrce_run1 = _get_urej_brej_ceff(in_file,'jfc', _jfc_run1_op)
-
     if not isdir(out_dir):
         os.mkdir(out_dir)
+    run_stages(plot_stages(in_file_name, cache_name, out_dir, ext,
+                           cache_size=cache_size))
+
+def plot_stages(in_file_name, cache_name, out_dir, ext, cache_size=None):
+    """
+    The work done by make_plots, as stages of independent tasks (see
+    tagperf.jobs). The output directory should already exist.
+    """
+    build = [Task('ctag rejrej', build_rejrej, in_file_name, cache_name,
+                  taggers=['gaia', 'jfc', 'jfit', mv1uc_name])]
+    def draw(name, function, *args, **kwargs):
+        return FileTask(name, cache_name, function, out_dir, ext,
+                        *args, **kwargs)
+    jfit, mv = dict(tagger_disp='COMBNN'), dict(tagger_disp=mv1uc_disp)
+    jfc_num = dict(num_tagger='jfc', num_tagger_disp='JetFitterCharm')
+    draws = [
+        draw('rejrej', draw_ctag_rejrej),
+        draw('rejrej-cont', draw_contour_rejrej),
+        draw('ctag-2d-gaia-vs-jfc', draw_ctag_ratio),
+        draw('ctag-2d-gaia-vs-jfit', draw_ctag_ratio, tagger='jfit',
+             vmax=1.9, **jfit),
+        draw('ctag-2d-gaia-vs-mv', draw_ctag_ratio, tagger=mv1uc_name,
+             vmax=1.9, **mv),
+        draw('ctag-2d-jfc-vs-mv', draw_ctag_ratio, tagger=mv1uc_name,
+             vmax=1.9, **dict(mv, **jfc_num)),
+        draw('ctag-2d-jfc-vs-jfit', draw_ctag_ratio, tagger='jfit',
+             vmax=1.9, **dict(jfit, **jfc_num)),
+        FileTask('rejrej-simple', [cache_name, in_file_name],
+                 _draw_simple_rejrej_run1, out_dir, ext),
+        draw('rejrej-xkcd', draw_xkcd_rejrej),
+        FileTask('rejrej-cprob', [cache_name, in_file_name],
+                 draw_cprob_rejrej, out_dir, ext),
+        ]
+    trim = [Task('ctag cache trim', rejcache.trim, cache_name, cache_size)]
+    return [build, draws, trim]
+
+def build_rejrej(in_file_name, cache_name, taggers):
+    """
+    Fill the cache with rejrej arrays for a list of taggers.
+    """
+    with h5py.File(in_file_name, 'r') as in_file:
+        with h5py.File(cache_name, 'a') as out_file:
+            for tagger in taggers:
+                make_rejrej(in_file, out_file, tagger=tagger)
 
-    with h5py.File(cache_name, 'r') as cache:
-        draw_ctag_rejrej(cache, out_dir, ext)
-        draw_contour_rejrej(cache, out_dir, ext)
-        draw_ctag_ratio(cache, out_dir, ext)
-        draw_ctag_ratio(cache, out_dir, ext, tagger='jfit',
-                        tagger_disp='COMBNN', vmax=1.9)
-        draw_ctag_ratio(cache, out_dir, ext, tagger=mv1uc_name,
-                        tagger_disp=mv1uc_disp, vmax=1.9)
-        draw_ctag_ratio(
-            cache, out_dir, ext, tagger=mv1uc_name,
-            tagger_disp=mv1uc_disp,
-            num_tagger='jfc',num_tagger_disp='JetFitterCharm', vmax=1.9)
-        draw_ctag_ratio(
-            cache, out_dir, ext, tagger='jfit',
-            tagger_disp='COMBNN',
-            num_tagger='jfc',num_tagger_disp='JetFitterCharm', vmax=1.9)
-        draw_simple_rejrej(
-            cache, out_dir, ext, points=[jfc_urbrce_run1],
-            official=True, approval=None)
-        draw_xkcd_rejrej(cache, out_dir, ext)
-        with h5py.File(in_file_name, 'r') as in_file:
-            draw_cprob_rejrej(cache, in_file, out_dir, ext)
+def _draw_simple_rejrej_run1(cache, in_file, out_dir, ext):
+    jfc_urbrce_run1 = _get_urej_brej_ceff(in_file,'jfc', _jfc_run1_op)
+    draw_simple_rejrej(
+        cache, out_dir, ext, points=[jfc_urbrce_run1],
+        official=True, approval=None)
 
 def make_1d_plots(in_file_name, out_dir, ext, b_eff=0.1, reject='U'):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
+    from matplotlib.figure import Figure
     textsize=_text_size
     taggers = {}
     with h5py.File(in_file_name, 'r') as in_file:
@@ -77,8 +100,10 @@ def make_1d_plots(in_file_name, out_dir, ext, b_eff=0.1, reject='U'):
     fig = Figure(figsize=_fig_size)
     canvas = FigureCanvas(fig)
     ax = fig.add_subplot(1,1,1)
+    tolerance = curves.tolerance_for(ext)
     for tname, (vc, vu) in taggers.items():
         label, color = leg_labels_colors.get(tname, (tname, 'k'))
+        vc, vu = curves.decimate(vc, vu, tolerance)
         ax.plot(vc, vu, label=label, color=color, linewidth=_line_width)
     leg = ax.legend(title='$b$-rejection = {}'.format(1/b_eff),
                     prop={'size':textsize})
@@ -96,24 +121,30 @@ def make_1d_plots(in_file_name, out_dir, ext, b_eff=0.1, reject='U'):
 _b_eff_styles = ['solid','dashed','dotted']
 _default_overlay_1d = ['gaia', 'jfit','jfc']
 def make_1d_overlay(in_file_name, out_dir, ext, subset, b_effs=[0.1, 0.2]):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
+    from matplotlib.figure import Figure
     textsize = _text_size - 2
     b_eff_styles = _b_eff_styles
 
     taggers = {x:{} for x in b_effs}
     with h5py.File(in_file_name, 'r') as in_file:
-        for b_eff in taggers:
-            for tag in (subset or _default_overlay_1d):
-                taggers[b_eff][tag] = get_c_vs_u_const_beff(
-                    in_file, tag, b_eff=b_eff)
+        for tag in (subset or _default_overlay_1d):
+            ceffs, rejs, valid = get_c_vs_rej_const_beffs(
+                in_file, tag, b_effs)
+            for n, b_eff in enumerate(b_effs):
+                taggers[b_eff][tag] = (
+                    ceffs[n][valid[n]], rejs['U'][n][valid[n]])
 
     fig = Figure(figsize=_fig_size)
     canvas = FigureCanvas(fig)
     ax = fig.add_subplot(1,1,1)
+    tolerance = curves.tolerance_for(ext)
     for b_eff, linestyle in zip(b_effs, b_eff_styles):
         for tname, (vc, vu) in taggers[b_eff].items():
             label, color = leg_labels_colors.get(tname, (tname, 'k'))
             lab = '$1 / \epsilon_{{ b }} = $ {rej:.0f}, {tname}'.format(
                 rej=1/b_eff, tname=label)
+            vc, vu = curves.decimate(vc, vu, tolerance)
             ax.plot(vc, vu, label=lab, color=color, linewidth=_line_width,
                     linestyle=linestyle)
     ax.set_xlim(0.1, 0.5)
@@ -135,6 +166,7 @@ def make_1d_overlay(in_file_name, out_dir, ext, subset, b_effs=[0.1, 0.2]):
 
 def setup_1d_ctag_legs(ax, textsize, reject='U', official=False,
                         approval='Internal'):
+    from matplotlib.ticker import FuncFormatter
     ax.set_yscale('log')
     formatter = FuncFormatter(log_formatting)
     ax.yaxis.set_major_formatter(formatter)
@@ -154,14 +186,16 @@ def setup_1d_ctag_legs(ax, textsize, reject='U', official=False,
 def _get_hist_name(flavor, tagger, binning):
     return '{}/ctag/{}/{}'.format(flavor, binning, tagger)
 
-def _get_rej_hist(int_counts):
+def _get_rej_hist(int_counts, total=None):
     """
     Convert integrated counts (from tagger output distributions) to
     1 / efficiency (without warnings).
     """
+    if total is None:
+        total = int_counts.max()
     rej = np.zeros(int_counts.shape)
     valid = int_counts != 0
-    rej[valid] = int_counts.max() / int_counts[valid]
+    rej[valid] = total / int_counts[valid]
     invalid = np.logical_not(valid)
     rej[invalid] = np.inf
     return rej
@@ -172,26 +206,15 @@ def _get_eff_hist(int_counts):
 # lookup function for operating points
 
 def _get_urej_brej_ceff(h5, tagger, cuts, lookup=_get_hist_name):
-    def eff(flavor):
-        hist_name = lookup(flavor, tagger=tagger, binning='all')
-        return _get_eff(h5[hist_name], cuts)
-    return 1/eff('U'), 1/eff('B'), eff('C')
-
-def _get_eff(dataset, cuts):
-    mins = dataset.attrs['min']
-    maxes = dataset.attrs['max']
-    bounds = zip(mins, maxes)
-    n_bins = [x - 2 for x in dataset.shape]
-    array = np.asarray(dataset)
-    bin_edges = [np.linspace(*b, num=n) for b, n in zip(bounds, n_bins)]
-    slices = []
-    for cutval, edges in zip(cuts, bin_edges):
-        dists = np.abs(edges - cutval)
-        closest = np.argmin(dists)
-        slices.append(slice(closest, None))
-    passing = array[slices].sum()
-    total = array.sum()
-    return passing / total
+    """
+    Light rejection, b rejection, and c efficiency at one (anti-light,
+    anti-b) cut, or an array of them for an (n_cuts, 2) array of cuts.
+    """
+    points = OperatingPoints({
+        flav: h5[lookup(flav, tagger=tagger, binning='all')]
+        for flav in 'UBC'})
+    return (points.rejection('U', cuts), points.rejection('B', cuts),
+            points.efficiency('C', cuts))
 
 
 # __________________________________________________________________________
@@ -209,41 +232,38 @@ def make_rejrej(in_file, out_file, tagger='gaia', binning='all',
         except KeyError as err:
             raise KeyError(err.args[0] + ' -- looking for ' + lookup_str)
 
-    if not tagger in out_file:
-        out_file.create_group(tagger)
-    if binning in out_file[tagger]:
+    rej_builder = RejRejComp('BUC', 50.0, 400.0)
+    build_cached(rej_builder, get_flavor, RejRejCache(out_file),
+                 tagger, binning)
+
+def build_cached(rej_builder, get_flavor, cache, tagger, binning):
+    """
+    Bring one cache entry up to date. The histograms are only scanned if
+    they changed, otherwise a new binning is made from the stored Pareto
+    frontier.
+    """
+    frontier_key = rej_builder.frontier_fingerprint(get_flavor)
+    key = rej_builder.fingerprint(get_flavor, frontier_key)
+    if cache.is_current(tagger, binning, key):
         print('using cached tagger {}, binning {}'.format(tagger, binning))
         return
 
-    rej_builder = RejRejComp('BUC', 50.0, 400.0)
-    rej_builder.calculate(get_flavor)
-    rej_builder.save(out_file, tagger, binning)
-
-class ProgBar(object):
-    """
-    Generic progress "bar".
-    """
-    def __init__(self, total, prefix=''):
-        self.total = total
-        self.prefix = prefix
-    def __enter__(self):
-        return self
-    def __exit__(self, ex_type, ex_message, tr):
-        sys.stdout.write('\n')
-    def update(self, entry):
-        if self.prefix:
-            outstr = '\r{prefix}: {} of {} ({:.0%})'
-        else:
-            outstr = '\r{} of {} ({:.0%})'
-        sys.stdout.write(outstr.format(
-                entry, self.total, float(entry) / self.total,
-                prefix=self.prefix))
-        sys.stdout.flush()
+    frontier = cache.get_frontier(tagger, binning, frontier_key)
+    if frontier is not None:
+        print('rebinning cached frontier for tagger {}, binning {}'.format(
+                tagger, binning))
+    rej_builder.calculate(get_flavor, frontier=frontier)
+    cache.store(rej_builder, tagger, binning, key, frontier_key)
 
 class RejRejComp(object):
     """
     Class to convert three arrays (one efficiency and two rejection) into
-    a 2D efficiency array binned by rejection.
+    a 2D efficiency array binned by rejection. Each bin holds the best
+    efficiency with both rejections above the bin's low edges.
+
+    The array is built from the cuts left by a cheap first pass for the
+    Pareto frontier (see tagperf.pareto), which are also kept (as
+    `frontier`) so they can be binned again later.
     """
     def __init__(self, xyz='BUC', xmax=50.0, ymax=400.0):
         self.n_bins = 100
@@ -253,20 +273,54 @@ class RejRejComp(object):
         self.y_max = float(ymax)
         self.xyz = xyz
         self.rej_array = None
-
-    def calculate(self, get_flavor):
-        """get_flavor is a function that returns array given a flavor"""
+        self.frontier = None
+
+    def calculate(self, get_flavor, frontier=None):
+        """
+        get_flavor is a function that returns array given a flavor. If a
+        frontier is given the histograms aren't read at all.
+        """
+        with span('rejrej', rebin_only=frontier is not None):
+            if frontier is None:
+                frontier = self.get_frontier(get_flavor)
+            self.frontier = frontier
+            self.rej_array = frontier.max_efficiency(
+                self._logspace(self.x_min, self.x_max),
+                self._logspace(self.y_min, self.y_max))
+
+    def get_frontier(self, get_flavor):
         int_arr = {}
         for flavor in self.xyz:
-            arr = np.asarray(get_flavor(flavor))
-            int_arr[flavor] = arr[::-1,::-1].cumsum(axis=0).cumsum(axis=1)
+            int_arr[flavor] = get_integral(get_flavor(flavor))
 
         x, y, z = self.xyz
-        get_eff, get_rej = _get_eff_hist, _get_rej_hist
-        self.rej_array = self.get_rej_array(
-            eff=get_eff(int_arr[z]),
-            xrej=get_rej(int_arr[x]),
-            yrej=get_rej(int_arr[y]))
+        if integral.is_low_memory():
+            return self._get_frontier_blocks(
+                int_arr[z], int_arr[x], int_arr[y])
+        # the exact frontier isn't needed for the map, and costs more
+        # than everything else here
+        return ParetoFrontier.from_counts(
+            int_arr[x], int_arr[y], int_arr[z], xyz=self.xyz, exact=False)
+
+    def frontier_fingerprint(self, get_flavor):
+        """
+        Hash of the input histograms, used to check if a saved frontier is
+        still valid.
+        """
+        arrays = [get_flavor(flavor) for flavor in self.xyz]
+        return rejcache.fingerprint(arrays, dict(xyz=self.xyz))
+
+    def fingerprint(self, get_flavor, frontier_key=None):
+        """
+        Hash of the input histograms and binning parameters, used to check
+        if a saved rejection array is still valid.
+        """
+        if frontier_key is None:
+            frontier_key = self.frontier_fingerprint(get_flavor)
+        params = dict(frontier=frontier_key, n_bins=self.n_bins,
+                      x_min=self.x_min, x_max=self.x_max,
+                      y_min=self.y_min, y_max=self.y_max)
+        return rejcache.fingerprint([], params)
 
     def save(self, out_file, tagger, binning):
         assert self.rej_array is not None, 'need to load an array first'
@@ -281,26 +335,27 @@ class RejRejComp(object):
         saved_ds.attrs['x_min'] = self.x_min
         saved_ds.attrs['y_min'] = self.y_min
         saved_ds.attrs['xyz'] = self.xyz
+        if self.frontier is not None:
+            group, name = os.path.split(rejcache.frontier_name(
+                    tagger, binning))
+            self.frontier.save(out_file.require_group(group), name)
 
     def _logspace(self, low, high):
         return np.logspace(math.log10(low), math.log10(high), self.n_bins)
 
-    def get_rej_array(self, eff, xrej, yrej):
-        valid_rej = np.isfinite(xrej) & np.isfinite(yrej)
-        x_bin_edges = self._logspace(self.x_min, self.x_max)
-        y_bin_edges = self._logspace(self.y_min, self.y_max)
-
-        x_bins = np.digitize(xrej[valid_rej], bins=x_bin_edges) - 1
-        y_bins = np.digitize(yrej[valid_rej], bins=y_bin_edges) - 1
-        z_vals = eff[valid_rej]
-
-        out_array = np.ones((self.n_bins, self.n_bins)) * -1
-        with ProgBar(z_vals.size, 'making rejrej') as pbar:
-            for binn, (x, y, z) in enumerate(zip(x_bins, y_bins, z_vals)):
-                if binn % 20000 == 0:
-                    pbar.update(binn)
-                out_array[x, y] = max(z, out_array[x, y])
-        return out_array
+    def _get_frontier_blocks(self, int_z, int_x, int_y, block_rows=64):
+        """
+        Same as get_frontier, but only builds the frontier of a few rows
+        at a time before merging them.
+        """
+        totals = [int_x.max(), int_y.max(), int_z.max()]
+        frontiers = []
+        for start in range(0, int_z.shape[0], block_rows):
+            rows = slice(start, start + block_rows)
+            frontiers.append(ParetoFrontier.from_counts(
+                    int_x[rows], int_y[rows], int_z[rows], totals=totals,
+                    xyz=self.xyz, exact=False))
+        return ParetoFrontier.merge(frontiers, exact=False)
 
 def get_c_vs_u_const_beff(in_file, tagger, b_eff=0.1, binning='all',
                                reject='U', lookup=_get_hist_name):
@@ -308,29 +363,52 @@ def get_c_vs_u_const_beff(in_file, tagger, b_eff=0.1, binning='all',
     Returns (c efficiency, X rejection) tuple for a given b-tagging
     efficiency. By default reject 'U', but can set this.
     """
+    ceffs, rejs, valid = get_c_vs_rej_const_beffs(
+        in_file, tagger, [b_eff], binning=binning, reject=reject,
+        lookup=lookup)
+    return ceffs[0][valid[0]], rejs[reject][0][valid[0]]
+
+def get_c_vs_rej_const_beffs(in_file, tagger, b_effs, binning='all',
+                             reject='U', lookup=_get_hist_name):
+    """
+    Batched version of get_c_vs_u_const_beff: one curve per b-tagging
+    efficiency in b_effs, and a rejection for each flavor in reject.
+
+    Returns (c efficiency, {flavor: rejection}, valid) where every array
+    has shape (n b_effs, n anti-light bins). The points on the curve for
+    b_effs[n] are the ones where valid[n] is true.
+    """
     def make_int_flavor(flavor):
         ds = in_file[lookup(flavor, tagger=tagger, binning=binning)]
-        return np.array(ds)[::-1,::-1].cumsum(axis=0).cumsum(axis=1)
+        return get_integral(ds)
 
-    flavs = 'BC' + reject
+    flavs = set('BC' + reject)
     eff_flavor = {
         flav: _get_eff_hist(make_int_flavor(flav)) for flav in flavs}
+    with span('curve', tagger=tagger, binning=binning):
+        return _c_vs_rej(eff_flavor, b_effs, reject)
 
+def _c_vs_rej(eff_flavor, b_effs, reject):
     # --- Here be the meat ---
     # the 'anti-b' cut is along the second axis. The index of the first
     # passing value above the efficiency threshold is the same as the
     # number of points that are below the threshold.
-    first_passing_index = np.sum(eff_flavor['B'] < b_eff, axis=1)
+    b_effs = np.asarray(b_effs, dtype=float)
+    first_passing_index = integral.count_below(eff_flavor['B'], b_effs)
     ll, lb = eff_flavor['B'].shape
     u_idx = np.arange(ll)
     b_idx = np.minimum(first_passing_index, lb - 1)
     beffs = eff_flavor['B'][u_idx, b_idx]
     ceffs = eff_flavor['C'][u_idx, b_idx]
-    leffs = eff_flavor[reject][u_idx, b_idx]
     # to remove points with lower efficiency than the previous point
-    c_max = np.maximum.accumulate(ceffs)
-    valid = (np.abs(beffs - b_eff) / b_eff < 0.01) & (ceffs == c_max)
-    return ceffs[valid], 1 / leffs[valid]
+    c_max = np.maximum.accumulate(ceffs, axis=1)
+    b_col = b_effs[:, None]
+    valid = (np.abs(beffs - b_col) / b_col < 0.01) & (ceffs == c_max)
+    rejs = {}
+    with np.errstate(divide='ignore'):
+        for flav in reject:
+            rejs[flav] = 1 / eff_flavor[flav][u_idx, b_idx]
+    return ceffs, rejs, valid
 
 # __________________________________________________________________________
 # drawing routines
@@ -339,6 +417,8 @@ def draw_ctag_rejrej_slow(in_file, out_dir, ext='.pdf'):
     """
     Slow because it uses pcolormesh.
     """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
+    from matplotlib.figure import Figure
     fig = Figure(figsize=_fig_size)
     canvas = FigureCanvas(fig)
     ax = fig.add_subplot(1,1,1)
@@ -352,7 +432,7 @@ def draw_ctag_rejrej_slow(in_file, out_dir, ext='.pdf'):
     yvals = np.logspace(math.log10(ymin), math.log10(ymax), ds.shape[1])
     xgrid, ygrid = np.meshgrid(xvals, yvals)
 
-    ax.pcolormesh(xgrid, ygrid, np.array(ds))
+    ax.pcolormesh(xgrid, ygrid, h5map.read(ds))
     ax.set_xscale('log')
     ax.set_yscale('log')
     out_name = '{}/rejrej{}'.format(out_dir, ext)
@@ -363,6 +443,10 @@ def draw_ctag_rejrej(in_file, out_dir, ext='.pdf'):
     """
     Basic heatmap of efficiency vs two rejections.
     """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
+    from matplotlib.figure import Figure
+    from mpl_toolkits.axes_grid1 import make_axes_locatable
+    from matplotlib.colorbar import Colorbar
     fig = Figure(figsize=_fig_size)
     canvas = FigureCanvas(fig)
     ax = fig.add_subplot(1,1,1)
@@ -398,6 +482,10 @@ def draw_ctag_ratio(in_file, out_dir, ext='.pdf', **opts):
       tagger_disp (for display)
       vmax
     """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
+    from matplotlib.figure import Figure
+    from mpl_toolkits.axes_grid1 import make_axes_locatable
+    from matplotlib.colorbar import Colorbar
     options = {'tagger':'jfc', 'tagger_disp':'JetFitterCharm', 'vmax':1.2,
                'num_tagger':'gaia', 'num_tagger_disp':None,
                'textsize':_text_size}
@@ -444,6 +532,8 @@ def draw_contour_rejrej(in_file, out_dir, ext='.pdf'):
     Compare efficiency of two taggers. Draw one set of contours for the
     numerator tagger, another set for the ratio between the two taggers.
     """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
+    from matplotlib.figure import Figure
     fig = Figure(figsize=_fig_size)
     canvas = FigureCanvas(fig)
     ax = fig.add_subplot(1,1,1)
@@ -472,6 +562,8 @@ def draw_simple_rejrej(in_file, out_dir, ext='.pdf', tagger='gaia',
     """
     Draw iso-efficiency contours for one tagger (no colors).
     """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
+    from matplotlib.figure import Figure
     fig = Figure(figsize=_fig_size)
     canvas = FigureCanvas(fig)
     ax = fig.add_subplot(1,1,1)
@@ -500,6 +592,8 @@ def draw_xkcd_rejrej(in_file, out_dir, ext='.pdf'):
     """
     Draw iso-efficiency contours 'sketch'.
     """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
+    from matplotlib.figure import Figure
     import matplotlib.pyplot as plt
     with plt.xkcd():
         fig = Figure(figsize=_fig_size)
@@ -520,6 +614,8 @@ def draw_cprob_rejrej(in_file, in_file_up, out_dir, ext='.pdf'):
     Map of iso-efficiency contours, with an overlay for the rejections
     of a 1d cut.
     """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
+    from matplotlib.figure import Figure
     fig = Figure(figsize=_fig_size)
     canvas = FigureCanvas(fig)
     ax = fig.add_subplot(1,1,1)
@@ -542,9 +638,10 @@ def _add_cprob_curve(ax, in_file, levels):
     Add a curve indicating the possible rejections for a 1D discriminator
     cut. Also add points at various efficiency levels.
     """
+    from matplotlib.lines import Line2D
     def getint(flavor):
         name = '{}/ctag/all/gaiaC'.format(flavor)
-        return np.array(in_file[name])[::-1].cumsum()
+        return get_integral(in_file[name])
     c_int = getint('C')
     b_int = getint('B')
     u_int = getint('U')
@@ -576,7 +673,11 @@ def add_contour(ax, ds, opts={}):
     """
     routine to add the iso-efficiency contours to a plot.
     """
-    eff_array = _maximize_efficiency(np.array(ds))
+    with span('contour', dataset=ds.name):
+        _add_contour(ax, ds, opts)
+
+def _add_contour(ax, ds, opts):
+    eff_array = _maximize_efficiency(h5map.read(ds))
     xmin = ds.attrs.get('x_min', 1.0)
     ymin = ds.attrs.get('y_min', 1.0)
     xmax = ds.attrs['x_max']
@@ -615,8 +716,12 @@ def _add_eq_contour(ax, ds, ds_denom, colorbar=None, levels=[], smooth=None):
     Add contours where ds and ds_denom have equal efficiency (ratio = 1). The
     'levels' argument can be used to specify contours at ratios other than 1.
     """
-    eff_array = _maximize_efficiency(np.array(ds))
-    other_array = _maximize_efficiency(np.array(ds_denom))
+    with span('contour', dataset=ds.name):
+        _add_ratio_contour(ax, ds, ds_denom, colorbar, levels, smooth)
+
+def _add_ratio_contour(ax, ds, ds_denom, colorbar, levels, smooth):
+    eff_array = _maximize_efficiency(h5map.read(ds))
+    other_array = _maximize_efficiency(h5map.read(ds_denom))
     ratio_array = _smooth(eff_array / other_array, sigma=smooth)
     xmin = ds.attrs.get('x_min', 1.0)
     ymin = ds.attrs.get('y_min', 1.0)
@@ -649,6 +754,7 @@ def _tick_format(x, pos):
         return '{:.0f}'.format(x)
 
 def label_rejrej_axes(ax, ds, textsize=_text_size):
+    from matplotlib.ticker import FuncFormatter
     ax.set_xscale('log')
     ax.set_yscale('log')
     ax.grid(which='both', alpha=0.05, ls='-')
@@ -679,7 +785,7 @@ def _get_arr_extent(ds):
         ymin = 1.0
     xmax = ds.attrs['x_max']
     ymax = ds.attrs['y_max']
-    eff_array = _maximize_efficiency(np.array(ds))
+    eff_array = _maximize_efficiency(h5map.read(ds))
     return eff_array, (xmin, xmax, ymin, ymax)
 
 def _maximize_efficiency(eff_array):
@@ -0,0 +1,89 @@
+"""
+Thin out curves before they are drawn.
+
+Vector formats store every point of every line, and the ROC curves have
+10000 of them. Most are redundant: decimate drops every point that's
+within a tolerance of the simplified curve (Ramer-Douglas-Peucker). The
+distance is measured after transforming to the axis scale (log or linear)
+and dividing by the range of the curve on each axis, so the tolerance is
+roughly a fraction of the plot size.
+"""
+import numpy as np
+
+DEFAULT_TOLERANCE = 1e-3
+_vector_formats = {'.pdf', '.eps', '.ps', '.svg'}
+_tolerance = DEFAULT_TOLERANCE
+
+def set_tolerance(tolerance):
+    """
+    Set the process-wide tolerance, 0 or None turns decimation off.
+    """
+    global _tolerance
+    _tolerance = tolerance
+
+def get_tolerance():
+    return _tolerance
+
+def tolerance_for(ext):
+    """
+    Tolerance to use for an output format, None for raster formats.
+    """
+    if ext.lower() in _vector_formats and _tolerance:
+        return _tolerance
+    return None
+
+def decimate(x, y, tolerance, xscale='linear', yscale='log'):
+    """
+    Returns x and y with the points that don't change the shape of the
+    curve (by more than tolerance) removed. Non-finite points (i.e. infinite
+    rejection) are kept, they split the curve into pieces that are thinned
+    separately. If tolerance is None nothing is removed.
+    """
+    x, y = np.asarray(x), np.asarray(y)
+    if tolerance is None or x.size < 3:
+        return x, y
+    points = np.stack([_scaled(x, xscale), _scaled(y, yscale)], axis=1)
+    finite = np.isfinite(points).all(axis=1)
+    keep = ~finite
+    # pieces of consecutive finite points
+    edges = np.flatnonzero(np.diff(np.r_[0, finite.astype(int), 0]))
+    for start, stop in zip(edges[::2], edges[1::2]):
+        keep[start:stop] = _simplify(points[start:stop], tolerance)
+    return x[keep], y[keep]
+
+def _scaled(values, scale):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if scale == 'log':
+            values = np.where(values > 0, np.log10(values), np.nan)
+        values = values.astype(float)
+        finite = values[np.isfinite(values)]
+        if not finite.size:
+            return values
+        span = finite.max() - finite.min()
+        return (values - finite.min()) / (span if span > 0 else 1.0)
+
+def _simplify(points, tolerance):
+    """
+    Ramer-Douglas-Peucker, returns a mask of the points to keep.
+    """
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    segments = [(0, len(points) - 1)]
+    while segments:
+        first, last = segments.pop()
+        if last - first < 2:
+            continue
+        start, end = points[first], points[last]
+        inner = points[first + 1:last] - start
+        direction = end - start
+        length2 = direction.dot(direction)
+        if length2 > 0:
+            frac = np.clip(inner.dot(direction) / length2, 0.0, 1.0)
+            inner = inner - frac[:, None] * direction
+        dist = np.hypot(inner[:, 0], inner[:, 1])
+        worst = dist.argmax()
+        if dist[worst] > tolerance:
+            split = first + 1 + worst
+            keep[split] = True
+            segments += [(first, split), (split, last)]
+    return keep
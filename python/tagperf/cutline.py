@@ -2,10 +2,6 @@ import os
 import numpy as np
 import h5py
 
-from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
-from matplotlib.figure import Figure
-from matplotlib.ticker import FuncFormatter
-
 from tagperf.tagschema import long_particle_names
 from tagperf.pr import add_atlas, add_official_garbage, log_formatting
 from tagperf.cutplane import CountPlane
@@ -15,8 +11,10 @@ from tagperf.cutplane import ANTI_LIGHT_CUT, ANTI_B_CUT
 def draw_cut_lines(hdf_file, out_dir, ext, tagger='jfc', approval='Internal'):
     with h5py.File(hdf_file) as in_file:
         planes = {x: CountPlane(in_file[x][tagger]) for x in 'BUC'}
+        canvases = {ax: _get_line_canvas(planes, ax, approval=approval)
+                    for ax in 'xy'}
     for ax, disc in [('x', 'light'), ('y', 'bottom')]:
-        canvas = _get_line_canvas(planes, ax, approval=approval)
+        canvas = canvases[ax]
         if not os.path.isdir(out_dir):
             os.mkdir(out_dir)
         canvas.print_figure('{}/anti-{}-discriminant{}'.format(
@@ -30,6 +28,9 @@ _legpos_vs_ax = {'x':'upper left', 'y':'upper right'}
 _text_size = 12
 def _get_line_canvas(planes, axis, axsize=14, rebin=5, approval=''):
     """return the canvas with everything drawn on it"""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
+    from matplotlib.figure import Figure
+    from matplotlib.ticker import FuncFormatter
     fig = Figure(figsize=(5.0, 5.0*3/4))
     canvas = FigureCanvas(fig)
     ax = fig.add_subplot(1,1,1)
@@ -2,9 +2,7 @@ import os
 import numpy as np
 import h5py
 
-from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
-from matplotlib.figure import Figure
-from matplotlib.patches import Patch
+from tagperf import h5map
 
 ANTI_LIGHT_RANGE = (-4.5, 5.0)
 ANTI_B_RANGE = (-7.0, 3.5)
@@ -13,11 +11,13 @@ ANTI_LIGHT_CUT = 0.95
 
 def draw_cut_plane(hdf_file, out_dir, ext, tagger='jfc', maxcut=0.5,
                    approval='Internal'):
-    with h5py.File(hdf_file) as in_file:
-        planes = {x: CountPlane(in_file[x][tagger]) for x in 'BUC'}
+    from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
+    from matplotlib.figure import Figure
     xlims = ANTI_LIGHT_RANGE
     ylims = ANTI_B_RANGE
-    rgb = np.dstack([planes[x].crop(xlims, ylims) for x in 'BCU'])
+    with h5py.File(hdf_file) as in_file:
+        planes = {x: CountPlane(in_file[x][tagger]) for x in 'BUC'}
+        rgb = np.dstack([planes[x].crop(xlims, ylims) for x in 'BCU'])
     rgb = np.log(rgb + 1)
     for iii in range(rgb.shape[2]):
         maxval = (rgb[:,:,iii].max() * maxcut)
@@ -51,6 +51,7 @@ def _label_axes(ax, size=14):
                   y=0.98, ha='right', size=size)
 
 def _add_legend(ax):
+    from matplotlib.patches import Patch
     rgb_patch = [Patch(color=x) for x in 'rgb']
     bcl_names = [r'$b$', r'$c$', r'$\rm light$']
     title = 'Jet Flavor'
@@ -95,16 +96,29 @@ def _add_sim_info(ax, x, y, size=16):
 
 
 class CountPlane:
-    """Handler for Dataset -> imshow."""
+    """Handler for Dataset -> imshow.
+
+    Only the bins that are asked for are read from the dataset, so the
+    file has to stay open while the plane is used.
+    """
 
     def __init__(self, ds):
-        ar = np.array(ds)[1:-1,1:-1]
+        self.ds = ds
+        n_x, n_y = [n - 2 for n in ds.shape]
         xextent = [ds.attrs[x][0] for x in ['min', 'max']]
         yextent = [ds.attrs[x][1] for x in ['min', 'max']]
-        self.xvalues = np.linspace(*xextent, num=(ar.shape[0] + 1))
-        self.yvalues = np.linspace(*yextent, num=(ar.shape[1] + 1))
-        self.array = ar
+        self.xvalues = np.linspace(*xextent, num=(n_x + 1))
+        self.yvalues = np.linspace(*yextent, num=(n_y + 1))
+
+    @property
+    def array(self):
+        return self._read(slice(0, len(self.xvalues) - 1),
+                          slice(0, len(self.yvalues) - 1))
 
+    def _read(self, xbins, ybins):
+        """read a block of bins (indexed without the overflow bins)"""
+        return h5map.read(self.ds, np.s_[xbins.start + 1:xbins.stop + 1,
+                                         ybins.start + 1:ybins.stop + 1])
 
     def crop(self, xlims=ANTI_LIGHT_RANGE, ylims=ANTI_B_RANGE):
         xv, yv = self.xvalues, self.yvalues
@@ -112,7 +126,7 @@ class CountPlane:
         xlow, xhigh = xvalid_idx[0], xvalid_idx[-1]
         yvalid_idx = np.nonzero((ylims[0] <= yv) & (yv <= ylims[1]))[0]
         ylow, yhigh = yvalid_idx[0], yvalid_idx[-1]
-        subarray = self.array[xlow:xhigh, ylow:yhigh]
+        subarray = self._read(slice(xlow, xhigh), slice(ylow, yhigh))
 
         # check to make sure we're not messing up bin edges
         xe, ye = xv[[xlow,xhigh]], yv[[ylow,yhigh]]
@@ -128,8 +142,10 @@ class CountPlane:
         vals = self.xvalues if axis == 'x' else self.yvalues
         valid_idx = np.nonzero((lims[0] <= vals) & (vals <= lims[1]))[0]
         rng = slice(valid_idx[0], valid_idx[-1])
+        other_vals = self.yvalues if axis == 'x' else self.xvalues
+        every = slice(0, len(other_vals) - 1)
         if axis == 'x':
-            yvals = self.array[rng, :].sum(1)
+            yvals = self._read(rng, every).sum(1)
         elif axis == 'y':
-            yvals = self.array[:, rng].sum(0)
+            yvals = self._read(every, rng).sum(0)
         return vals[rng], yvals
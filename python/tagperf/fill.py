@@ -0,0 +1,457 @@
+"""
+Fill the tag-perf-d3pd histograms from flat (columnar) jet data, without
+ROOT.
+
+The input is one entry per jet, either as 1D datasets in an HDF5 group or
+as `<column>.npy` files in a directory. The columns are `pt` (MeV), `eta`,
+`truth` (the truth label: 5, 4, 0 or 15), the b-tag weights `mv1`,
+`mv1c`, `mvb`, `mv2c00`, `mv2c10`, `mv2c20`, and the probabilities
+`<tagger>_pu`, `<tagger>_pc`, `<tagger>_pb` for the gaia, jfc and jfit
+taggers. Only the columns the requested histograms need have to be there.
+
+The jets are read in chunks and binned in bulk, with the same
+discriminants, selection, binning (including the underflow and overflow
+bins) and output layout as the C++ filler, so `tagperf` can read the
+result directly. The histograms to fill can be picked with the same spec
+file as `tag-perf-d3pd -c` (see include/HistSpec.hh). `PeterFiller` does
+the same for the tag-perf-peter histograms.
+"""
+import os
+
+import numpy as np
+import h5py
+
+DEFAULT_CHUNK_SIZE = 1000000
+# bins on the 1D and 2D axes, as in the C++
+DEFAULT_N_BINS = 10000
+DEFAULT_N_2AX_BINS = 2000
+
+_flavors = [('B', 5), ('C', 4), ('U', 0), ('T', 15)]
+_pt_min = 20e3
+_eta_max = 2.5
+_gaia_range = (-10.0, 10.0)
+# tag-perf-peter efficiency axis (pt), and the jfc cut, as in
+# PeterPerfHists
+_peter_eff_axis = (1000, 0.0, 1e6)
+_peter_eff_units = 'MeV'
+_jfc_anti_b_min = np.float32(-0.9)
+_jfc_anti_u_min = np.float32(0.95)
+# same chunks and filters as the C++ writer
+_chunk_elements = 2**16
+_deflate = 7
+
+# __________________________________________________________________________
+# discriminants, as in JetPerfHists.cxx. The probabilities are float32, so
+# the ratios and products are rounded to float before the log and sqrt,
+# which are taken in double, as in the C++.
+
+def _log(ratio):
+    return np.log(np.asarray(ratio, dtype=float))
+
+def btag_anti_u(pu, pc, pb):
+    return _log(pb / pu)
+
+def btag_anti_c(pu, pc, pb):
+    return _log(pb / pc)
+
+def ctag_anti_b(pu, pc, pb):
+    return _log(pc / pb)
+
+def ctag_anti_u(pu, pc, pb):
+    return _log(pc / pu)
+
+def gr1(pu, pc, pb):
+    return _log(pb / np.sqrt(np.asarray(pc * pu, dtype=float)))
+
+def _triple(tagger):
+    return ['{}_{}'.format(tagger, p) for p in ['pu', 'pc', 'pb']]
+
+class _HistDef(object):
+    """
+    Axes as (name, n_bins, low, high), and a function giving the value on
+    each axis from a dict of columns.
+    """
+    def __init__(self, axes, values, inputs):
+        self.axes = axes
+        self.values = values
+        self.inputs = inputs
+
+def _disc(function, tagger):
+    columns = _triple(tagger)
+    return lambda cols: function(*[cols[c] for c in columns])
+
+def _btag_registry(n_bins=DEFAULT_N_BINS):
+    mv1_axis = [('x', n_bins, 0.0, 1.0)]
+    mv2_axis = [('x', n_bins, -1.0, 1.0)]
+    gaia_axis = [('x', n_bins) + _gaia_range]
+    registry = {}
+    for name, axis in [('mv1', mv1_axis), ('mv1c', mv1_axis),
+                       ('mvb', mv2_axis), ('mv2c00', mv2_axis),
+                       ('mv2c10', mv2_axis), ('mv2c20', mv2_axis)]:
+        registry[name] = _HistDef(axis, lambda c, n=name: [c[n]], [name])
+    for tagger in ['gaia', 'jfc', 'jfit']:
+        for suffix, function in [('AntiU', btag_anti_u),
+                                 ('AntiC', btag_anti_c)]:
+            disc = _disc(function, tagger)
+            registry[tagger + suffix] = _HistDef(
+                gaia_axis, lambda c, d=disc: [d(c)], _triple(tagger))
+    registry['gaiaGr1'] = _HistDef(
+        gaia_axis, lambda c: [_disc(gr1, 'gaia')(c)], _triple('gaia'))
+    return registry
+
+def _ctag_registry(n_bins=DEFAULT_N_BINS, n_2ax_bins=DEFAULT_N_2AX_BINS):
+    def gaia_axis(name):
+        return (name, n_2ax_bins) + _gaia_range
+    registry = {}
+    for tagger in ['gaia', 'jfc', 'jfit']:
+        registry[tagger] = _HistDef(
+            [gaia_axis('antiU'), gaia_axis('antiB')],
+            lambda c, t=tagger: [_disc(ctag_anti_u, t)(c),
+                                 _disc(ctag_anti_b, t)(c)],
+            _triple(tagger))
+    registry['gaiaC'] = _HistDef(
+        [('x', n_bins, 0.0, 1.0)], lambda c: [c['gaia_pc']],
+        _triple('gaia'))
+    registry['gaiaBtag'] = _HistDef(
+        [gaia_axis('antiU'), gaia_axis('antiC')],
+        lambda c: [_disc(btag_anti_u, 'gaia')(c),
+                   _disc(btag_anti_c, 'gaia')(c)], _triple('gaia'))
+    # (1 - mv1c) selects c and light jets, then mv1 removes the light
+    registry['mv'] = _HistDef(
+        [('mv1', n_2ax_bins, 0.0, 1.0), ('mv1c', n_2ax_bins, 0.0, 1.0)],
+        lambda c: [c['mv1'], 1.0 - c['mv1c'].astype(float)],
+        ['mv1', 'mv1c'])
+    return registry
+
+_btag = _btag_registry()
+_ctag = _ctag_registry()
+
+# __________________________________________________________________________
+# spec
+
+def default_spec():
+    return {
+        'btag': ['mv1', 'mv1c', 'mvb', 'gaiaAntiU', 'gaiaAntiC', 'gaiaGr1',
+                 'mv2c00', 'mv2c10', 'mv2c20', 'jfcAntiU', 'jfcAntiC',
+                 'jfitAntiU', 'jfitAntiC'],
+        'ctag': ['gaia', 'jfc', 'jfit', 'gaiaC', 'gaiaBtag', 'mv'],
+        'pt_bins': [0, 20, 30, 40, 50, 60, 75, 90, 110, 150, 200, 600,
+                    np.inf],
+        }
+
+def read_spec(file_name):
+    """
+    Read a histogram spec file, keys that aren't given keep the default.
+    """
+    keys = []
+    with open(file_name) as spec_file:
+        for line_number, line in enumerate(spec_file, 1):
+            line = line.split('#')[0].strip()
+            if not line:
+                continue
+            if line.startswith('-') and keys:
+                keys[-1][1].append(line[1:].strip())
+                continue
+            if ':' not in line:
+                raise ValueError("{}, line {}: expected 'key:'".format(
+                        file_name, line_number))
+            key, value = [part.strip() for part in line.split(':', 1)]
+            value = value.strip('[]')
+            keys.append((key, [v.strip() for v in value.split(',')
+                               if v.strip()]))
+    spec = default_spec()
+    for key, values in keys:
+        if key not in spec:
+            raise ValueError("unknown key '{}' in {}".format(key, file_name))
+        if key == 'pt_bins':
+            # yaml writes infinity as .inf
+            values = [float(v[1:] if v.lower() == '.inf' else v)
+                      for v in values]
+        spec[key] = values
+    edges = spec['pt_bins']
+    if len(edges) < 2 or np.any(np.diff(edges) <= 0):
+        raise ValueError('pt_bins must be at least two increasing edges')
+    return spec
+
+def required_columns(spec):
+    columns = {'pt', 'eta', 'truth'}
+    for names, registry in [(spec['btag'], _btag), (spec['ctag'], _ctag)]:
+        for name in names:
+            if name not in registry:
+                raise ValueError('no histogram called ' + name)
+            columns.update(registry[name].inputs)
+    return columns
+
+# __________________________________________________________________________
+# reading
+
+class _Columns(object):
+    """
+    Columns of an HDF5 group or a directory of .npy files.
+    """
+    def __init__(self, in_name, group=None):
+        self._h5 = None
+        if os.path.isdir(in_name):
+            self._columns = {
+                name[:-len('.npy')]: os.path.join(in_name, name)
+                for name in os.listdir(in_name) if name.endswith('.npy')}
+        else:
+            self._h5 = h5py.File(in_name, 'r')
+            self._group = self._h5[group] if group else self._h5
+            self._columns = {name: None for name, obj in self._group.items()
+                             if isinstance(obj, h5py.Dataset)}
+
+    def check(self, needed):
+        missing = sorted(set(needed) - set(self._columns))
+        if missing:
+            raise ValueError('missing columns: ' + ', '.join(missing))
+        lengths = {len(self.get(name)) for name in needed}
+        if len(lengths) != 1:
+            raise ValueError('columns have different lengths')
+        return lengths.pop()
+
+    def get(self, name):
+        if self._h5 is not None:
+            return self._group[name]
+        return np.load(self._columns[name], mmap_mode='r')
+
+    def close(self):
+        if self._h5 is not None:
+            self._h5.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def _read_chunks(columns, names, n_jets, chunk_size):
+    """
+    Generate dicts of column arrays. Everything but the truth label is
+    read as float32, like the branches the C++ reads.
+    """
+    arrays = {name: columns.get(name) for name in names}
+    for start in range(0, n_jets, chunk_size):
+        chunk = {}
+        for name, array in arrays.items():
+            dtype = int if name == 'truth' else np.float32
+            chunk[name] = np.asarray(array[start:start + chunk_size],
+                                     dtype=dtype)
+        yield chunk
+
+# __________________________________________________________________________
+# filling
+
+def _bin_index(values, axes):
+    """
+    Flat bin index (with underflow and overflow on every axis) and a mask
+    of the entries to keep, i.e. those without NaNs.
+    """
+    keep = np.ones(len(values[0]), dtype=bool)
+    index = np.zeros(len(values[0]), dtype=np.int64)
+    for value, (_, n_bins, low, high) in zip(values, axes):
+        value = np.asarray(value, dtype=float)
+        keep &= ~np.isnan(value)
+        with np.errstate(invalid='ignore'):
+            scaled = (value - low) / (high - low) * n_bins
+            bins = np.clip(np.floor(np.nan_to_num(scaled)), -1, n_bins - 1)
+            bins = bins.astype(np.int64) + 1
+            bins[value >= high] = n_bins + 1
+        index = index * (n_bins + 2) + bins
+    return index, keep
+
+def _accumulate(counts, index):
+    if counts.size > 4 * len(index):
+        bins, n_in_bin = np.unique(index, return_counts=True)
+        counts[bins] += n_in_bin
+    else:
+        counts += np.bincount(index, minlength=counts.size)
+
+def _shape(hist_def):
+    return tuple(n_bins + 2 for _, n_bins, _, _ in hist_def.axes)
+
+class Filler(object):
+    """
+    Histograms for every flavor, filled a chunk of jets at a time.
+    Counts are kept as flat arrays with one block per flavor (and pt bin).
+    The number of bins on the 1D and 2D axes can be changed from the
+    tag-perf-d3pd ones (i.e. for tests).
+    """
+    def __init__(self, spec=None, n_bins=DEFAULT_N_BINS,
+                 n_2ax_bins=DEFAULT_N_2AX_BINS):
+        self.spec = spec or default_spec()
+        required_columns(self.spec)
+        self._btag, self._ctag = _btag, _ctag
+        if (n_bins, n_2ax_bins) != (DEFAULT_N_BINS, DEFAULT_N_2AX_BINS):
+            self._btag = _btag_registry(n_bins)
+            self._ctag = _ctag_registry(n_bins, n_2ax_bins)
+        self.pt_edges = np.asarray(self.spec['pt_bins'], dtype=float) * 1e3
+        n_flav, n_pt = len(_flavors), len(self.pt_edges) - 1
+        self.btag = {}
+        for name in self.spec['btag']:
+            size = np.prod(_shape(self._btag[name]))
+            self.btag[name] = (np.zeros(n_flav * size, dtype=np.int64),
+                               np.zeros(n_flav * n_pt * size, dtype=np.int64))
+        self.ctag = {}
+        for name in self.spec['ctag']:
+            size = np.prod(_shape(self._ctag[name]))
+            self.ctag[name] = np.zeros(n_flav * size, dtype=np.int64)
+
+    def fill(self, cols):
+        flavor = _flavor_numbers(cols['truth'])
+        # same jet selection as buildHists, other truth labels are dropped
+        with np.errstate(invalid='ignore'):
+            sel = ~((cols['pt'] < _pt_min) | (np.abs(cols['eta']) > _eta_max))
+        sel &= flavor >= 0
+        cols = {name: col[sel] for name, col in cols.items()}
+        flavor = flavor[sel]
+        n_pt = len(self.pt_edges) - 1
+        pt_bin = np.searchsorted(self.pt_edges, cols['pt'], side='right') - 1
+        in_pt = (pt_bin >= 0) & (pt_bin < n_pt)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for name, (all_counts, pt_counts) in self.btag.items():
+                hist_def = self._btag[name]
+                size = np.prod(_shape(hist_def))
+                index, keep = _bin_index(hist_def.values(cols), hist_def.axes)
+                _accumulate(all_counts, (flavor * size + index)[keep])
+                pt_keep = keep & in_pt
+                block = flavor * n_pt + pt_bin
+                _accumulate(pt_counts, (block * size + index)[pt_keep])
+            for name, counts in self.ctag.items():
+                hist_def = self._ctag[name]
+                size = np.prod(_shape(hist_def))
+                index, keep = _bin_index(hist_def.values(cols), hist_def.axes)
+                _accumulate(counts, (flavor * size + index)[keep])
+
+    def write(self, out_name):
+        n_pt = len(self.pt_edges) - 1
+        bin_names = _pt_bin_names(self.spec['pt_bins'])
+        with h5py.File(out_name, 'w-') as out_file:
+            for number, (flav, _) in enumerate(_flavors):
+                btag = out_file.create_group(flav + '/btag')
+                all_pt = btag.create_group('all')
+                pt_bins = btag.create_group('ptBins')
+                for name, (all_counts, pt_counts) in self.btag.items():
+                    hist_def = self._btag[name]
+                    shape = _shape(hist_def)
+                    _write(all_pt, name, hist_def,
+                           all_counts.reshape((-1,) + shape)[number])
+                    per_pt = pt_counts.reshape((-1, n_pt) + shape)[number]
+                    for bin_name, counts in zip(bin_names, per_pt):
+                        group = pt_bins.require_group(bin_name)
+                        _write(group, name, hist_def, counts)
+                ctag = out_file.create_group(flav + '/ctag/all')
+                for name, counts in self.ctag.items():
+                    hist_def = self._ctag[name]
+                    shape = _shape(hist_def)
+                    _write(ctag, name, hist_def,
+                           counts.reshape((-1,) + shape)[number])
+
+class PeterFiller(object):
+    """
+    The tag-perf-peter histograms (see PeterPerfHists.cxx): the c-tag
+    plane of jfc and jfit, and the pt of the jets passing and failing a
+    cut on jfc, for every flavor. Jets are selected as in
+    fillPetersHists, which also needs a `jvf` column.
+    """
+    def __init__(self, n_2ax_bins=DEFAULT_N_2AX_BINS):
+        plane_axes = [('antiU', n_2ax_bins) + _gaia_range,
+                      ('antiB', n_2ax_bins) + _gaia_range]
+        self._planes = {}
+        for tagger in ['jfc', 'jfit']:
+            self._planes[tagger] = _HistDef(
+                plane_axes,
+                lambda c, t=tagger: [_disc(ctag_anti_u, t)(c),
+                                     _disc(ctag_anti_b, t)(c)],
+                _triple(tagger))
+        self._eff = _HistDef([('x',) + _peter_eff_axis], lambda c: [c['pt']],
+                             ['pt'])
+        n_flav = len(_flavors)
+        self.planes = {
+            name: np.zeros(n_flav * np.prod(_shape(hist_def)), dtype=np.int64)
+            for name, hist_def in self._planes.items()}
+        eff_size = np.prod(_shape(self._eff))
+        self.efficiency = {name: np.zeros(n_flav * eff_size, dtype=np.int64)
+                           for name in ['pass', 'fail']}
+
+    def fill(self, cols):
+        flavor = _flavor_numbers(cols['truth'])
+        abs_eta = np.abs(cols['eta'])
+        with np.errstate(invalid='ignore'):
+            ok_jvf = ((cols['jvf'] > 0.5) | (abs_eta > 2.4) |
+                      (cols['pt'] > 50e3))
+            sel = ~((cols['pt'] < _pt_min) | (abs_eta > _eta_max))
+        sel &= ok_jvf & (flavor >= 0)
+        cols = {name: col[sel] for name, col in cols.items()}
+        flavor = flavor[sel]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for name, counts in self.planes.items():
+                hist_def = self._planes[name]
+                size = np.prod(_shape(hist_def))
+                index, keep = _bin_index(hist_def.values(cols), hist_def.axes)
+                _accumulate(counts, (flavor * size + index)[keep])
+            jfc = [cols[c] for c in _triple('jfc')]
+            passing = ((ctag_anti_u(*jfc) > _jfc_anti_u_min) &
+                       (ctag_anti_b(*jfc) > _jfc_anti_b_min))
+        size = np.prod(_shape(self._eff))
+        index, keep = _bin_index(self._eff.values(cols), self._eff.axes)
+        index = flavor * size + index
+        _accumulate(self.efficiency['pass'], index[keep & passing])
+        _accumulate(self.efficiency['fail'], index[keep & ~passing])
+
+    def write(self, out_name):
+        with h5py.File(out_name, 'w-') as out_file:
+            for number, (flav, _) in enumerate(_flavors):
+                group = out_file.create_group(flav)
+                for name, counts in self.planes.items():
+                    hist_def = self._planes[name]
+                    _write(group, name, hist_def, counts.reshape(
+                            (-1,) + _shape(hist_def))[number])
+                eff_group = group.create_group('efficiency')
+                for name, counts in self.efficiency.items():
+                    _write(eff_group, name, self._eff, counts.reshape(
+                            (-1,) + _shape(self._eff))[number],
+                           units=_peter_eff_units)
+
+def _flavor_numbers(truth):
+    """
+    Position of each jet's flavor in _flavors, -1 for other labels.
+    """
+    flavor = np.full(len(truth), -1)
+    for number, (_, label) in enumerate(_flavors):
+        flavor[truth == label] = number
+    return flavor
+
+def _pt_bin_names(edges_gev):
+    def name(edge):
+        return 'INF' if np.isinf(edge) else str(int(edge * 1e3) // 1000)
+    return ['{}-{}'.format(name(low), name(high))
+            for low, high in zip(edges_gev[:-1], edges_gev[1:])]
+
+def _write(group, name, hist_def, counts, units=''):
+    edge = int(round(_chunk_elements ** (1.0 / counts.ndim)))
+    chunks = tuple(min(n, edge) for n in counts.shape)
+    ds = group.create_dataset(
+        name, data=counts.astype(float), chunks=chunks,
+        compression='gzip', compression_opts=_deflate, shuffle=True)
+    ds.attrs['min'] = np.array([low for _, _, low, _ in hist_def.axes])
+    ds.attrs['max'] = np.array([high for _, _, _, high in hist_def.axes])
+    ds.attrs['units'] = units
+
+def fill(in_name, out_name, spec=None, group=None,
+         chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Fill histograms from the jets in in_name (an HDF5 file, with the
+    columns in `group`, or a directory of .npy files) and write them to a
+    new file out_name. Returns the number of jets read.
+    """
+    filler = Filler(spec)
+    needed = required_columns(filler.spec)
+    with _Columns(in_name, group) as columns:
+        n_jets = columns.check(needed)
+        for chunk in _read_chunks(columns, needed, n_jets, chunk_size):
+            filler.fill(chunk)
+    filler.write(out_name)
+    return n_jets
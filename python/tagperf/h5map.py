@@ -0,0 +1,69 @@
+"""
+Read-only arrays from HDF5 datasets, mapped from the file when possible.
+
+Datasets stored in one contiguous block without filters (what ndhist and
+h5py write by default), in a file opened read-only, are mapped straight
+from the file with numpy.memmap instead of being copied through h5py.
+Slicing the result (i.e. dropping the overflow bins, or cropping) gives a
+view, nothing is read from disk until it's used, and processes reading
+the same file share the pages in the OS cache. The array stays valid
+after the file is closed.
+
+Anything else (chunked or compressed datasets like the ones tag-perf-*
+writes, files open for writing, in-memory files) is read through h5py,
+only the part that's asked for. Either way the array is read-only, so
+code that works with one works with the other.
+"""
+import os
+
+import numpy as np
+import h5py
+
+from tagperf.profiling import span
+
+def is_mappable(ds):
+    """
+    True if ds can be mapped from its file.
+    """
+    return _offset(ds) is not None
+
+def read(ds, index=Ellipsis):
+    """
+    Read-only array holding ds[index].
+    """
+    offset = _offset(ds)
+    with span('read', dataset=ds.name, mapped=offset is not None):
+        if offset is not None:
+            file_name = os.fsdecode(h5py.h5i.get_file_id(ds.id).name)
+            array = np.memmap(file_name, dtype=ds.dtype, mode='r',
+                              offset=offset, shape=ds.shape)
+            # a plain ndarray view, not a memmap subclass
+            array = np.asarray(array.view(np.ndarray)[index])
+        else:
+            array = np.asarray(ds[index])
+        array.flags.writeable = False
+    return array
+
+def _offset(ds):
+    """
+    Byte offset of the data in the file, None if it can't be mapped.
+    """
+    # cheapest checks first, most datasets are chunked and stop here
+    plist = ds.id.get_create_plist()
+    if plist.get_layout() != h5py.h5d.CONTIGUOUS:
+        return None
+    if plist.get_nfilters() or plist.get_external_count():
+        return None
+    if ds.dtype.kind not in 'biuf' or ds.size == 0 or ds.shape == ():
+        return None
+    # a dataset that was never written has no storage to map (HDF5 may
+    # still give an offset), h5py reads it as the fill value
+    if ds.id.get_space_status() != h5py.h5d.SPACE_STATUS_ALLOCATED:
+        return None
+    # going through ds.file is slow, use the low level file id
+    file_id = h5py.h5i.get_file_id(ds.id)
+    if file_id.get_intent() != h5py.h5f.ACC_RDONLY:
+        return None
+    if file_id.get_access_plist().get_driver() != h5py.h5fd.SEC2:
+        return None
+    return ds.id.get_offset()
@@ -0,0 +1,190 @@
+"""
+Memoized 'integrated from the top' histograms.
+
+Most of the c-tagging numbers start by reversing a histogram along every
+axis and taking the cumulative sum, so that each bin holds the number of
+jets passing a cut at that bin. The same datasets get integrated over and
+over in one run, so the results are kept here, keyed by (file, dataset),
+and handed out as read-only arrays. The store has a memory budget, once
+it's exceeded the least recently used integrals are dropped.
+
+There's also an opt-in low memory mode, where datasets are read in blocks
+straight into the (reversed) output array, integrated in place, and stored
+as 32 bit unsigned integers when that's exact, i.e. for unweighted counts
+below 2**32. Dividing them gives float64, so the efficiencies and
+rejections are the same as without the low memory mode.
+"""
+from collections import OrderedDict
+import os
+import resource
+import sys
+
+import numpy as np
+import h5py
+
+from tagperf import h5map
+from tagperf.profiling import span
+
+DEFAULT_BUDGET = 1024**3
+
+def integrate(array):
+    """
+    Cumulative sum 'from the top' along every axis.
+    """
+    array = np.asarray(array)
+    integral = array[(slice(None, None, -1),) * array.ndim]
+    for axis in range(array.ndim):
+        integral = integral.cumsum(axis=axis)
+    return integral
+
+_block_rows = 256
+_uint32_limit = 2**32
+
+def integrate_low_memory(ds):
+    """
+    Same as integrate, without full size temporaries.
+    """
+    if not isinstance(ds, h5py.Dataset) or ds.ndim == 0:
+        return integrate(ds)
+    integral = _read_reversed(ds, np.uint32)
+    if integral is None:
+        integral = _read_reversed(ds, np.float64)
+    for axis in range(integral.ndim):
+        # keep the dtype, otherwise numpy sums uint32 as uint64
+        np.cumsum(integral, axis=axis, dtype=integral.dtype, out=integral)
+    return integral
+
+def _read_reversed(ds, dtype):
+    """
+    Read ds reversed along every axis, one block of rows at a time.
+    Returns None if dtype can't hold the integral exactly.
+    """
+    out = np.empty(ds.shape, dtype=dtype)
+    n_rows = ds.shape[0]
+    check = np.dtype(dtype) == np.uint32
+    total = 0.0
+    for start in range(0, n_rows, _block_rows):
+        stop = min(start + _block_rows, n_rows)
+        block = ds[start:stop]
+        if check:
+            if block.size and block.min() < 0:
+                return None
+            total += block.sum()
+            if total >= _uint32_limit or np.any(block != np.round(block)):
+                return None
+        out[n_rows - stop:n_rows - start] = block[
+            (slice(None, None, -1),) * block.ndim]
+    return out
+
+def peak_memory():
+    """
+    Peak resident memory (in bytes) of this process and of the largest
+    of its finished children.
+    """
+    scale = 1 if sys.platform == 'darwin' else 1024
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return usage * scale, children * scale
+
+def count_below(sorted_rows, thresholds, inclusive=False):
+    """
+    Count the entries below each threshold in every row of sorted_rows,
+    which has to be sorted (non-decreasing) along the rows, as integrated
+    histograms are. With inclusive, entries equal to the threshold are
+    counted too. Returns an array of shape (n thresholds, n rows).
+
+    Does a binary search over all rows and thresholds at once, rather
+    than comparing every entry in the array to every threshold.
+    """
+    n_rows, n_cols = sorted_rows.shape
+    rows = np.arange(n_rows)
+    shape = (len(thresholds), n_rows)
+    low = np.zeros(shape, dtype=int)
+    high = np.full(shape, n_cols, dtype=int)
+    thresholds = np.asarray(thresholds)[:, None]
+    below_threshold = np.less_equal if inclusive else np.less
+    while True:
+        searching = low < high
+        if not searching.any():
+            return low
+        mid = np.minimum((low + high) // 2, n_cols - 1)
+        below = below_threshold(sorted_rows[rows, mid], thresholds)
+        low = np.where(searching & below, mid + 1, low)
+        high = np.where(searching & ~below, mid, high)
+
+def _key(ds):
+    file_name = os.path.realpath(ds.file.filename)
+    try:
+        mtime = os.stat(file_name).st_mtime_ns
+    except OSError:
+        mtime = None
+    return file_name, mtime, ds.name
+
+class IntegralStore(object):
+    """
+    Least recently used cache of integrated datasets.
+    """
+    def __init__(self, budget=DEFAULT_BUDGET, low_memory=False):
+        self.budget = budget
+        self.low_memory = low_memory
+        self.size = 0
+        self._integrals = OrderedDict()
+
+    def get(self, ds):
+        """
+        Return the integral of ds. Datasets are memoized, anything else
+        (i.e. a numpy array) is just integrated.
+        """
+        if not isinstance(ds, h5py.Dataset):
+            return integrate(ds)
+        key = _key(ds)
+        if key in self._integrals:
+            integral = self._integrals.pop(key)
+        else:
+            if self.low_memory:
+                # make room first, so we don't briefly go over budget
+                self._evict(reserve=ds.size * ds.dtype.itemsize)
+                with span('integrate', dataset=ds.name, low_memory=True):
+                    integral = integrate_low_memory(ds)
+            else:
+                array = h5map.read(ds)
+                with span('integrate', dataset=ds.name):
+                    integral = integrate(array)
+            integral.flags.writeable = False
+            self.size += integral.nbytes
+        self._integrals[key] = integral
+        self._evict()
+        return integral
+
+    def clear(self):
+        self._integrals.clear()
+        self.size = 0
+
+    def _evict(self, reserve=0):
+        while self.size + reserve > self.budget and self._integrals:
+            _, integral = self._integrals.popitem(last=False)
+            self.size -= integral.nbytes
+
+_store = IntegralStore()
+
+def get_integral(ds):
+    """
+    Integrated version of ds from the process-wide store.
+    """
+    return _store.get(ds)
+
+def set_budget(budget):
+    """
+    Set the memory budget (in bytes) for the process-wide store.
+    """
+    _store.budget = budget
+    _store._evict()
+
+def set_low_memory(low_memory=True):
+    """
+    Turn the low memory mode on or off for the process-wide store.
+    """
+    _store.low_memory = low_memory
+
+def is_low_memory():
+    return _store.low_memory
@@ -0,0 +1,171 @@
+"""
+Run plotting jobs, optionally in a pool of worker processes.
+
+Each family of plots is described as a list of stages, where each stage
+is a list of independent Tasks. Stages run in order, but the tasks within
+a stage (and the stages of different families) can run at the same time.
+"""
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import h5py
+
+from tagperf import profiling
+
+class Task(object):
+    """
+    A named (and picklable, if the function is) function call.
+    """
+    def __init__(self, name, function, *args, **kwargs):
+        self.name = name
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+    def __call__(self):
+        return self.function(*self.args, **self.kwargs)
+
+class FileTask(Task):
+    """
+    Task for a function that takes one or more open HDF5 files as its
+    leading arguments. The files are opened read-only when the task runs.
+    """
+    def __init__(self, name, file_names, function, *args, **kwargs):
+        super(FileTask, self).__init__(name, function, *args, **kwargs)
+        if isinstance(file_names, str):
+            file_names = [file_names]
+        self.file_names = list(file_names)
+    def __call__(self):
+        files = [h5py.File(name, 'r') for name in self.file_names]
+        try:
+            return self.function(*(files + list(self.args)), **self.kwargs)
+        finally:
+            for h5_file in files:
+                h5_file.close()
+
+def run_stages(stages):
+    """
+    Run the stages of one family in this process, one task at a time.
+    """
+    for stage in stages:
+        for task in stage:
+            task()
+
+def run(families, n_jobs=1, initializer=None, initargs=(), manifest=None):
+    """
+    Run a dict of families (name -> list of stages).
+
+    With one job everything runs here, in order, and errors are raised as
+    usual. With more, the tasks go to a pool of n_jobs processes; errors
+    don't stop the other families but skip the later stages of the family
+    they happen in. Returns a list of (family, task name, traceback) for
+    the tasks that failed.
+
+    If a tagperf.build.Manifest is given, tasks with up to date outputs
+    are skipped, and the manifest is updated for the ones that run.
+    """
+    if n_jobs <= 1:
+        try:
+            for family, stages in families.items():
+                for stage in stages:
+                    for task in _to_run(family, stage, manifest):
+                        record = _run_one(task, manifest)
+                        _finish(manifest, family, task, record)
+        finally:
+            _save(manifest)
+        return []
+
+    failures = []
+    remaining = {name: list(stages) for name, stages in families.items()}
+    running = {name: 0 for name in families}
+    pending = {}
+    with ProcessPoolExecutor(n_jobs, initializer=initializer,
+                             initargs=initargs) as pool:
+        def submit_next(family):
+            while remaining[family]:
+                stage = _to_run(family, remaining[family].pop(0), manifest)
+                for task in stage:
+                    future = pool.submit(_run_task, task, manifest is not None)
+                    pending[future] = (family, task)
+                running[family] = len(stage)
+                if stage:
+                    return
+        for family in families:
+            submit_next(family)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                family, task = pending.pop(future)
+                running[family] -= 1
+                try:
+                    error, record, events = future.result()
+                    profiling.add_events(events)
+                except Exception:
+                    error, record = traceback.format_exc(), None
+                if error:
+                    failures.append((family, task.name, error))
+                    remaining[family] = []
+                else:
+                    _finish(manifest, family, task, record)
+                if running[family] == 0:
+                    submit_next(family)
+    _save(manifest)
+    return failures
+
+def report(failures, stream=sys.stderr):
+    """
+    Print the failures returned by `run`, returns the number of them.
+    """
+    for family, task_name, error in failures:
+        stream.write('==== {} failed ({}) ====\n{}\n'.format(
+                task_name, family, error))
+    if failures:
+        stream.write('{} task(s) failed: {}\n'.format(
+                len(failures), ', '.join(name for _, name, _ in failures)))
+    return len(failures)
+
+def _run_one(task, manifest):
+    with profiling.span(task.name, category='task'):
+        if manifest is None:
+            task()
+            return None
+        from tagperf.build import run_recorded
+        return run_recorded(task)
+
+def _run_task(task, recorded):
+    """
+    Worker side: run the task, return the traceback if it fails, the
+    record of what it did if asked for one, and the profiling events.
+    """
+    error, record = None, None
+    try:
+        with profiling.span(task.name, category='task'):
+            if recorded:
+                from tagperf.build import run_recorded
+                record = run_recorded(task)
+            else:
+                task()
+    except Exception:
+        error = traceback.format_exc()
+    return error, record, profiling.take_events()
+
+def _to_run(family, stage, manifest):
+    """
+    The tasks in a stage that aren't up to date. This is checked when the
+    stage starts, since earlier stages can change the inputs.
+    """
+    if manifest is None:
+        return stage
+    skipped = [task for task in stage if manifest.is_current(family, task)]
+    if skipped:
+        print('{}: up to date: {}'.format(
+                family, ', '.join(task.name for task in skipped)))
+    return [task for task in stage if task not in skipped]
+
+def _finish(manifest, family, task, record):
+    if manifest is not None and record is not None:
+        manifest.update(family, task, record)
+
+def _save(manifest):
+    if manifest is not None:
+        manifest.save()
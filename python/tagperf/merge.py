@@ -0,0 +1,234 @@
+"""
+Add up the histogram files written by several tag-perf-* jobs.
+
+Every dataset in the inputs (i.e. `<flavor>/btag/ptBins/<bin>/<tagger>`)
+is summed into the same place in the output. The inputs have to hold the
+same datasets, with the same shapes, types and axis attributes ('min',
+'max', 'units'), otherwise nothing is written.
+
+Outputs from tag-perf-* jobs that ran over parts of the same chain (with
+--first-entry, --n-entries or --shard) record which entries they read.
+Inputs from the same chain that read any entry twice aren't merged. If
+all the inputs come from one chain the output keeps the list of ranges,
+so it can be checked again when it's merged with others. Inputs that
+don't record their ranges (older ones) are merged with a warning; the
+others are still checked, but the output has no list of ranges.
+
+The datasets are read a block of rows at a time, so memory doesn't grow
+with the number or size of the inputs. Blocks (or bundles of small
+datasets) are independent: with more than one job they're summed in a
+pool of worker processes, and the parent process only writes the sums.
+Each bundle opens the inputs one at a time, so merging thousands of
+shards doesn't run into the limit on open files.
+"""
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+import h5py
+
+DEFAULT_BLOCK_BYTES = 16 * 1024**2
+_axis_attrs = ['min', 'max', 'units']
+_run_attrs = ['input_files', 'chain_entries', 'entry_ranges']
+
+def merge(in_names, out_name, n_jobs=1, block_bytes=DEFAULT_BLOCK_BYTES):
+    """
+    Sum the histograms in in_names into a new file out_name.
+    """
+    if not in_names:
+        raise ValueError('no files to merge')
+    layout = _check_layout(in_names)
+    run_info = _check_run_info(in_names)
+    blocks = list(_split(layout, block_bytes))
+    tmp_name = '{}.{}.tmp'.format(out_name, os.getpid())
+    try:
+        with h5py.File(tmp_name, 'w') as out_file:
+            _copy_layout(in_names[0], out_file, layout)
+            for key, value in run_info.items():
+                out_file.attrs[key] = value
+            for path, rows, block in _summed(in_names, blocks, n_jobs):
+                out_file[path][rows] = block
+        os.replace(tmp_name, out_name)
+    finally:
+        if os.path.isfile(tmp_name):
+            os.remove(tmp_name)
+
+# __________________________________________________________________________
+# checking the inputs
+
+def _datasets(h5_file):
+    """
+    Shape, dtype and axis attributes of every dataset, keyed by path.
+    """
+    found = {}
+    def add(name, obj):
+        if isinstance(obj, h5py.Dataset):
+            attrs = {key: np.asarray(obj.attrs[key]).tolist()
+                     for key in _axis_attrs if key in obj.attrs}
+            found[name] = (obj.shape, obj.dtype, attrs)
+    h5_file.visititems(add)
+    return found
+
+def _check_layout(in_names):
+    with h5py.File(in_names[0], 'r') as first:
+        layout = _datasets(first)
+    for name in in_names[1:]:
+        with h5py.File(name, 'r') as h5_file:
+            other = _datasets(h5_file)
+        missing = sorted(set(layout) ^ set(other))
+        if missing:
+            raise ValueError('{} and {} have different datasets: {}'.format(
+                    in_names[0], name, ', '.join(missing[:5])))
+        for path, (shape, dtype, attrs) in layout.items():
+            o_shape, o_dtype, o_attrs = other[path]
+            if o_shape != shape:
+                raise ValueError('{} in {} has shape {}, expected {}'.format(
+                        path, name, o_shape, shape))
+            if o_dtype != dtype:
+                raise ValueError('{} in {} has type {}, expected {}'.format(
+                        path, name, o_dtype, dtype))
+            if o_attrs != attrs:
+                raise ValueError('{} in {} has axes {}, expected {}'.format(
+                        path, name, o_attrs, attrs))
+    return layout
+
+def _run_info(name):
+    with h5py.File(name, 'r') as h5_file:
+        if not all(key in h5_file.attrs for key in _run_attrs):
+            return None
+        attrs = h5_file.attrs
+        files = tuple(f.decode() if isinstance(f, bytes) else str(f)
+                      for f in attrs['input_files'])
+        ranges = np.asarray(attrs['entry_ranges']).reshape(-1, 2)
+        return (files, int(attrs['chain_entries'])), ranges
+
+def _check_run_info(in_names):
+    """
+    Check that no two inputs read the same entries of a chain, return
+    the run attributes for the output.
+    """
+    chains, unchecked = {}, []
+    for name in in_names:
+        info = _run_info(name)
+        if info is None:
+            # written before the ranges were saved, can't be checked
+            unchecked.append(name)
+            continue
+        chain, ranges = info
+        chains.setdefault(chain, []).extend(
+            (begin, end, name) for begin, end in ranges.tolist())
+    if unchecked:
+        names = ', '.join(unchecked[:3])
+        if len(unchecked) > 3:
+            names += ' and {} more'.format(len(unchecked) - 3)
+        warnings.warn("{} don't record the entries they read, can't check "
+                      "them for overlaps".format(names))
+    for chain, ranges in chains.items():
+        ranges.sort()
+        for (_, end, first), (begin, _, second) in zip(ranges, ranges[1:]):
+            if begin < end:
+                raise ValueError(
+                    '{} and {} both read entry {} of the same chain'.format(
+                        first, second, begin))
+    if not chains:
+        return {}
+    str_type = h5py.special_dtype(vlen=str)
+    if len(chains) != 1:
+        files = []
+        for chain_files, _ in chains:
+            files += [f for f in chain_files if f not in files]
+        return {'input_files': np.array(files, dtype=str_type)}
+    (files, n_entries), ranges = chains.popitem()
+    run_info = {'input_files': np.array(files, dtype=str_type),
+                'chain_entries': n_entries}
+    # without all the ranges the output can't be checked again
+    if not unchecked:
+        run_info['entry_ranges'] = np.array([r[:2] for r in ranges],
+                                            dtype='i8')
+    return run_info
+
+def _copy_layout(in_name, out_file, layout):
+    """
+    Create the groups and (empty) datasets, with all their attributes
+    and the same storage layout.
+    """
+    with h5py.File(in_name, 'r') as in_file:
+        def copy(name, obj):
+            if isinstance(obj, h5py.Dataset):
+                shape, dtype, _ = layout[name]
+                # same chunks and filters as the tag-perf-* output
+                new = out_file.create_dataset(
+                    name, shape, dtype=dtype, chunks=obj.chunks,
+                    compression=obj.compression,
+                    compression_opts=obj.compression_opts,
+                    shuffle=obj.shuffle)
+            else:
+                new = out_file.require_group(name)
+            for key, value in obj.attrs.items():
+                new.attrs[key] = value
+        in_file.visititems(copy)
+
+# __________________________________________________________________________
+# summing
+
+def _split(layout, block_bytes):
+    """
+    Cut the datasets into blocks of rows no bigger than block_bytes, and
+    bundle small datasets so each job is about that size.
+    """
+    bundle, bundle_bytes = [], 0
+    for path, (shape, dtype, _) in sorted(layout.items()):
+        n_rows = shape[0] if shape else 1
+        row_bytes = max(dtype.itemsize * int(np.prod(shape[1:])), 1)
+        step = max(block_bytes // row_bytes, 1)
+        for start in range(0, n_rows, step):
+            rows = slice(start, min(start + step, n_rows)) if shape else ()
+            size = row_bytes * (min(start + step, n_rows) - start)
+            if bundle and bundle_bytes + size > block_bytes:
+                yield bundle
+                bundle, bundle_bytes = [], 0
+            bundle.append((path, rows))
+            bundle_bytes += size
+    if bundle:
+        yield bundle
+
+def _summed(in_names, blocks, n_jobs):
+    """
+    Generate (path, rows, sum) for every block.
+    """
+    if n_jobs <= 1:
+        for bundle in blocks:
+            for summed in _sum_bundle(in_names, bundle):
+                yield summed
+        return
+    pending = set()
+    with ProcessPoolExecutor(n_jobs) as pool:
+        for bundle in blocks:
+            # only a few bundles in flight, so memory stays bounded
+            if len(pending) >= 2 * n_jobs:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for summed in future.result():
+                        yield summed
+            pending.add(pool.submit(_sum_bundle, in_names, bundle))
+        for future in pending:
+            for summed in future.result():
+                yield summed
+
+def _sum_bundle(in_names, bundle):
+    """
+    Sum a bundle over the inputs. They're opened one at a time, so the
+    number of open files doesn't grow with the number of inputs.
+    """
+    totals = [None] * len(bundle)
+    for name in in_names:
+        with h5py.File(name, 'r') as h5_file:
+            for index, (path, rows) in enumerate(bundle):
+                block = h5_file[path][rows]
+                if totals[index] is None:
+                    totals[index] = np.array(block)
+                else:
+                    totals[index] += block
+    return [(path, rows, total)
+            for (path, rows), total in zip(bundle, totals)]
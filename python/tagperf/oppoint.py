@@ -0,0 +1,80 @@
+"""
+Efficiencies and rejections at 2d (anti-light, anti-bottom) cuts.
+
+Each flavor histogram is integrated once into a summed-area table (see
+tagperf.integral), after which the number of jets passing any cut is a
+single lookup. Cuts are snapped to the nearest bin edge, so the numbers
+are exact for the snapped cut. Any number of cuts can be given as an
+(n_cuts, 2) array and are evaluated together.
+"""
+import numpy as np
+
+from tagperf.integral import get_integral
+
+class SummedAreaTable(object):
+    """
+    Counts above cuts for one histogram with under and overflow bins,
+    and 'min' / 'max' attributes giving the range of the inner bins.
+    """
+    def __init__(self, dataset):
+        self.integral = get_integral(dataset)
+        self.mins = np.asarray(dataset.attrs['min'], dtype=float)
+        self.maxes = np.asarray(dataset.attrs['max'], dtype=float)
+        self.n_bins = np.array(dataset.shape) - 2
+        self.total = self.integral[(-1,) * self.integral.ndim]
+
+    def edges(self, axis):
+        """
+        Bin edges along one axis (not counting the under / overflow).
+        """
+        return np.linspace(self.mins[axis], self.maxes[axis],
+                           self.n_bins[axis] + 1)
+
+    def first_passing_bin(self, cuts):
+        """
+        Index (including the underflow bin) of the first bin passing each
+        cut along each axis. Cuts are snapped to the nearest edge, cuts
+        below the lower edge let the underflow through.
+        """
+        cuts = np.asarray(cuts, dtype=float)
+        width = (self.maxes - self.mins) / self.n_bins
+        edge = np.floor((cuts - self.mins) / width + 0.5).astype(int)
+        return np.clip(edge, -1, self.n_bins) + 1
+
+    def snapped(self, cuts):
+        """
+        The cut values that are actually applied.
+        """
+        width = (self.maxes - self.mins) / self.n_bins
+        first = self.first_passing_bin(cuts)
+        snapped = self.mins + (first - 1) * width
+        return np.where(first == 0, -np.inf, snapped)
+
+    def count(self, cuts):
+        """
+        Number of entries passing the cuts, the last axis of cuts runs
+        over the histogram axes.
+        """
+        first = self.first_passing_bin(cuts)
+        size = np.array(self.integral.shape)
+        idx = size - 1 - first
+        return self.integral[tuple(np.moveaxis(idx, -1, 0))]
+
+    def efficiency(self, cuts):
+        return self.count(cuts) / self.total
+
+class OperatingPoints(object):
+    """
+    Efficiencies and rejections for several flavors of one tagger.
+    Takes a dict of flavor -> dataset.
+    """
+    def __init__(self, datasets):
+        self.tables = {
+            flav: SummedAreaTable(ds) for flav, ds in datasets.items()}
+
+    def efficiency(self, flavor, cuts):
+        return self.tables[flavor].efficiency(cuts)
+
+    def rejection(self, flavor, cuts):
+        with np.errstate(divide='ignore'):
+            return 1 / self.efficiency(flavor, cuts)
@@ -0,0 +1,256 @@
+"""
+Exact Pareto frontier of a three-flavor cut scan.
+
+Every 2D cut gives two rejections and one efficiency, and everything we
+plot is the best efficiency we can get above some pair of rejections. That
+only depends on the cuts that aren't beaten on all three numbers by some
+other cut (the frontier), which is a small fraction of the 2D scan.
+
+Any superset of the frontier gives the same maps. A cheap neighbour test
+on the grid of cuts already leaves only a few times more points than the
+frontier, so that's what maps are built from and what the rejrej caches
+keep (as a frontier that isn't `exact`): maps with any binning or range
+can be made from it without going back to the histograms. Finding the
+exact frontier costs several times more than that, it's only done when
+the frontier itself is wanted (i.e. exported).
+
+The frontier is found by sorting the points by efficiency and sweeping
+down the list: a point is dominated if some point before it has both
+rejections at least as large. The list is swept a block at a time. Points
+under the staircase (the 2D frontier of the rejections) of the earlier
+blocks are dropped with one search, the rest are checked against the
+earlier points in their own block. Rather than a loop over points, that
+is done like a bottom-up merge sort, where at each level the earlier half
+of every sub-block is checked against the later half with a sort and a
+running maximum.
+"""
+import numpy as np
+
+_block_size = 8192
+
+def frontier_mask(x, y, z):
+    """
+    Mask of the points (given as three 1D arrays) that aren't dominated,
+    i.e. where no other point is at least as large in x, y and z and
+    larger in one. Of several identical points only one is kept.
+    """
+    n_points = len(x)
+    keep = np.zeros(n_points, dtype=bool)
+    if not n_points:
+        return keep
+    x_rank, y_rank, z_rank = [_ranks(v) for v in (x, y, z)]
+    n_x, n_y = x_rank.max() + 1, y_rank.max() + 1
+
+    # sort by z, x, then y, all descending: anything that dominates a
+    # point is then somewhere in front of it, and duplicates are adjacent
+    order = np.lexsort((-y_rank, -x_rank, -z_rank))
+    x_rank, y_rank, z_rank = x_rank[order], y_rank[order], z_rank[order]
+    unique = np.ones(n_points, dtype=bool)
+    unique[1:] = ((np.diff(x_rank) != 0) | (np.diff(y_rank) != 0) |
+                  (np.diff(z_rank) != 0))
+
+    dominated = np.zeros(n_points, dtype=bool)
+    stair_x = stair_y = np.zeros(0, dtype=np.int64)
+    for start in range(0, n_points, _block_size):
+        block = slice(start, start + _block_size)
+        block_x, block_y = x_rank[block], y_rank[block]
+        # the staircase is sorted by x, with y falling
+        pos = np.searchsorted(stair_x, block_x)
+        inside = pos < len(stair_x)
+        block_dominated = np.zeros(len(block_x), dtype=bool)
+        block_dominated[inside] = stair_y[pos[inside]] >= block_y[inside]
+        left = np.flatnonzero(~block_dominated)
+        block_dominated[left] = _dominated_by_earlier(
+            block_x[left], block_y[left], n_x, n_y)
+        dominated[block] = block_dominated
+        stair_x, stair_y = _staircase(
+            np.concatenate([stair_x, block_x[~block_dominated]]),
+            np.concatenate([stair_y, block_y[~block_dominated]]))
+    keep[order[unique & ~dominated]] = True
+    return keep
+
+def _ranks(values):
+    """
+    Integers in the same order as values. Ranks avoid any trouble with
+    floating point keys, integer values (i.e. counts) are used as they
+    are, which saves a sort.
+    """
+    values = np.asarray(values)
+    low = values.min()
+    if np.all(values == np.round(values)) and values.max() - low < 2**32:
+        return (values - low).astype(np.int64)
+    return np.unique(values, return_inverse=True)[1].ravel().astype(np.int64)
+
+def _staircase(x, y):
+    """
+    The points that no other one beats in both x and y, sorted by
+    increasing x (and so decreasing y).
+    """
+    order = np.lexsort((-y, -x))
+    x, y = x[order], y[order]
+    front = np.ones(len(x), dtype=bool)
+    front[1:] = y[1:] > np.maximum.accumulate(y)[:-1]
+    return x[front][::-1], y[front][::-1]
+
+def _dominated_by_earlier(x_rank, y_rank, n_x, n_y):
+    """
+    For each point, check if an earlier point in the list has x and y at
+    least as large.
+    """
+    n_points = len(x_rank)
+    # best (largest) y rank among the earlier points with x >= our x
+    best_y = np.full(n_points, -1, dtype=np.int64)
+    # the points (their positions in the list), and their x and y, ordered
+    # by descending x within each block of the current size
+    by_x = np.arange(n_points)
+    x_key = (n_x - 1) - x_rank
+    y_by_x = y_rank
+    level = 0
+    while (1 << level) < n_points:
+        # blocks are 2 << level long, halves 1 << level
+        later = (by_x >> level) & 1
+        block = by_x >> (level + 1)
+        # at equal x the earlier half sorts first, so it counts for >=
+        sort_key = (block * n_x + x_key) * 2 + later
+        # already sorted within the halves, stable sort merges
+        order = np.argsort(sort_key, kind='stable')
+        by_x, x_key, y_by_x = by_x[order], x_key[order], y_by_x[order]
+        is_later = ((by_x >> level) & 1).astype(bool)
+        offset = (by_x >> (level + 1)) * (n_y + 1)
+        y_earlier = np.where(is_later, 0, y_by_x + 1)
+        running = np.maximum.accumulate(y_earlier + offset) - offset - 1
+        targets = by_x[is_later]
+        best_y[targets] = np.maximum(best_y[targets], running[is_later])
+        level += 1
+    return best_y >= y_rank
+
+def _beaten_by_neighbor(arrays, larger_is_better):
+    """
+    Cheap first pass for a scan on a grid: mask of the points where the
+    next point along some axis is at least as good in every array. These
+    can't be on the frontier (or are duplicates of a point that is), and
+    in flat regions of the histograms that's most of them.
+    """
+    beaten = np.zeros(arrays[0].shape, dtype=bool)
+    for axis in range(beaten.ndim):
+        here = [slice(None)] * beaten.ndim
+        here[axis] = slice(None, -1)
+        after = list(here)
+        after[axis] = slice(1, None)
+        here, after = tuple(here), tuple(after)
+        next_better = np.logical_and.reduce([
+                array[after] >= array[here] if larger else
+                array[after] <= array[here]
+                for array, larger in zip(arrays, larger_is_better)])
+        beaten[here] |= next_better
+    return beaten
+
+class ParetoFrontier(object):
+    """
+    The cuts that aren't dominated in (x rejection, y rejection, z
+    efficiency), sorted by decreasing efficiency. They're stored as the
+    number of jets of each flavor passing the cut along with the totals,
+    which gives the rejections and efficiencies exactly.
+
+    If it isn't `exact` some of the cuts can be dominated. The maps are
+    the same, `exact_frontier` drops the extra cuts.
+    """
+    def __init__(self, counts, totals, xyz='BUC', exact=True):
+        counts = np.asarray(counts, dtype=float)
+        order = np.argsort(-counts[:,2], kind='stable')
+        self.counts = counts[order]
+        self.totals = np.asarray(totals, dtype=float)
+        self.xyz = xyz
+        self.exact = exact
+
+    @classmethod
+    def from_counts(cls, x_counts, y_counts, z_counts, totals=None,
+                    xyz='BUC', exact=True):
+        """
+        Frontier of a scan given as arrays of passing counts (i.e.
+        integrated histograms), by default the totals are the maximum
+        counts. Cuts where no x or y jets pass (infinite rejection) are
+        dropped. Without exact only the neighbour test is done.
+        """
+        arrays = np.broadcast_arrays(x_counts, y_counts, z_counts)
+        if totals is None:
+            totals = [array.max() for array in arrays]
+        x_counts, y_counts, z_counts = arrays
+        # fewer x and y jets is better, the counts are only negated once
+        # the grid is pruned (as float, so unsigned counts don't wrap)
+        valid = (x_counts > 0) & (y_counts > 0)
+        valid &= ~_beaten_by_neighbor(arrays, (False, False, True))
+        counts = np.stack([array[valid] for array in arrays],
+                          axis=1).astype(float)
+        if exact:
+            scores = [-counts[:,0], -counts[:,1], counts[:,2]]
+            counts = counts[frontier_mask(*scores)]
+        return cls(counts, totals, xyz=xyz, exact=exact)
+
+    @classmethod
+    def merge(cls, frontiers, exact=True):
+        """
+        Frontier of the union of several frontiers with the same totals.
+        """
+        frontiers = list(frontiers)
+        counts = np.concatenate([f.counts for f in frontiers])
+        return cls.from_counts(counts[:,0], counts[:,1], counts[:,2],
+                               totals=frontiers[0].totals,
+                               xyz=frontiers[0].xyz, exact=exact)
+
+    def exact_frontier(self):
+        """
+        The frontier without any dominated cuts.
+        """
+        if self.exact:
+            return self
+        return self.merge([self])
+
+    def __len__(self):
+        return len(self.counts)
+
+    @property
+    def x(self):
+        return self.totals[0] / self.counts[:,0]
+
+    @property
+    def y(self):
+        return self.totals[1] / self.counts[:,1]
+
+    @property
+    def z(self):
+        return self.counts[:,2] / self.totals[2]
+
+    def max_efficiency(self, x_edges, y_edges):
+        """
+        Best efficiency with x rejection >= x_edges[i] and y rejection >=
+        y_edges[j], as an array of shape (len(x_edges), len(y_edges)).
+        Where no point passes both the value is -1.
+        """
+        out_array = np.full((len(x_edges), len(y_edges)), -1.0)
+        x_bins = np.searchsorted(x_edges, self.x, side='right') - 1
+        y_bins = np.searchsorted(y_edges, self.y, side='right') - 1
+        inside = (x_bins >= 0) & (y_bins >= 0)
+        np.maximum.at(out_array, (x_bins[inside], y_bins[inside]),
+                      self.z[inside])
+        out_array = np.maximum.accumulate(out_array[::-1,:], 0)[::-1,:]
+        return np.maximum.accumulate(out_array[:,::-1], 1)[:,::-1]
+
+    def save(self, group, name):
+        """
+        Store the counts as one (n, 3) dataset, as integers if they are.
+        """
+        counts = self.counts
+        if np.all(counts == np.round(counts)) and np.all(counts < 2**32):
+            counts = counts.astype(np.uint32)
+        ds = group.create_dataset(name, data=counts, compression='gzip',
+                                  shuffle=True)
+        ds.attrs['totals'] = self.totals
+        ds.attrs['xyz'] = self.xyz
+        ds.attrs['exact'] = self.exact
+        return ds
+
+    @classmethod
+    def read(cls, ds):
+        return cls(ds[()], ds.attrs['totals'], xyz=ds.attrs['xyz'],
+                   exact=bool(ds.attrs.get('exact', True)))
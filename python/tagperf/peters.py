@@ -5,12 +5,11 @@ import itertools
 import numpy as np
 import h5py
 
-from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
-from matplotlib.figure import Figure
-
 from tagperf.tagschema import long_particle_names, leg_labels_colors
 from tagperf.ctaging import make_rejrej, draw_simple_rejrej
-from tagperf.ctaging import get_c_vs_u_const_beff, setup_1d_ctag_legs
+from tagperf.ctaging import get_c_vs_rej_const_beffs, setup_1d_ctag_legs
+from tagperf import rejcache, curves, h5map
+from tagperf.jobs import Task, FileTask, run_stages
 
 _fig_edge = 5.0
 _fig_size = (_fig_edge, _fig_edge * 3/4)
@@ -21,6 +20,8 @@ def _peters_lookup(flavor, tagger, binning):
     return '{}/{}'.format(flavor, tagger)
 
 def peters_cross_check(in_file_name, out_dir, ext):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
+    from matplotlib.figure import Figure
     fig = Figure(figsize=_fig_size)
     canvas = FigureCanvas(fig)
     ax = fig.add_subplot(1,1,1)
@@ -49,8 +50,8 @@ class PetersEff:
     def __init__(self, in_file, flavor):
         pass_ds = in_file[flavor + '/efficiency/pass']
         fail_ds = in_file[flavor + '/efficiency/fail']
-        self.pass_array = np.array(pass_ds)[1:-1]
-        self.fail_array = np.array(fail_ds)[1:-1]
+        self.pass_array = h5map.read(pass_ds, np.s_[1:-1])
+        self.fail_array = h5map.read(fail_ds, np.s_[1:-1])
         xmin, xmax = [pass_ds.attrs[x][0] for x in ['min', 'max']]
         assert pass_ds.attrs['units'] == 'MeV'
         self.xvalues = np.linspace(xmin, xmax, len(self.pass_array) )
@@ -75,26 +76,41 @@ class PetersEff:
         return np.array(x_ctrs), np.array(y_ctrs), np.array(x_wd)
 
 
-def peters_plots(in_file_name, cache_name, out_dir, ext, approval='Internal'):
+def peters_plots(in_file_name, cache_name, out_dir, ext, approval='Internal',
+                 cache_size=None):
     """
     Top level routine to make peters plots
     """
+    if not isdir(out_dir):
+        os.mkdir(out_dir)
+    run_stages(plot_stages(in_file_name, cache_name, out_dir, ext,
+                           approval=approval, cache_size=cache_size))
+
+def plot_stages(in_file_name, cache_name, out_dir, ext, approval='Internal',
+                cache_size=None):
+    """
+    The work done by peters_plots, as stages of tasks (see tagperf.jobs).
+    """
+    return [
+        [Task('peters rejrej', _build_rejrej, in_file_name, cache_name)],
+        [FileTask('rejrej-simple', cache_name, draw_simple_rejrej,
+                  out_dir, ext, tagger='jfc', official=True,
+                  approval=approval)],
+        [Task('peters cache trim', rejcache.trim, cache_name, cache_size)],
+        ]
+
+def _build_rejrej(in_file_name, cache_name):
     lookup = _peters_lookup
     with h5py.File(in_file_name, 'r') as in_file:
         with h5py.File(cache_name, 'a') as out_file:
             make_rejrej(in_file, out_file, tagger='jfc', lookup=lookup)
             # _make_rejrej(in_file, out_file, tagger='jfit', lookup=lookup)
 
-    if not isdir(out_dir):
-        os.mkdir(out_dir)
-
-    with h5py.File(cache_name, 'r') as cache:
-        draw_simple_rejrej(cache, out_dir, ext, tagger='jfc', official=True,
-                           approval=approval)
-
 _peters_rej = [4, 5, 6, 7, 8, 10]
 def make_peters_1d(in_file_name, out_dir, ext, b_rej=_peters_rej,
                    approval='Internal'):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
+    from matplotlib.figure import Figure
     tagger = 'jfc'
     textsize = _text_size
 
@@ -102,9 +118,10 @@ def make_peters_1d(in_file_name, out_dir, ext, b_rej=_peters_rej,
 
     rej_curves = {}
     with h5py.File(in_file_name, 'r') as in_file:
-        for eff in b_effs:
-            rej_curves[eff] = get_c_vs_u_const_beff(
-                in_file, tagger, b_eff=eff, lookup=_peters_lookup)
+        ceffs, rejs, valid = get_c_vs_rej_const_beffs(
+            in_file, tagger, b_effs, lookup=_peters_lookup)
+    for n, eff in enumerate(b_effs):
+        rej_curves[eff] = ceffs[n][valid[n]], rejs['U'][n][valid[n]]
 
     lines = ['-','--',':','-.', '_']
     colors = 'rgbkcm'
@@ -112,11 +129,12 @@ def make_peters_1d(in_file_name, out_dir, ext, b_rej=_peters_rej,
     fig = Figure(figsize=_fig_size)
     canvas = FigureCanvas(fig)
     ax = fig.add_subplot(1,1,1)
+    tolerance = curves.tolerance_for(ext)
     for b_eff, (linestyle, color) in zip(b_effs, style_iter):
         label, _ = leg_labels_colors.get(tagger, (tagger, 'k'))
         lab = '$1 / \epsilon_{{ b }} = $ {rej:.0f}'.format(
             rej=1/b_eff, tname=label)
-        vc, vu = rej_curves[b_eff]
+        vc, vu = curves.decimate(*rej_curves[b_eff], tolerance=tolerance)
         ax.plot(vc, vu, label=lab, color=color, linewidth=_line_width,
                 linestyle=linestyle)
     legprops = dict(size=textsize)
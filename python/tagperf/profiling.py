@@ -0,0 +1,194 @@
+"""
+Named spans for profiling the drawing (`--profile`).
+
+The slow parts of the code (dataset reads, integration, rejrej builds,
+curve extraction, contours, saving figures) are wrapped in `span(name)`.
+Until `start` is called a span is a shared do-nothing context manager,
+so the instrumented code runs at the same speed as without it.
+
+Once started, every span records its wall time, CPU time, and peak
+memory. By default the peak is how much the peak resident memory of the
+process grew while the span was open, which costs nothing but misses
+spans that stay below an earlier peak. With trace_memory it's the peak
+memory allocated while the span was open, on top of what was allocated
+when it opened. That comes from tracemalloc, which slows down code that
+makes many small objects (i.e. matplotlib), so the times are less
+reliable. Worker processes record their own spans and hand them back to
+the parent with the task results (see tagperf.jobs).
+`write` saves everything as a Chrome trace (load it in chrome://tracing
+or https://ui.perfetto.dev) and a text summary, sorted by total time.
+"""
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+
+class _NoSpan(object):
+    def __enter__(self):
+        return self
+    def __exit__(self, *args):
+        return False
+
+_no_span = _NoSpan()
+_recorder = None
+
+def span(name, category='tagperf', **args):
+    """
+    Context manager that records one span, if profiling is on.
+    """
+    if _recorder is None:
+        return _no_span
+    return _Span(_recorder, name, category, args)
+
+def is_active():
+    return _recorder is not None
+
+def start(trace_memory=False):
+    """
+    Start recording in this process. Figures saved with print_figure are
+    recorded as 'save' spans.
+    """
+    global _recorder
+    # a forked worker inherits the parent's recorder, it needs its own
+    if _recorder is not None and _recorder.pid == os.getpid():
+        return
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _recorder = _Recorder(trace_memory)
+    _wrap_print_figure()
+
+def take_events():
+    """
+    Return the events recorded so far, and forget them.
+    """
+    if _recorder is None:
+        return []
+    events, _recorder.events = _recorder.events, []
+    return events
+
+def add_events(events):
+    """
+    Add events recorded in another process.
+    """
+    if _recorder is not None:
+        _recorder.events.extend(events)
+
+_rss_scale = 1 if sys.platform == 'darwin' else 1024
+
+class _Recorder(object):
+    def __init__(self, trace_memory):
+        self.events = []
+        self.stack = []
+        self.pid = os.getpid()
+        self.trace_memory = trace_memory
+
+    def memory(self):
+        """
+        (current, peak) memory in bytes
+        """
+        if self.trace_memory:
+            return tracemalloc.get_traced_memory()
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak * _rss_scale, peak * _rss_scale
+
+    def reset_peak(self):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+
+class _Span(object):
+    def __init__(self, recorder, name, category, args):
+        self.recorder = recorder
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        stack = self.recorder.stack
+        current, peak = self.recorder.memory()
+        if stack:
+            stack[-1].peak = max(stack[-1].peak, peak)
+        self.recorder.reset_peak()
+        self.start_memory = current
+        self.peak = current
+        self.child_time = 0.0
+        stack.append(self)
+        self.start_time = time.time()
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+        return self
+
+    def __exit__(self, *args):
+        wall = time.perf_counter() - self.start_wall
+        cpu = time.process_time() - self.start_cpu
+        self.peak = max(self.peak, self.recorder.memory()[1])
+        stack = self.recorder.stack
+        stack.pop()
+        if stack:
+            stack[-1].peak = max(stack[-1].peak, self.peak)
+            stack[-1].child_time += wall
+        args = dict(self.args)
+        own = wall - self.child_time
+        args.update(cpu_ms=cpu * 1e3, self_ms=own * 1e3,
+                    peak_mb=(self.peak - self.start_memory) / 1e6)
+        self.recorder.events.append({
+                'name': self.name, 'cat': self.category, 'ph': 'X',
+                'ts': self.start_time * 1e6, 'dur': wall * 1e6,
+                'pid': self.recorder.pid, 'tid': threading.get_ident(),
+                'args': args})
+        return False
+
+def _wrap_print_figure():
+    try:
+        from matplotlib.backend_bases import FigureCanvasBase
+    except ImportError:
+        return
+    print_figure = FigureCanvasBase.print_figure
+    if getattr(print_figure, 'profiled', False):
+        return
+    def profiled_print_figure(canvas, filename, *args, **kwargs):
+        with span('save', file=os.fspath(filename)):
+            return print_figure(canvas, filename, *args, **kwargs)
+    profiled_print_figure.profiled = True
+    FigureCanvasBase.print_figure = profiled_print_figure
+
+# __________________________________________________________________________
+# output
+
+def summarize(events):
+    """
+    Rows of (name, calls, total s, self s, cpu s, peak MB), one per span
+    name, the slowest first.
+    """
+    rows = {}
+    for event in events:
+        args = event['args']
+        calls, total, own, cpu, peak = rows.get(
+            event['name'], (0, 0.0, 0.0, 0.0, 0.0))
+        rows[event['name']] = (
+            calls + 1, total + event['dur'] / 1e6,
+            own + args['self_ms'] / 1e3, cpu + args['cpu_ms'] / 1e3,
+            max(peak, args['peak_mb']))
+    return sorted(((name,) + row for name, row in rows.items()),
+                  key=lambda row: row[2], reverse=True)
+
+def write(events, trace_name, summary_name):
+    """
+    Write the events as a Chrome trace, and a summary as text.
+    """
+    if events:
+        # timestamps relative to the first event
+        first = min(event['ts'] for event in events)
+        events = [dict(event, ts=event['ts'] - first) for event in events]
+    with open(trace_name, 'w') as trace_file:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'},
+                  trace_file)
+    with open(summary_name, 'w') as summary_file:
+        summary_file.write('{:<40} {:>6} {:>9} {:>9} {:>9} {:>9}\n'.format(
+                'span', 'calls', 'total s', 'self s', 'cpu s', 'peak MB'))
+        for row in summarize(events):
+            summary_file.write(
+                '{:<40} {:>6} {:>9.3f} {:>9.3f} {:>9.3f} {:>9.1f}\n'.format(
+                    *row))
@@ -0,0 +1,136 @@
+"""
+Cache for the rejection-rejection maps built by RejRejComp.
+
+Maps are stored as `<tagger>/<binning>` datasets, which is what the
+drawing routines read. The Pareto frontier each map was binned from goes
+in `<tagger>/pareto/<binning>` (as found by the cheap first pass, see
+tagperf.pareto), so a map with other bins can be made without rescanning
+the histograms. Each entry also records a fingerprint
+of the histograms and parameters it was built from, so a regenerated
+input file only invalidates the maps that actually changed. A size cap
+can be given, in which case the least recently used maps are dropped.
+"""
+import hashlib
+import os
+import time
+
+import numpy as np
+import h5py
+
+from tagperf.pareto import ParetoFrontier
+
+_hash_rows = 256
+# attributes that change without the contents changing
+_volatile_attrs = {'last_used'}
+
+def fingerprint(arrays, params):
+    """
+    Hash a list of histograms (datasets or arrays) together with a dict of
+    parameters used to build something from them.
+    """
+    hasher = hashlib.sha1()
+    for array in arrays:
+        hasher.update(getattr(array, 'name', '').encode('utf-8'))
+        hasher.update(repr((array.shape, array.dtype.str)).encode('utf-8'))
+        attrs = getattr(array, 'attrs', {})
+        for key in sorted(set(attrs) - _volatile_attrs):
+            value = np.asarray(attrs[key]).tolist()
+            hasher.update(repr((key, value)).encode('utf-8'))
+        n_rows = array.shape[0] if array.shape else 1
+        for start in range(0, n_rows, _hash_rows):
+            block = array[start:start + _hash_rows] if array.shape else array
+            hasher.update(np.ascontiguousarray(block).tobytes())
+    hasher.update(repr(sorted(params.items())).encode('utf-8'))
+    return hasher.hexdigest()
+
+def frontier_name(tagger, binning):
+    return '{}/pareto/{}'.format(tagger, binning)
+
+class RejRejCache(object):
+    """
+    Wrapper around an (open, writable) HDF5 cache file.
+    """
+    def __init__(self, h5_file):
+        self.h5_file = h5_file
+
+    def is_current(self, tagger, binning, key):
+        """
+        Check for an up-to-date entry, marks it as used if there is one.
+        """
+        if not tagger in self.h5_file or not binning in self.h5_file[tagger]:
+            return False
+        ds = self.h5_file[tagger][binning]
+        if ds.attrs.get('fingerprint') != key:
+            print('stale cache for tagger {}, binning {}'.format(
+                    tagger, binning))
+            return False
+        ds.attrs['last_used'] = time.time()
+        return True
+
+    def get_frontier(self, tagger, binning, key):
+        """
+        The stored frontier if it's up to date, otherwise None.
+        """
+        name = frontier_name(tagger, binning)
+        if not name in self.h5_file:
+            return None
+        ds = self.h5_file[name]
+        if ds.attrs.get('fingerprint') != key:
+            return None
+        ds.attrs['last_used'] = time.time()
+        return ParetoFrontier.read(ds)
+
+    def store(self, rej_builder, tagger, binning, key, frontier_key=None):
+        """
+        Save a calculated RejRejComp, replacing any stale entry.
+        """
+        names = ['{}/{}'.format(tagger, binning)]
+        if rej_builder.frontier is not None:
+            names.append(frontier_name(tagger, binning))
+        for name in names:
+            if name in self.h5_file:
+                del self.h5_file[name]
+        rej_builder.save(self.h5_file, tagger, binning)
+        for name, name_key in zip(names, [key, frontier_key]):
+            ds = self.h5_file[name]
+            ds.attrs['fingerprint'] = name_key or ''
+            ds.attrs['last_used'] = time.time()
+
+def _entries(h5_file):
+    entries = []
+    def add_entry(name, obj):
+        if isinstance(obj, h5py.Dataset):
+            last_used = obj.attrs.get('last_used', 0.0)
+            entries.append((last_used, name, obj.id.get_storage_size()))
+    h5_file.visititems(add_entry)
+    return entries
+
+def trim(cache_name, max_size):
+    """
+    Drop least recently used entries until the cache holds at most
+    max_size bytes of maps. HDF5 doesn't give back the space freed by
+    deleted datasets, so the file is rewritten if anything is dropped.
+    """
+    if max_size is None or not os.path.isfile(cache_name):
+        return
+    with h5py.File(cache_name, 'r') as cache:
+        entries = sorted(_entries(cache))
+    total = sum(size for _, _, size in entries)
+    dropped = set()
+    for last_used, name, size in entries:
+        if total <= max_size:
+            break
+        dropped.add(name)
+        total -= size
+    if not dropped:
+        return
+    print('dropping {} old maps from {}'.format(len(dropped), cache_name))
+    tmp_name = cache_name + '.tmp'
+    with h5py.File(cache_name, 'r') as old, h5py.File(tmp_name, 'w') as new:
+        for _, name, _ in entries:
+            if name in dropped:
+                continue
+            group = os.path.dirname(name)
+            dest = new.require_group(group) if group else new
+            old.copy(old[name], dest, name=os.path.basename(name))
+    os.replace(tmp_name, cache_name)
@@ -0,0 +1,156 @@
+"""
+The numbers behind the plots, written to one HDF5 file without drawing.
+
+Every curve is a group holding one dataset per axis, with 'x' and 'y'
+attributes naming the axes (and 'x_err' / 'y_err' where there are
+errors). Rejrej maps are copied from the caches with their attributes,
+along with the exact Pareto frontiers they're binned from. The paths of
+all the curves and maps are listed in the top level 'index' dataset, and
+the 'kind' attribute of each entry says what it is.
+"""
+import os
+
+import numpy as np
+import h5py
+
+from tagperf import tagschema
+from tagperf.rejcache import frontier_name
+from tagperf.pareto import ParetoFrontier
+from tagperf.tagschema import mv1uc_name
+
+class ResultsFile(object):
+    """
+    Wrapper around a writable HDF5 file, keeps track of the index.
+    """
+    def __init__(self, h5_file):
+        self.h5_file = h5_file
+        self.index = []
+
+    def add_curve(self, path, kind, axes, **attrs):
+        """
+        axes is a list of (name, array) pairs, the first is the x axis
+        and the second the y axis. Later ones (errors) are just stored.
+        """
+        group = self.h5_file.require_group(path)
+        for name, values in axes:
+            group.create_dataset(name, data=np.asarray(values))
+        group.attrs['x'] = axes[0][0]
+        group.attrs['y'] = axes[1][0]
+        group.attrs['kind'] = kind
+        for key, value in attrs.items():
+            group.attrs[key] = value
+        self.index.append(path)
+
+    def add_map(self, path, kind, dataset):
+        """
+        Copy a rejrej map (and its attributes) out of a cache.
+        """
+        group = self.h5_file.require_group(os.path.dirname(path))
+        dataset.file.copy(dataset, group, name=os.path.basename(path))
+        attrs = group[os.path.basename(path)].attrs
+        attrs['kind'] = kind
+        if 'last_used' in attrs:
+            del attrs['last_used']
+        self.index.append(path)
+
+    def add_frontier(self, path, dataset):
+        """
+        Write the exact Pareto frontier for a frontier stored in a cache.
+        """
+        group = self.h5_file.require_group(os.path.dirname(path))
+        frontier = ParetoFrontier.read(dataset).exact_frontier()
+        ds = frontier.save(group, os.path.basename(path))
+        ds.attrs['kind'] = 'pareto'
+        self.index.append(path)
+
+    def write_index(self):
+        if 'index' in self.h5_file:
+            del self.h5_file['index']
+        dtype = h5py.special_dtype(vlen=str)
+        self.h5_file.create_dataset(
+            'index', data=np.array(self.index, dtype=object), dtype=dtype)
+
+def export(in_file_name, out_name, families, cache_dir='.', subset=None):
+    """
+    Write the results for a list of families (names as in `tagperf draw`)
+    to out_name.
+    """
+    with h5py.File(out_name, 'w') as out_file:
+        results = ResultsFile(out_file)
+        for family in families:
+            _exporters[family](results, in_file_name, cache_dir, subset)
+        results.write_index()
+
+def _roc(results, in_file_name, cache_dir, subset):
+    from tagperf.tagroc import get_roc
+    with h5py.File(in_file_name, 'r') as in_file:
+        for flavor in 'UC':
+            rej_name = '{}_rej'.format(flavor)
+            for tagger in tagschema.get_taggers(in_file, subset):
+                eff, rej = get_roc(in_file, tagger, flavor=flavor)
+                results.add_curve(
+                    'roc/{}/{}'.format(flavor, tagger), 'roc',
+                    [('B_eff', eff), (rej_name, rej)])
+
+def _pt(results, in_file_name, cache_dir, subset):
+    from tagperf.tagpt import PtPerformance
+    effs = [0.6, 0.7, 0.8]
+    with h5py.File(in_file_name, 'r') as in_file:
+        taggers = tagschema.get_taggers(in_file, subset)
+        perf = PtPerformance(in_file, taggers, flavors='BUCT')
+    rej, err = perf.rejection(effs)
+    for eff_num, eff in enumerate(effs):
+        for rej_flavor in 'UCT':
+            flav_num = perf.flavors.index(rej_flavor)
+            rej_name = '{}_rej'.format(rej_flavor)
+            for tag_num, tagger in enumerate(perf.taggers):
+                path = 'pt/{}Rej{}/{}'.format(
+                    rej_flavor.lower(), int(eff*100), tagger)
+                point = (tag_num, slice(None), flav_num, eff_num)
+                results.add_curve(
+                    path, 'pt', [('pt', perf.pt), (rej_name, rej[point]),
+                                 ('pt_err', perf.pt_err),
+                                 ('rej_err', err[point])],
+                    x_err='pt_err', y_err='rej_err', x_units='GeV',
+                    B_eff=eff)
+
+def _c1d(results, in_file_name, cache_dir, subset):
+    from tagperf.ctaging import get_c_vs_rej_const_beffs
+    b_effs = [0.125, 0.2]
+    with h5py.File(in_file_name, 'r') as in_file:
+        for tagger in ['gaia', mv1uc_name, 'jfc', 'jfit']:
+            ceffs, rejs, valid = get_c_vs_rej_const_beffs(
+                in_file, tagger, b_effs, reject='UT')
+            for n, b_eff in enumerate(b_effs):
+                for flavor, rej in rejs.items():
+                    path = 'ctag1d/brej{}/{}/{}'.format(
+                        int(1/b_eff), flavor, tagger)
+                    results.add_curve(
+                        path, 'ctag1d', [('C_eff', ceffs[n][valid[n]]),
+                                         (flavor + '_rej', rej[n][valid[n]])],
+                        B_eff=b_eff)
+
+def _ctag(results, in_file_name, cache_dir, subset):
+    from tagperf.ctaging import build_rejrej
+    cache_name = os.path.join(cache_dir, 'REJREJ_CACHE.h5')
+    taggers = ['gaia', 'jfc', 'jfit', mv1uc_name]
+    build_rejrej(in_file_name, cache_name, taggers)
+    with h5py.File(cache_name, 'r') as cache:
+        for tagger in taggers:
+            results.add_map('rejrej/ctag/{}'.format(tagger), 'rejrej',
+                            cache[tagger]['all'])
+            results.add_frontier('pareto/ctag/{}'.format(tagger),
+                                 cache[frontier_name(tagger, 'all')])
+
+def _btag2d(results, in_file_name, cache_dir, subset):
+    from tagperf.b2d import build_rejrej_btag
+    cache_name = os.path.join(cache_dir, 'BTAG_CACHE.h5')
+    build_rejrej_btag(in_file_name, cache_name)
+    with h5py.File(cache_name, 'r') as cache:
+        results.add_map('rejrej/btag/gaiaBtag', 'rejrej',
+                        cache['gaiaBtag']['all'])
+        results.add_frontier('pareto/btag/gaiaBtag',
+                             cache[frontier_name('gaiaBtag', 'all')])
+
+_exporters = {
+    'ctag': _ctag, 'roc': _roc, 'pt': _pt, 'c1d': _c1d, 'btag2d': _btag2d}
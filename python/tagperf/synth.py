@@ -0,0 +1,102 @@
+"""
+Synthetic histogram files, for testing and benchmarking without a D3PD.
+
+Jets are generated with flavor dependent tagger outputs: every flavor has
+its own spread of (pu, pc, pb), the taggers see it with different
+resolution (gaia best, jfit worst), and everything gets worse at high pt.
+The MV weights are made from the same probabilities. The jets are then
+filled with tagperf.fill, so `write_d3pd` gives the same groups, datasets
+and attributes as tag-perf-d3pd, and `write_peter` the same as
+tag-perf-peter. The number of bins on both kinds of axis can be changed,
+the default is what the C++ fills.
+"""
+import numpy as np
+
+from tagperf import fill
+
+DEFAULT_N_JETS = 200000
+
+# truth label: (fraction, dirichlet parameters for (pu, pc, pb), mean pt)
+_flavors = {
+    5: (0.2, (1.0, 2.0, 8.0), 60e3),
+    4: (0.1, (2.0, 5.0, 3.0), 50e3),
+    0: (0.65, (8.0, 2.0, 1.0), 45e3),
+    15: (0.05, (5.0, 4.0, 2.0), 55e3),
+}
+# how much of the flavor information each tagger sees
+_resolution = {'gaia': 1.0, 'jfc': 0.8, 'jfit': 0.65}
+# pt (MeV) where the taggers lose half their separation
+_pt_half = 500e3
+_noise = 0.8
+# c fraction in the background of each MV weight
+_mv_c_fractions = {'mv1': 0.0, 'mv1c': 0.15, 'mvb': 0.05, 'mv2c00': 0.0,
+                   'mv2c10': 0.1, 'mv2c20': 0.2}
+
+def make_jets(n_jets, rng):
+    """
+    Dict of jet columns, as read by tagperf.fill.
+    """
+    labels = np.array(sorted(_flavors))
+    fractions = np.array([_flavors[label][0] for label in labels])
+    truth = rng.choice(labels, size=n_jets, p=fractions / fractions.sum())
+    probs = np.empty((n_jets, 3))
+    pt = np.empty(n_jets)
+    for label in labels:
+        sel = truth == label
+        _, alpha, mean_pt = _flavors[label]
+        probs[sel] = rng.dirichlet(alpha, sel.sum())
+        # some jets fall below the pt cut, as in real ntuples
+        pt[sel] = 15e3 + rng.exponential(mean_pt, sel.sum())
+    true_logits = np.log(probs + 1e-6)
+    smearing = 1.0 / (1.0 + pt / _pt_half)
+    cols = {
+        'truth': truth,
+        'pt': pt.astype(np.float32),
+        'eta': rng.uniform(-2.7, 2.7, n_jets).astype(np.float32),
+    }
+    for tagger, resolution in _resolution.items():
+        logits = true_logits * (resolution * smearing)[:, None]
+        logits += rng.normal(0.0, _noise, logits.shape)
+        tagger_probs = np.exp(logits - logits.max(axis=1)[:, None])
+        tagger_probs /= tagger_probs.sum(axis=1)[:, None]
+        for num, prob in enumerate(['pu', 'pc', 'pb']):
+            cols['{}_{}'.format(tagger, prob)] = (
+                tagger_probs[:, num].astype(np.float32))
+    pu, pc, pb = [cols['gaia_' + p].astype(float) for p in ['pu', 'pc', 'pb']]
+    for name, c_frac in _mv_c_fractions.items():
+        llr = np.log(pb / ((1.0 - c_frac) * pu + c_frac * pc))
+        weight = 1.0 / (1.0 + np.exp(-0.8 * llr))
+        if not name.startswith('mv1'):
+            weight = 2.0 * weight - 1.0
+        cols[name] = weight.astype(np.float32)
+    return cols
+
+def _jet_chunks(n_jets, rng, chunk_size):
+    for start in range(0, n_jets, chunk_size):
+        yield make_jets(min(chunk_size, n_jets - start), rng)
+
+def write_d3pd(out_name, n_jets=DEFAULT_N_JETS, n_bins=fill.DEFAULT_N_BINS,
+               n_2ax_bins=fill.DEFAULT_N_2AX_BINS, seed=1,
+               chunk_size=fill.DEFAULT_CHUNK_SIZE):
+    """
+    Write a file with the tag-perf-d3pd layout, filled from n_jets
+    synthetic jets.
+    """
+    filler = fill.Filler(n_bins=n_bins, n_2ax_bins=n_2ax_bins)
+    rng = np.random.default_rng(seed)
+    for cols in _jet_chunks(n_jets, rng, chunk_size):
+        filler.fill(cols)
+    filler.write(out_name)
+
+def write_peter(out_name, n_jets=DEFAULT_N_JETS,
+                n_2ax_bins=fill.DEFAULT_N_2AX_BINS, seed=2,
+                chunk_size=fill.DEFAULT_CHUNK_SIZE):
+    """
+    Write a file with the tag-perf-peter layout.
+    """
+    filler = fill.PeterFiller(n_2ax_bins=n_2ax_bins)
+    rng = np.random.default_rng(seed)
+    for cols in _jet_chunks(n_jets, rng, chunk_size):
+        cols['jvf'] = rng.beta(5.0, 1.0, len(cols['truth']))
+        filler.fill(cols)
+    filler.write(out_name)
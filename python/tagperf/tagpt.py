@@ -1,10 +1,9 @@
 from tagperf import tagschema
+from tagperf import integral, h5map
+from tagperf.jobs import FileTask, run_stages
+from tagperf.profiling import span
 
 import numpy as np
-import h5py
-from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
-from matplotlib.figure import Figure
-from matplotlib.ticker import FuncFormatter
 
 from os.path import isdir
 import os, sys
@@ -22,31 +21,62 @@ _fig_size = (_fig_edge, _fig_edge * 3/4)
 def make_plots(in_file_name, out_dir, ext, subset=None, propaganda=False):
     if not isdir(out_dir):
         os.mkdir(out_dir)
-    with h5py.File(in_file_name, 'r') as in_file:
-        for eff in [0.6, 0.7, 0.8]:
-            for rej_flavor in 'UCT':
-                draw_pt_bins(
-                    in_file, out_dir, rej_flavor=rej_flavor,
-                    eff=eff, ext=ext, subset=subset, propaganda=propaganda)
+    run_stages(plot_stages(in_file_name, out_dir, ext, subset=subset,
+                           propaganda=propaganda))
+
+_effs = [0.6, 0.7, 0.8]
+_rej_flavors = 'UCT'
+
+def plot_stages(in_file_name, out_dir, ext, subset=None, propaganda=False):
+    """
+    One task that draws all the plots (see tagperf.jobs), the histograms
+    are only read and integrated once.
+    """
+    return [[FileTask('ptbins', in_file_name, draw_pt_plots, out_dir,
+                      ext=ext, subset=subset, propaganda=propaganda)]]
+
+def draw_pt_plots(in_file, out_dir, effs=_effs, rej_flavors=_rej_flavors,
+                  ext='.pdf', subset=None, propaganda=False,
+                  textsize=_text_size):
+    """
+    Draw rejection vs pt for every combination of b efficiency and
+    rejected flavor.
+    """
+    taggers = tagschema.get_taggers(in_file, subset)
+    perf = PtPerformance(in_file, taggers, flavors='B' + rej_flavors)
+    rej, err = perf.rejection(effs)
+    for eff_num, eff in enumerate(effs):
+        for rej_flavor in rej_flavors:
+            flav_num = perf.flavors.index(rej_flavor)
+            _draw_pt_plot(
+                perf, rej[:, :, flav_num, eff_num],
+                err[:, :, flav_num, eff_num], out_dir, eff=eff,
+                rej_flavor=rej_flavor, ext=ext, propaganda=propaganda,
+                textsize=textsize)
 
 def draw_pt_bins(in_file, out_dir, eff=0.7, rej_flavor='U', ext='.pdf',
                  subset=None, propaganda=False, textsize=_text_size):
+    draw_pt_plots(in_file, out_dir, effs=[eff], rej_flavors=rej_flavor,
+                  ext=ext, subset=subset, propaganda=propaganda,
+                  textsize=textsize)
+
+def _draw_pt_plot(perf, rej, err, out_dir, eff, rej_flavor, ext,
+                  propaganda, textsize):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
+    from matplotlib.figure import Figure
+    from matplotlib.ticker import FuncFormatter
     fig = Figure(figsize=_fig_size)
     canvas = FigureCanvas(fig)
     ax = fig.add_subplot(1,1,1)
     ax.grid(which='both')
     ax.set_xscale('log')
-    for tagger in tagschema.get_taggers(in_file, subset):
-        pt_bins = tagschema.get_pt_bins(in_file['B/btag/ptBins'])
-        eff_group = in_file['B/btag/ptBins']
-        rej_group = in_file['{}/btag/ptBins'.format(rej_flavor.upper())]
-        x_vals, y_vals, x_err, y_err = _get_pt_xy(
-            eff_group, rej_group, pt_bins, eff, tagger=tagger)
+    colors = tagschema.get_colors('colors.yml')
+    x_vals = perf.pt
+    for tag_num, tagger in enumerate(perf.taggers):
         tname = tagschema.display_name(tagger) if propaganda else tagger
-        with tagschema.ColorScheme('colors.yml') as colors:
-            ax.errorbar(
-                x_vals, y_vals, label=tname, #xerr=x_err,
-                yerr=y_err, color=colors[tname])
+        ax.errorbar(
+            x_vals, rej[tag_num], label=tname, #xerr=perf.pt_err,
+            yerr=err[tag_num], color=colors[tname])
     leg = ax.legend(numpoints=1, loc='upper left', prop={'size':textsize})
     leg.get_title().set_fontsize(textsize)
     ax.set_xlim(20, np.max(x_vals) * 1.1)
@@ -62,59 +92,103 @@ def draw_pt_bins(in_file, out_dir, eff=0.7, rej_flavor='U', ext='.pdf',
         out_dir, rej_flavor.lower(), int(eff*100), ext)
     canvas.print_figure(out_name, bbox_inches='tight')
 
-def _check_round(eff, target, warn_tolerance=0.01, err_tolerance=0.1):
-    roundoff_frac = abs((target - eff) / eff)
-    if roundoff_frac > warn_tolerance:
-        prob = 'target eff {}, rounded to {} ({:.0%} off)'.format(
-                target, eff, roundoff_frac)
-        if roundoff_frac > err_tolerance:
-            raise RoundoffError(prob)
-        warnings.warn(prob, stacklevel=3)
-
-def _get_pt_xy(eff_group, rej_group, pt_bins, eff, tagger):
-    def bin_low_edge(bin_name):
-        return pt_bins[bin_name][0]
-    pt_list = sorted(pt_bins, key=bin_low_edge)
-    ud_list = [pt_bins[key] for key in pt_list]
-    x_vals = np.fromiter( ( (u + d) / 2 for d,u in ud_list), dtype='d')
-    x_err = np.fromiter( ( (u - d) / 2 for d,u in ud_list), dtype='d')
-    y_vals = np.ones(len(pt_bins)) * np.NaN
-    y_err = np.ones(len(pt_bins)) * np.NaN
-    for bin_num, pt_bin in enumerate(pt_list):
-        def get_int(group):
-            return np.array(group[pt_bin][tagger])[::-1].cumsum()
-        eff_array = get_int(eff_group)
-        rej_counts = get_int(rej_group)
-        try:
-            rej_at_eff, err_at_eff = _get_rejection(
-                eff_array, rej_counts, eff)
-            y_vals[bin_num] = rej_at_eff
-            y_err[bin_num] = err_at_eff
-        except RejectionCalcError as err:
-            prob = '{} {}: {}\n'.format(tagger, pt_bin, str(err))
-            sys.stderr.write(prob)
-
-    return x_vals, y_vals, x_err, y_err
-
-def _get_rejection(eff_array, rej_counts, eff):
-    eff_max = eff_array.max()
-    if np.isnan(eff_max):
-        raise RejectionCalcError("nan in efficiency array")
-    if eff_max == 0.0:
-        raise RejectionCalcError("max efficiency is zero")
-    eff_array /= eff_array.max()
-    idx_above_eff, = np.nonzero(eff_array > eff)
-    first_idx_above = idx_above_eff.min()
-
-    count_at_eff = rej_counts[first_idx_above]
-    if count_at_eff == 0.0:
-        raise RejectionCalcError("infinite rejection")
-    _check_round(eff_array[first_idx_above], eff)
-
-    rej_at_eff = rej_counts.max() / count_at_eff
-    err_at_eff = rej_at_eff / math.sqrt(count_at_eff)
-    return rej_at_eff, err_at_eff
-
+class PtPerformance(object):
+    """
+    Integrated b-tagging histograms for every (tagger, pt bin, flavor),
+    stacked into one array with the discriminant on the last axis.
+    """
+    def __init__(self, in_file, taggers, flavors='BUCT'):
+        pt_bins = tagschema.get_pt_bins(in_file['B/btag/ptBins'])
+        self.pt_bins = sorted(pt_bins, key=lambda name: pt_bins[name][0])
+        self.taggers = list(taggers)
+        self.flavors = flavors
+        edges = np.array([pt_bins[name] for name in self.pt_bins])
+        self.pt = edges.mean(axis=1)
+        self.pt_err = (edges[:,1] - edges[:,0]) / 2
+
+        groups = [in_file['{}/btag/ptBins'.format(flav)] for flav in flavors]
+        n_disc = max(group[pt_bin][tagger].shape[0] for group in groups
+                     for pt_bin in self.pt_bins for tagger in self.taggers)
+        shape = (len(self.taggers), len(self.pt_bins), len(flavors), n_disc)
+        # shorter histograms are padded at the low end, which doesn't
+        # change the integral
+        self.counts = np.zeros(shape)
+        for tag_num, tagger in enumerate(self.taggers):
+            for pt_num, pt_bin in enumerate(self.pt_bins):
+                for flav_num, group in enumerate(groups):
+                    ds = group[pt_bin][tagger]
+                    hist = h5map.read(ds)
+                    self.counts[tag_num, pt_num, flav_num, :hist.size] = (
+                        hist[::-1])
+        with span('integrate'):
+            np.cumsum(self.counts, axis=-1, out=self.counts)
+
+    def rejection(self, effs, eff_flavor='B', warn_tolerance=0.01,
+                  err_tolerance=0.1):
+        """
+        Rejection (and its statistical error) of every flavor at the cut
+        giving each b efficiency in effs. Returns two arrays of shape
+        (tagger, pt bin, flavor, eff). Points that can't be calculated are
+        NaN, the reason is written to stderr.
+        """
+        with span('curve', n_taggers=len(self.taggers)):
+            return self._rejection(effs, eff_flavor, warn_tolerance,
+                                   err_tolerance)
+
+    def _rejection(self, effs, eff_flavor, warn_tolerance, err_tolerance):
+        effs = np.asarray(effs, dtype=float)
+        n_tag, n_pt, n_flav, n_disc = self.counts.shape
+        totals = self.counts[..., -1]
+        eff_counts = self.counts[:, :, self.flavors.index(eff_flavor), :]
+        eff_totals = totals[:, :, self.flavors.index(eff_flavor)]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            eff_arrays = eff_counts / eff_totals[..., None]
+        # first bin above each efficiency
+        first_above = integral.count_below(
+            eff_arrays.reshape(-1, n_disc), effs, inclusive=True)
+        first_above = first_above.T.reshape(n_tag, n_pt, len(effs))
+        found = first_above < n_disc
+        first_above = np.minimum(first_above, n_disc - 1)
+
+        tag_idx, pt_idx = np.indices((n_tag, n_pt))
+        eff_at_cut = eff_arrays[tag_idx[..., None], pt_idx[..., None],
+                                first_above]
+        counts = self.counts[
+            tag_idx[..., None, None], pt_idx[..., None, None],
+            np.arange(n_flav)[:, None], first_above[:,:,None,:]]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rej = totals[..., None] / counts
+            err = rej / np.sqrt(counts)
+            roundoff = np.abs((effs - eff_at_cut) / eff_at_cut)
+
+        problems = np.full(found.shape, '', dtype=object)
+        problems[~found] = 'no efficiency above target'
+        too_far = found & (roundoff > err_tolerance)
+        problems[too_far] = 'rounding off more than {:.0%}'.format(
+            err_tolerance)
+        problems[eff_totals == 0.0] = 'max efficiency is zero'
+        problems[np.isnan(eff_totals)] = 'nan in efficiency array'
+        bad = problems != ''
+        for tag_num, pt_num, eff_num in zip(*np.nonzero(bad)):
+            sys.stderr.write('{} {} (eff {}): {}\n'.format(
+                    self.taggers[tag_num], self.pt_bins[pt_num],
+                    effs[eff_num], problems[tag_num, pt_num, eff_num]))
+        for tag_num, pt_num, eff_num in zip(*np.nonzero(
+                ~bad & (roundoff > warn_tolerance))):
+            warnings.warn('{} {}: target eff {}, rounded to {}'.format(
+                    self.taggers[tag_num], self.pt_bins[pt_num],
+                    effs[eff_num], eff_at_cut[tag_num, pt_num, eff_num]))
+
+        infinite = (counts == 0.0) & ~bad[:,:,None,:]
+        for tag_num, pt_num, flav_num, eff_num in zip(*np.nonzero(infinite)):
+            sys.stderr.write('{} {} (eff {}): infinite {} rejection\n'.format(
+                    self.taggers[tag_num], self.pt_bins[pt_num],
+                    effs[eff_num], self.flavors[flav_num]))
+        rej[infinite] = np.nan
+        err[infinite] = np.nan
+        rej[np.broadcast_to(bad[:,:,None,:], rej.shape)] = np.nan
+        err[np.broadcast_to(bad[:,:,None,:], err.shape)] = np.nan
+        return rej, err
 
 # ===== labeling functions =====
 def tick_format(x, pos):
@@ -131,12 +205,3 @@ def rej_label(rej_flavor, eff):
     pt1 = '$1/\epsilon_{{ \mathrm{{ {} }} }}$'.format(flavor_label)
     pt2 = ' (fixed $\epsilon_{{b}}$ = {})'.format(eff)
     return pt1 + pt2
-
-# ==== exceptions ====
-class RejectionCalcError(Exception):
-    def __init__(self, *args):
-        super(RejectionCalcError, self).__init__(*args)
-
-class RoundoffError(RejectionCalcError):
-    def __init__(self, *args):
-        super(RoundoffError, self).__init__(*args)
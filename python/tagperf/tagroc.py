@@ -1,12 +1,8 @@
-from tagperf import tagschema
+from tagperf import tagschema, curves, h5map
+from tagperf.jobs import FileTask, run_stages
+from tagperf.profiling import span
 
 import numpy as np
-import h5py
-from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
-from matplotlib.figure import Figure
-from matplotlib.gridspec import GridSpec
-from matplotlib.ticker import MaxNLocator
-import matplotlib.pyplot as plt
 
 from os.path import isdir
 import os
@@ -14,13 +10,23 @@ import os
 _line_width = 2
 
 def make_plots(in_file_name, out_dir, ext, propaganda=False, subset=None):
+    run_stages(plot_stages(in_file_name, out_dir, ext,
+                           propaganda=propaganda, subset=subset))
+
+def plot_stages(in_file_name, out_dir, ext, propaganda=False, subset=None):
+    """
+    One stage with a task for each plot (see tagperf.jobs).
+    """
     bl = 'mv1' if propaganda else 'gaiaGr1'
     ext_args = dict(
         propaganda=propaganda, baseline=bl, ext=ext, out_dir=out_dir,
         subset=subset)
-    with h5py.File(in_file_name, 'r') as in_file:
-        draw_btag_roc(in_file, flavor='U', **ext_args)
-        draw_btag_roc(in_file, flavor='C', **ext_args)
+    return [[
+            FileTask('uRejRoc', in_file_name, draw_btag_roc,
+                     flavor='U', **ext_args),
+            FileTask('cRejRoc', in_file_name, draw_btag_roc,
+                     flavor='C', **ext_args),
+            ]]
 
 def _get_datasets(in_file, tagger, flavor='B'):
     b_ds = in_file['B/btag/all/{}'.format(tagger)]
@@ -33,6 +39,7 @@ def _setup_ax(ax, textsize=16):
     ax.tick_params(labelsize=textsize, which='both')
 
 def _setup_ratio(ra, textsize=16):
+    from matplotlib.ticker import MaxNLocator
     locator = MaxNLocator(5, prune='upper')
     ra.get_yaxis().set_major_locator(locator)
     ra.set_xlabel('$\epsilon_{b}$', x=0.98, ha='right', size=textsize)
@@ -43,6 +50,9 @@ def _setup_ratio(ra, textsize=16):
 
 def draw_btag_roc(in_file, out_dir, min_eff=0.5, ext='.pdf',
                   baseline=None, flavor='U', propaganda=False, subset=None):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
+    from matplotlib.figure import Figure
+    from matplotlib.gridspec import GridSpec
     textsize = 16
     fig = Figure(figsize=(8,6))
     canvas = FigureCanvas(fig)
@@ -56,10 +66,12 @@ def draw_btag_roc(in_file, out_dir, min_eff=0.5, ext='.pdf',
     ra.set_ylabel('X / {}'.format(bname))
 
     taggers = tagschema.get_taggers(in_file, subset)
+    colors = tagschema.get_colors('colors.yml')
+    tolerance = curves.tolerance_for(ext)
     base_x = None
 
     def get_xy(tagger):
-        return _get_roc_xy(*_get_datasets(in_file, tagger, flavor=flavor))
+        return get_roc(in_file, tagger, flavor=flavor)
 
     if baseline and baseline in taggers:
         base_x, base_y = get_xy(baseline)
@@ -67,14 +79,16 @@ def draw_btag_roc(in_file, out_dir, min_eff=0.5, ext='.pdf',
         x_pts, y_pts = get_xy(tagger)
         valid_eff = x_pts > min_eff
         tname = tagschema.display_name(tagger) if propaganda else tagger
-        with tagschema.ColorScheme('colors.yml') as colors:
-            color = colors[tname]
+        color = colors[tname]
         valid_x = x_pts[valid_eff]
         valid_y = y_pts[valid_eff]
-        ax.plot(valid_x, valid_y, '-', label=tname, color=color, lw=_line_width)
+        ax.plot(*curves.decimate(valid_x, valid_y, tolerance), '-',
+                label=tname, color=color, lw=_line_width)
         if base_x is not None and tagger != baseline:
             interp_y = np.interp(valid_x, base_x, base_y)
-            ra.plot(valid_x, valid_y / interp_y, color=color, lw=_line_width)
+            ratio_x, ratio_y = curves.decimate(
+                valid_x, valid_y / interp_y, tolerance, yscale='linear')
+            ra.plot(ratio_x, ratio_y, color=color, lw=_line_width)
     if not isdir(out_dir):
         os.mkdir(out_dir)
     ax.legend()
@@ -88,10 +102,22 @@ def draw_btag_roc(in_file, out_dir, min_eff=0.5, ext='.pdf',
     file_name = '{}/{}RejRoc{}'.format(out_dir, flavor.lower(), ext)
     canvas.print_figure(file_name, bbox_inches='tight')
 
+def get_roc(in_file, tagger, flavor='U'):
+    """
+    b-tag efficiency and `flavor` rejection for every cut on a tagger.
+    """
+    return _get_roc_xy(*_get_datasets(in_file, tagger, flavor=flavor))
+
 def _get_roc_xy(eff_ds, rej_ds):
-    eff_array = np.array(eff_ds)[::-1].cumsum()
+    eff_hist = h5map.read(eff_ds)
+    rej_hist = h5map.read(rej_ds)
+    with span('curve', dataset=rej_ds.name):
+        return _roc_xy(eff_hist, rej_hist)
+
+def _roc_xy(eff_hist, rej_hist):
+    eff_array = eff_hist[::-1].cumsum()
     eff_array /= eff_array.max()
-    rej_array = np.array(rej_ds)[::-1].cumsum()
+    rej_array = rej_hist[::-1].cumsum()
     zero_mask = rej_array == 0
     nonzero_mask = np.logical_not(zero_mask)
     rej_array[nonzero_mask] = rej_array.max() / rej_array[nonzero_mask]
@@ -1,16 +1,30 @@
-try:
-    import yaml
-except ImportError:
-    import json as yaml
-    def dump_proxy(obj, **args):
-        """
-        monkey patch json to look like yaml
-        """
-        return yaml.dumps(obj)
-    yaml.dump = dump_proxy
-
+import os
 from os.path import isfile
 
+def _yaml():
+    """
+    Imported when needed, falls back to json if yaml isn't installed.
+    """
+    try:
+        import yaml
+    except ImportError:
+        return _JsonYaml
+    return yaml
+
+class _JsonYaml(object):
+    """
+    Makes json look like yaml (without patching the json module, which
+    other code uses).
+    """
+    @staticmethod
+    def load(stream):
+        import json
+        return json.load(stream)
+    @staticmethod
+    def dump(obj, **args):
+        import json
+        return json.dumps(obj)
+
 def display_name(name):
     if name.startswith('mv'):
         return 'MV' + name[2:]
@@ -22,31 +36,73 @@ class ColorScheme(dict):
     """
     Keeps track of / assigns colors for the taggers.
     Assignments are stored in a yaml file.
+
+    Known colors are looked up in memory. New taggers are assigned under
+    a lock on the file, after merging in anything other processes have
+    written, so concurrent jobs agree on the colors. Use get_colors to
+    share one scheme per file within a process.
     """
     colors = list('bgrcmyk') + ['orange', 'brown']
     def __init__(self, file_name):
         self.yaml_file = file_name
-        if isfile(file_name):
-            with open(file_name, 'r') as ymlfile:
-                self.update(yaml.load(ymlfile))
+        self._read()
     def __enter__(self):
         return self
     def __exit__(self, ex_type, ex_mess, tb):
-        self.write(self.yaml_file)
+        pass
     def __getitem__(self, key):
         if not key in self:
-            opts = set(self.colors) - set(self.values())
+            self._assign(str(key))
+        return super(ColorScheme,self).__getitem__(key)
+    def _read(self):
+        if isfile(self.yaml_file):
+            with open(self.yaml_file, 'r') as ymlfile:
+                self.update(_yaml().load(ymlfile) or {})
+    def _assign(self, key):
+        with _FileLock(self.yaml_file + '.lock'):
+            self._read()
+            if key in self:
+                return
+            used = set(self.values())
+            opts = [c for c in self.colors if c not in used]
             if not opts:
                 raise KeyError("ran out of color keys")
-            val = next(iter(opts))
-            super(ColorScheme,self).__setitem__(str(key), val)
-            return val
-        return super(ColorScheme,self).__getitem__(key)
+            super(ColorScheme,self).__setitem__(key, opts[0])
+            self.write(self.yaml_file)
     def write(self, fname):
-        with open(fname,'w') as ymlfile:
-            out_str = yaml.dump(dict(self.items()), default_flow_style=False)
+        # write then rename, so other processes never read half a file
+        tmp_name = '{}.{}.tmp'.format(fname, os.getpid())
+        with open(tmp_name,'w') as ymlfile:
+            out_str = _yaml().dump(
+                dict(self.items()), default_flow_style=False)
             ymlfile.write(out_str)
+        os.replace(tmp_name, fname)
 
+class _FileLock(object):
+    """
+    Advisory lock (held while in the with block) on a lock file.
+    """
+    def __init__(self, file_name):
+        self.file_name = file_name
+    def __enter__(self):
+        import fcntl
+        self._lock_file = open(self.file_name, 'a')
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        return self
+    def __exit__(self, ex_type, ex_mess, tb):
+        import fcntl
+        fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+        self._lock_file.close()
+
+_color_schemes = {}
+def get_colors(file_name='colors.yml'):
+    """
+    Process-wide ColorScheme for a file, it's only read once.
+    """
+    path = os.path.realpath(file_name)
+    if path not in _color_schemes:
+        _color_schemes[path] = ColorScheme(file_name)
+    return _color_schemes[path]
 
 def get_taggers(in_file, subset=None):
     taggers = set(in_file['B/btag/all/'].keys())
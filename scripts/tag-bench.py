@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Time the python side (the calculations and the drawing) on synthetic
+histogram files, at several histogram sizes.
+
+The files are made by tagperf.synth, with the tag-perf-d3pd and
+tag-perf-peter layouts. A size is the number of bins on each axis of the
+2d histograms, the 1d histograms get five times as many (the defaults
+for the C++ are 2000 and 10000). Each stage is timed a few times and the
+fastest run is kept. With a baseline file the times are compared to the
+ones saved there, and the script fails if a stage got slower by more
+than the threshold.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+_compute = ['integral', 'rejrej', 'c-vs-u', 'roc', 'pt-rejection',
+            'peters-eff']
+_draw = ['draw-roc', 'draw-pt', 'draw-c1d', 'draw-rejrej']
+# no more taggers than tagschema has colors for
+_draw_taggers = ['mv1', 'mv1c', 'mv2c20', 'gaiaGr1', 'gaiaAntiU',
+                 'jfcAntiU', 'jfitAntiU']
+_effs = [0.6, 0.7, 0.8]
+
+def get_args():
+    d = '(default %(default)s)'
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '-s', '--sizes', type=int, nargs='+', default=[250, 1000],
+        help='2d histogram bins per axis ' + d)
+    parser.add_argument(
+        '-j', '--n-jets', type=int, default=None,
+        help='synthetic jets per file (default from tagperf.synth)')
+    parser.add_argument(
+        '-n', '--n-runs', type=int, default=3,
+        help='take the fastest of this many runs ' + d)
+    parser.add_argument(
+        '--stages', nargs='+', choices=_compute + _draw,
+        default=_compute + _draw, metavar='STAGE',
+        help='stages to time, out of: ' + ', '.join(_compute + _draw))
+    parser.add_argument(
+        '--no-draw', action='store_true', help="don't time the drawing")
+    parser.add_argument(
+        '-d', '--data-dir',
+        help='keep the synthetic files here, and reuse them')
+    parser.add_argument(
+        '-b', '--baseline', help='json file with the times to compare to')
+    parser.add_argument(
+        '-u', '--update', action='store_true',
+        help='save the times in the baseline file')
+    parser.add_argument(
+        '-t', '--threshold', type=float, default=1.5,
+        help='fail if a stage takes this many times the baseline ' + d)
+    parser.add_argument(
+        '--slack', type=float, default=0.1,
+        help="don't fail on slowdowns below this many seconds " + d)
+    args = parser.parse_args(sys.argv[1:])
+    if args.update and not args.baseline:
+        parser.error('--update needs a baseline file')
+    return args
+
+# __________________________________________________________________________
+# stages, each is called with the d3pd file, the peter file, and a
+# directory for anything it writes
+
+def _integral(d3pd, peter, work_dir):
+    from tagperf.integral import get_integral
+    for flavor in 'BCUT':
+        for tagger in ['gaia', 'jfc', 'jfit', 'gaiaBtag', 'mv']:
+            get_integral(d3pd['{}/ctag/all/{}'.format(flavor, tagger)])
+
+def _rejrej(d3pd, peter, work_dir):
+    from tagperf.ctaging import RejRejComp
+    RejRejComp('BUC', 50.0, 400.0).calculate(
+        lambda flavor: d3pd['{}/ctag/all/gaia'.format(flavor)])
+
+def _c_vs_u(d3pd, peter, work_dir):
+    from tagperf.ctaging import get_c_vs_u_const_beff
+    for tagger in ['gaia', 'jfc', 'jfit']:
+        get_c_vs_u_const_beff(d3pd, tagger)
+
+def _roc(d3pd, peter, work_dir):
+    from tagperf import tagschema
+    from tagperf.tagroc import get_roc
+    for tagger in tagschema.get_taggers(d3pd):
+        for flavor in 'UC':
+            get_roc(d3pd, tagger, flavor=flavor)
+
+def _pt_rejection(d3pd, peter, work_dir):
+    from tagperf import tagschema
+    from tagperf.tagpt import PtPerformance
+    perf = PtPerformance(d3pd, tagschema.get_taggers(d3pd))
+    perf.rejection(_effs)
+
+def _peters_eff(d3pd, peter, work_dir):
+    from tagperf.peters import PetersEff
+    for flavor in 'CUB':
+        PetersEff(peter, flavor).get_efficiency()
+
+def _draw_roc(d3pd, peter, work_dir):
+    from tagperf.tagroc import draw_btag_roc
+    for flavor in 'UC':
+        draw_btag_roc(d3pd, work_dir, ext='.png', baseline='gaiaGr1',
+                      flavor=flavor, subset=_draw_taggers)
+
+def _draw_pt(d3pd, peter, work_dir):
+    from tagperf.tagpt import draw_pt_plots
+    draw_pt_plots(d3pd, work_dir, ext='.png', subset=_draw_taggers)
+
+def _draw_c1d(d3pd, peter, work_dir):
+    from tagperf.ctaging import make_1d_plots
+    make_1d_plots(d3pd.filename, work_dir, '.png')
+
+def _setup_rejrej(d3pd, peter, work_dir):
+    from tagperf.ctaging import build_rejrej
+    cache_name = os.path.join(work_dir, 'rejrej-cache.h5')
+    if os.path.isfile(cache_name):
+        os.remove(cache_name)
+    build_rejrej(d3pd.filename, cache_name, taggers=['gaia'])
+
+def _draw_rejrej(d3pd, peter, work_dir):
+    import h5py
+    from tagperf.ctaging import draw_simple_rejrej
+    cache_name = os.path.join(work_dir, 'rejrej-cache.h5')
+    with h5py.File(cache_name, 'r') as cache:
+        draw_simple_rejrej(cache, work_dir, ext='.png')
+
+_stages = {
+    'integral': (None, _integral),
+    'rejrej': (None, _rejrej),
+    'c-vs-u': (None, _c_vs_u),
+    'roc': (None, _roc),
+    'pt-rejection': (None, _pt_rejection),
+    'peters-eff': (None, _peters_eff),
+    'draw-roc': (None, _draw_roc),
+    'draw-pt': (None, _draw_pt),
+    'draw-c1d': (None, _draw_c1d),
+    'draw-rejrej': (_setup_rejrej, _draw_rejrej),
+}
+
+# __________________________________________________________________________
+# running
+
+def _synth_files(data_dir, size, n_jets):
+    from tagperf import synth
+    names = []
+    for kind, write, bins in [
+        ('d3pd', synth.write_d3pd, dict(n_bins=5*size, n_2ax_bins=size)),
+        ('peter', synth.write_peter, dict(n_2ax_bins=size))]:
+        name = os.path.join(data_dir, 'synth-{}-{}-{}.h5'.format(
+                kind, size, n_jets))
+        if not os.path.isfile(name):
+            print('writing {}'.format(name))
+            write(name + '.tmp', n_jets=n_jets, **bins)
+            os.replace(name + '.tmp', name)
+        names.append(name)
+    return names
+
+def _time_stage(stage, file_names, work_dir, n_runs):
+    import h5py
+    from tagperf import integral
+    setup, run = _stages[stage]
+    times = []
+    with h5py.File(file_names[0], 'r') as d3pd:
+        with h5py.File(file_names[1], 'r') as peter:
+            if setup:
+                setup(d3pd, peter, work_dir)
+            for _ in range(n_runs):
+                # the integrals are memoized, start from nothing each time
+                integral._store.clear()
+                with open(os.devnull, 'w') as devnull:
+                    with contextlib.redirect_stderr(devnull):
+                        start = time.perf_counter()
+                        run(d3pd, peter, work_dir)
+                        times.append(time.perf_counter() - start)
+    return min(times)
+
+def _read_baseline(name):
+    if not name or not os.path.isfile(name):
+        return {}
+    with open(name) as baseline_file:
+        return json.load(baseline_file)
+
+def _compare(times, baseline, threshold, slack):
+    """
+    Print a line per stage, return the ones that got slower.
+    """
+    slower = []
+    for key, elapsed in sorted(times.items()):
+        base = baseline.get(key)
+        if base is None:
+            print('{:<24} {:8.3f} s'.format(key, elapsed))
+            continue
+        ratio = elapsed / base if base > 0 else float('inf')
+        over = elapsed > threshold * base and elapsed - base > slack
+        print('{:<24} {:8.3f} s (baseline {:.3f} s, x{:.2f}){}'.format(
+                key, elapsed, base, ratio, ' SLOWER' if over else ''))
+        if over:
+            slower.append(key)
+    return slower
+
+def run():
+    args = get_args()
+    from tagperf import synth
+    n_jets = args.n_jets or synth.DEFAULT_N_JETS
+    stages = [s for s in args.stages if not (args.no_draw and s in _draw)]
+    baseline = _read_baseline(args.baseline)
+    if baseline and baseline.get('n_jets', n_jets) != n_jets:
+        print('warning: baseline was made with {} jets'.format(
+                baseline['n_jets']))
+    baseline_times = baseline.get('times', {})
+
+    work_dir = tempfile.mkdtemp(prefix='tag-bench-')
+    data_dir = args.data_dir or work_dir
+    if not os.path.isdir(data_dir):
+        os.makedirs(data_dir)
+    data_dir = os.path.abspath(data_dir)
+    cwd = os.getcwd()
+    times = {}
+    try:
+        # the plotting code writes colors.yml in the current directory
+        os.chdir(work_dir)
+        for size in args.sizes:
+            file_names = _synth_files(data_dir, size, n_jets)
+            for stage in stages:
+                times['{}/{}'.format(stage, size)] = _time_stage(
+                    stage, file_names, work_dir, args.n_runs)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir)
+
+    slower = _compare(times, baseline_times, args.threshold, args.slack)
+    if args.update:
+        baseline_times.update(times)
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(dict(n_jets=n_jets, times=baseline_times),
+                      baseline_file, indent=2, sort_keys=True)
+        print('saved times in {}'.format(args.baseline))
+    elif slower:
+        print('{} stage(s) slower than {}x the baseline: {}'.format(
+                len(slower), args.threshold, ', '.join(slower)))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Check that `tagperf` starts within a time budget, and that the commands
+that don't draw anything don't import the plotting libraries.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+_heavy = ['matplotlib', 'mpl_toolkits', 'scipy', 'yaml']
+
+def get_args():
+    d = '(default %(default)s)'
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '-b', '--budget', type=float, default=0.5,
+        help='allowed start-up time in seconds ' + d)
+    parser.add_argument(
+        '-n', '--n-runs', type=int, default=5,
+        help='take the fastest of this many runs ' + d)
+    return parser.parse_args(sys.argv[1:])
+
+def _time_help(n_runs):
+    tagperf = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'tagperf')
+    times = []
+    for _ in range(n_runs):
+        start = time.perf_counter()
+        subprocess.check_call([sys.executable, tagperf, '-h'],
+                              stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+_import_check = '''
+import sys, time
+start = time.perf_counter()
+from tagperf import cli, ctaging, b2d, peters, tagpt, tagroc
+from tagperf import cutline, cutplane, oppoint
+print(time.perf_counter() - start)
+print(' '.join(sorted({m.split('.')[0] for m in sys.modules})))
+'''
+
+def _check_imports():
+    """
+    Returns the time to import all the modules, and the heavy ones that
+    were imported along the way.
+    """
+    out = subprocess.check_output([sys.executable, '-c', _import_check])
+    elapsed, modules = out.decode('utf-8').split('\n', 1)
+    modules = set(modules.split())
+    return float(elapsed), [m for m in _heavy if m in modules]
+
+def run():
+    args = get_args()
+    failed = False
+    import_time, heavy = _check_imports()
+    if heavy:
+        print('importing tagperf modules pulls in: ' + ', '.join(heavy))
+        failed = True
+    help_time = _time_help(args.n_runs)
+    for what, elapsed in [('tagperf -h', help_time),
+                          ('importing tagperf', import_time)]:
+        print('{}: {:.3f} s (budget {:.3f} s)'.format(
+                what, elapsed, args.budget))
+        if elapsed > args.budget:
+            print('{} is over budget'.format(what))
+            failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    run()
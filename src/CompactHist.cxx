@@ -0,0 +1,149 @@
+#include "CompactHist.hh"
+#include "writeChunked.hh"
+
+#include "H5Cpp.h"
+
+#include <stdexcept>
+#include <algorithm>
+#include <limits>
+#include <cmath>
+
+namespace {
+  // each axis has underflow, overflow, and a bin for NaN
+  const size_t EXTRA_BINS = 3;
+  // memory for one filled bin in the map (node, key, value, bucket)
+  const size_t SPARSE_BIN_BYTES = 40;
+  const double MAX_COUNT = std::numeric_limits<uint32_t>::max();
+}
+
+CompactHist::CompactHist(const std::vector<Axis>& axes, unsigned flags):
+  m_axes(axes),
+  m_flags(flags),
+  m_n_bins(1),
+  m_dense(false)
+{
+  if (axes.empty()) throw std::invalid_argument("histogram needs an axis");
+  for (const auto& axis: axes) {
+    if (axis.n_bins < 1 || !(axis.high > axis.low)) {
+      throw std::invalid_argument("bad axis " + axis.name);
+    }
+    m_n_bins *= axis.n_bins + EXTRA_BINS;
+  }
+}
+
+CompactHist::CompactHist(int n_bins, double low, double high,
+			 std::string units, unsigned flags):
+  CompactHist(std::vector<Axis>{{"x", n_bins, low, high, units}}, flags)
+{
+}
+
+void CompactHist::fill(double value, double weight) {
+  if (m_axes.size() != 1) {
+    throw std::invalid_argument("one value to fill a multi-axis histogram");
+  }
+  addToBin(axisBin(0, value), weight);
+}
+
+void CompactHist::fill(const std::vector<double>& values, double weight) {
+  if (values.size() != m_axes.size()) {
+    throw std::invalid_argument("wrong number of values in histogram fill");
+  }
+  size_t bin = 0;
+  for (size_t axis = 0; axis < m_axes.size(); axis++) {
+    size_t n_slots = m_axes[axis].n_bins + EXTRA_BINS;
+    bin = bin * n_slots + axisBin(axis, values[axis]);
+  }
+  addToBin(bin, weight);
+}
+
+void CompactHist::add(const CompactHist& other) {
+  if (other.m_n_bins != m_n_bins || other.m_axes.size() != m_axes.size()) {
+    throw std::logic_error("adding histograms with different binning");
+  }
+  if (!other.m_dense) {
+    for (const auto& bin: other.m_sparse) addToBin(bin.first, bin.second);
+  } else if (!other.m_weights.empty()) {
+    for (size_t bin = 0; bin < m_n_bins; bin++) {
+      if (other.m_weights[bin] != 0) addToBin(bin, other.m_weights[bin]);
+    }
+  } else {
+    for (size_t bin = 0; bin < m_n_bins; bin++) {
+      if (other.m_counts[bin] != 0) addToBin(bin, other.m_counts[bin]);
+    }
+  }
+}
+
+void CompactHist::writeTo(H5::CommonFG& fg, const std::string& name) const {
+  // build the full histogram only now, one bin center per filled bin
+  Histogram hist(m_axes, m_flags);
+  if (!m_dense) {
+    for (const auto& bin: m_sparse) {
+      if (bin.second != 0) hist.fill(binCenters(bin.first), bin.second);
+    }
+  } else {
+    for (size_t bin = 0; bin < m_n_bins; bin++) {
+      double weight = m_weights.empty() ? m_counts[bin] : m_weights[bin];
+      if (weight != 0) hist.fill(binCenters(bin), weight);
+    }
+  }
+  writeChunked(hist, fg, name);
+}
+
+size_t CompactHist::axisBin(size_t axis, double value) const {
+  const Axis& ax = m_axes[axis];
+  if (std::isnan(value)) return ax.n_bins + 2;
+  if (value < ax.low) return 0;
+  if (value >= ax.high) return ax.n_bins + 1;
+  size_t bin = (value - ax.low) / (ax.high - ax.low) * ax.n_bins;
+  return std::min<size_t>(bin, ax.n_bins - 1) + 1;
+}
+
+void CompactHist::addToBin(size_t bin, double weight) {
+  if (!m_dense) {
+    m_sparse[bin] += weight;
+    if (m_sparse.size() * SPARSE_BIN_BYTES > m_n_bins * sizeof(uint32_t)) {
+      makeDense();
+    }
+    return;
+  }
+  if (m_weights.empty()) {
+    // stay with integers as long as the sum is a count that fits
+    double sum = m_counts[bin] + weight;
+    if (weight >= 0 && std::floor(weight) == weight && sum <= MAX_COUNT) {
+      m_counts[bin] = sum;
+      return;
+    }
+    m_weights.assign(m_counts.begin(), m_counts.end());
+    std::vector<uint32_t>().swap(m_counts);
+  }
+  m_weights[bin] += weight;
+}
+
+void CompactHist::makeDense() {
+  std::unordered_map<size_t, double> sparse;
+  sparse.swap(m_sparse);
+  m_dense = true;
+  m_counts.assign(m_n_bins, 0);
+  for (const auto& bin: sparse) addToBin(bin.first, bin.second);
+}
+
+std::vector<double> CompactHist::binCenters(size_t bin) const {
+  std::vector<double> centers(m_axes.size());
+  for (size_t axis = m_axes.size(); axis-- > 0;) {
+    const Axis& ax = m_axes[axis];
+    size_t n_slots = ax.n_bins + EXTRA_BINS;
+    size_t slot = bin % n_slots;
+    bin /= n_slots;
+    double width = (ax.high - ax.low) / ax.n_bins;
+    if (slot == 0) {
+      centers[axis] = ax.low - width;
+    } else if (slot == size_t(ax.n_bins + 1)) {
+      centers[axis] = ax.high + width;
+    } else if (slot == size_t(ax.n_bins + 2)) {
+      centers[axis] = std::numeric_limits<double>::quiet_NaN();
+    } else {
+      centers[axis] = ax.low + (slot - 0.5) * width;
+    }
+  }
+  return centers;
+}
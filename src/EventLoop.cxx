@@ -0,0 +1,88 @@
+#include "EventLoop.hh"
+
+#include "RVersion.h"
+#if ROOT_VERSION_CODE >= ROOT_VERSION(6,0,0)
+#include "TROOT.h"
+#else
+#include "TThread.h"
+#endif
+
+#include <thread>
+#include <exception>
+#include <stdexcept>
+#include <string>
+
+std::vector<EntryRange> splitEntries(int n_entries, int n_parts) {
+  if (n_parts < 1) throw std::domain_error("need at least one part");
+  std::vector<EntryRange> ranges;
+  int begin = 0;
+  for (int part = 0; part < n_parts; part++) {
+    int size = n_entries / n_parts + (part < n_entries % n_parts ? 1 : 0);
+    ranges.push_back({begin, begin + size});
+    begin += size;
+  }
+  return ranges;
+}
+
+std::vector<EntryRange> splitEntries(EntryRange range, int n_parts) {
+  auto ranges = splitEntries(range.end - range.begin, n_parts);
+  for (auto& part: ranges) {
+    part.begin += range.begin;
+    part.end += range.begin;
+  }
+  return ranges;
+}
+
+EntrySelection::EntrySelection():
+  first_entry(0),
+  n_entries(-1),
+  shard(0),
+  n_shards(1)
+{
+}
+
+EntryRange selectEntries(int n_total, const EntrySelection& sel) {
+  if (sel.first_entry < 0 || sel.first_entry > n_total) {
+    throw std::out_of_range(
+      "first entry " + std::to_string(sel.first_entry) + " isn't in a chain"
+      " of " + std::to_string(n_total) + " entries");
+  }
+  if (sel.n_shards < 1 || sel.shard < 0 || sel.shard >= sel.n_shards) {
+    throw std::out_of_range(
+      "bad shard " + std::to_string(sel.shard) + "/" +
+      std::to_string(sel.n_shards));
+  }
+  int end = n_total;
+  if (sel.n_entries >= 0 && sel.n_entries < n_total - sel.first_entry) {
+    end = sel.first_entry + sel.n_entries;
+  }
+  return splitEntries({sel.first_entry, end}, sel.n_shards).at(sel.shard);
+}
+
+void enableRootThreads() {
+#if ROOT_VERSION_CODE >= ROOT_VERSION(6,0,0)
+  ROOT::EnableThreadSafety();
+#else
+  TThread::Initialize();
+#endif
+}
+
+void runThreads(const std::vector<std::function<void()> >& jobs) {
+  std::vector<std::exception_ptr> errors(jobs.size());
+  auto run = [&jobs, &errors](size_t job) {
+    try {
+      jobs.at(job)();
+    } catch (...) {
+      errors.at(job) = std::current_exception();
+    }
+  };
+  std::vector<std::thread> threads;
+  for (size_t job = 1; job < jobs.size(); job++) {
+    threads.emplace_back(run, job);
+  }
+  if (!jobs.empty()) run(0);
+  for (auto& thread: threads) thread.join();
+  for (auto& error: errors) {
+    if (error) std::rethrow_exception(error);
+  }
+}
@@ -0,0 +1,111 @@
+#include "HistSpec.hh"
+
+#include <fstream>
+#include <sstream>
+#include <stdexcept>
+#include <limits>
+#include <cstdlib>
+
+namespace {
+  std::string strip(const std::string& str);
+  std::vector<std::string> splitList(const std::string& str);
+  std::vector<double> toNumbers(const std::vector<std::string>& strings);
+}
+
+HistSpec::HistSpec():
+  btag{"mv1", "mv1c", "mvb", "gaiaAntiU", "gaiaAntiC", "gaiaGr1",
+    "mv2c00", "mv2c10", "mv2c20", "jfcAntiU", "jfcAntiC",
+    "jfitAntiU", "jfitAntiC"},
+  ctag{"gaia", "jfc", "jfit", "gaiaC", "gaiaBtag", "mv"},
+  pt_bins{0, 20, 30, 40, 50, 60, 75, 90, 110, 150, 200, 600,
+    std::numeric_limits<double>::infinity()}
+{
+}
+
+HistSpec readHistSpec(const std::string& file_name) {
+  std::ifstream file(file_name);
+  if (!file) throw std::runtime_error("can't open " + file_name);
+  std::vector<std::pair<std::string, std::vector<std::string> > > keys;
+  std::string line;
+  int line_number = 0;
+  while (std::getline(file, line)) {
+    line_number++;
+    line = strip(line.substr(0, line.find('#')));
+    if (line.empty()) continue;
+    if (line[0] == '-' && !keys.empty()) {
+      keys.back().second.push_back(strip(line.substr(1)));
+      continue;
+    }
+    size_t colon = line.find(':');
+    if (colon == std::string::npos) {
+      std::stringstream err;
+      err << file_name << ", line " << line_number << ": expected 'key:'";
+      throw std::runtime_error(err.str());
+    }
+    keys.emplace_back(strip(line.substr(0, colon)),
+		      splitList(line.substr(colon + 1)));
+  }
+
+  HistSpec spec;
+  for (const auto& key: keys) {
+    if (key.first == "btag") {
+      spec.btag = key.second;
+    } else if (key.first == "ctag") {
+      spec.ctag = key.second;
+    } else if (key.first == "pt_bins") {
+      spec.pt_bins = toNumbers(key.second);
+    } else {
+      throw std::runtime_error(
+	"unknown key '" + key.first + "' in " + file_name);
+    }
+  }
+  if (spec.pt_bins.size() < 2) {
+    throw std::runtime_error("need at least two pt_bins in " + file_name);
+  }
+  for (size_t bin = 1; bin < spec.pt_bins.size(); bin++) {
+    if (!(spec.pt_bins.at(bin) > spec.pt_bins.at(bin - 1))) {
+      throw std::runtime_error("pt_bins must increase in " + file_name);
+    }
+  }
+  return spec;
+}
+
+namespace {
+  std::string strip(const std::string& str) {
+    const char* space = " \t\r\n";
+    size_t first = str.find_first_not_of(space);
+    if (first == std::string::npos) return "";
+    return str.substr(first, str.find_last_not_of(space) - first + 1);
+  }
+
+  // "[a, b]" or "a, b" -> {"a", "b"}
+  std::vector<std::string> splitList(const std::string& str) {
+    std::string list = strip(str);
+    if (!list.empty() && list.front() == '[' && list.back() == ']') {
+      list = list.substr(1, list.size() - 2);
+    }
+    std::vector<std::string> items;
+    std::stringstream stream(list);
+    std::string item;
+    while (std::getline(stream, item, ',')) {
+      item = strip(item);
+      if (!item.empty()) items.push_back(item);
+    }
+    return items;
+  }
+
+  std::vector<double> toNumbers(const std::vector<std::string>& strings) {
+    std::vector<double> numbers;
+    for (auto str: strings) {
+      // yaml writes infinity as .inf
+      if (str == ".inf" || str == ".Inf" || str == ".INF") str = "inf";
+      char* end;
+      double number = std::strtod(str.c_str(), &end);
+      if (str.empty() || *end != '\0') {
+	throw std::runtime_error("'" + str + "' isn't a number");
+      }
+      numbers.push_back(number);
+    }
+    return numbers;
+  }
+}
@@ -4,14 +4,22 @@
 
 #include <cassert>
 
+namespace {
+  // branches that weren't read are null
+  template<typename T>
+  float valueOr(const std::vector<T>* vec, int index, float missing) {
+    return vec ? vec->at(index) : missing;
+  }
+}
+
 TagTriple::TagTriple() : pu(-999), pc(-999), pb(-999)
 {
 }
 
 TagTriple::TagTriple(const TagVectors& buff, int index):
-  pu(buff.pu->at(index)),
-  pc(buff.pc->at(index)),
-  pb(buff.pb->at(index))
+  pu(valueOr(buff.pu, index, -999)),
+  pc(valueOr(buff.pc, index, -999)),
+  pb(valueOr(buff.pb, index, -999))
 {
 }
 
@@ -39,17 +47,17 @@ Jet::Jet(const TreeBuffer& buff, int index) :
   eta(buff.jet_eta->at(index)),
   jvf(-999),
   valid(true),
-  mv1(buff.jet_MV1->at(index)),
-  mv1c(buff.jet_MV1c->at(index)),
-  mv2c00(buff.jet_MV2c00->at(index)),
-  mv2c10(buff.jet_MV2c10->at(index)),
-  mv2c20(buff.jet_MV2c20->at(index)),
-  mvb(buff.jet_MVb->at(index)),
+  mv1(valueOr(buff.jet_MV1, index, -999)),
+  mv1c(valueOr(buff.jet_MV1c, index, -999)),
+  mv2c00(valueOr(buff.jet_MV2c00, index, -999)),
+  mv2c10(valueOr(buff.jet_MV2c10, index, -999)),
+  mv2c20(valueOr(buff.jet_MV2c20, index, -999)),
+  mvb(valueOr(buff.jet_MVb, index, -999)),
   truth_label(getFlavor(buff.jet_flavor_truth_label->at(index))),
   gaia(buff.gaia, index),
   jfit(buff.jfit, index),
   jfc(buff.jfc, index),
-  gaia_valid(buff.jet_gaia_isValid->at(index))
+  gaia_valid(valueOr(buff.jet_gaia_isValid, index, 0))
 {
 }
 
@@ -1,6 +1,6 @@
 #include "JetPerfHists.hh"
 #include "Jet.hh"
-#include "Histogram.hh"
+#include "CompactHist.hh"
 
 #include "H5Cpp.h"
 
@@ -8,6 +8,7 @@
 #include <cmath>
 #include <cassert>
 #include <limits>
+#include <map>
 
 namespace {
   double btagAntiU(const TagTriple&);
@@ -19,182 +20,244 @@ namespace {
   std::string binString(double);
 }
 
-// ======== btag hists ==============
+// ======== histogram registry ==============
+
+namespace {
+  // how to make and fill a histogram, and which taggers it needs
+  struct HistDef {
+    std::vector<Axis> axes;
+    FilledHist::Value x;
+    FilledHist::Value y;
+    std::vector<std::string> inputs;
+    unsigned flags;
+  };
+  typedef std::map<std::string, HistDef> Registry;
+
+  HistDef oneD(const Axis& axis, FilledHist::Value x,
+	       const std::string& input) {
+    return {{axis}, x, 0, {input}, hist::eat_nan};
+  }
+  HistDef twoD(const Axis& x_axis, const Axis& y_axis,
+	       FilledHist::Value x, FilledHist::Value y,
+	       const std::vector<std::string>& inputs,
+	       unsigned flags = hist::eat_nan) {
+    return {{x_axis, y_axis}, x, y, inputs, flags};
+  }
+
+  const Registry& btagRegistry() {
+    using namespace hist;
+    const Axis mv1_axis = {"x", N_BINS, 0.0, 1.0, ""};
+    const Axis mv2_axis = {"x", N_BINS, -1.0, 1.0, ""};
+    const Axis gaia_axis = {"x", N_BINS, GAIA_LOW, GAIA_HIGH, ""};
+    static const Registry registry {
+      {"mv1", oneD(mv1_axis, [](const Jet& j) -> double {
+	    return j.mv1;}, "mv1")},
+      {"mv1c", oneD(mv1_axis, [](const Jet& j) -> double {
+	    return j.mv1c;}, "mv1c")},
+      {"mvb", oneD(mv2_axis, [](const Jet& j) -> double {
+	    return j.mvb;}, "mvb")},
+      {"gaiaAntiU", oneD(gaia_axis, [](const Jet& j) {
+	    return btagAntiU(j.gaia);}, "gaia")},
+      {"gaiaAntiC", oneD(gaia_axis, [](const Jet& j) {
+	    return btagAntiC(j.gaia);}, "gaia")},
+      {"gaiaGr1", oneD(gaia_axis, [](const Jet& j) {
+	    return gr1(j.gaia);}, "gaia")},
+      {"mv2c00", oneD(mv2_axis, [](const Jet& j) -> double {
+	    return j.mv2c00;}, "mv2c00")},
+      {"mv2c10", oneD(mv2_axis, [](const Jet& j) -> double {
+	    return j.mv2c10;}, "mv2c10")},
+      {"mv2c20", oneD(mv2_axis, [](const Jet& j) -> double {
+	    return j.mv2c20;}, "mv2c20")},
+      {"jfcAntiU", oneD(gaia_axis, [](const Jet& j) {
+	    return btagAntiU(j.jfc);}, "jfc")},
+      {"jfcAntiC", oneD(gaia_axis, [](const Jet& j) {
+	    return btagAntiC(j.jfc);}, "jfc")},
+      {"jfitAntiU", oneD(gaia_axis, [](const Jet& j) {
+	    return btagAntiU(j.jfit);}, "jfit")},
+      {"jfitAntiC", oneD(gaia_axis, [](const Jet& j) {
+	    return btagAntiC(j.jfit);}, "jfit")},
+    };
+    return registry;
+  }
+
+  const Registry& ctagRegistry() {
+    using namespace hist;
+    const Axis gaia_axis = {"x", N_2AX_BINS, GAIA_LOW, GAIA_HIGH, ""};
+    Axis anti_b = gaia_axis;
+    anti_b.name = "antiB";
+    Axis anti_u = gaia_axis;
+    anti_u.name = "antiU";
+    Axis anti_c = gaia_axis;
+    anti_c.name = "antiC";
+    const Axis mv1_axis = {"mv1", N_2AX_BINS, 0.0, 1.0, ""};
+    const Axis mv1c_axis = {"mv1c", N_2AX_BINS, 0.0, 1.0, ""};
+    const Axis pc_axis = {"x", N_BINS, 0.0, 1.0, ""};
+    static const Registry registry {
+      {"gaia", twoD(anti_u, anti_b,
+		    [](const Jet& j) {return ctagAntiU(j.gaia);},
+		    [](const Jet& j) {return ctagAntiB(j.gaia);}, {"gaia"})},
+      {"jfc", twoD(anti_u, anti_b,
+		   [](const Jet& j) {return ctagAntiU(j.jfc);},
+		   [](const Jet& j) {return ctagAntiB(j.jfc);}, {"jfc"})},
+      {"jfit", twoD(anti_u, anti_b,
+		    [](const Jet& j) {return ctagAntiU(j.jfit);},
+		    [](const Jet& j) {return ctagAntiB(j.jfit);}, {"jfit"})},
+      {"gaiaC", oneD(pc_axis, [](const Jet& j) -> double {
+	    return j.gaia.pc;}, "gaia")},
+      {"gaiaBtag", twoD(anti_u, anti_c,
+			[](const Jet& j) {return btagAntiU(j.gaia);},
+			[](const Jet& j) {return btagAntiC(j.gaia);},
+			{"gaia"})},
+      // The (obviously terrible) combination of MV1 and MV1c: use (1 -
+      // mv1c) to select c and light jets. Then use mv1 to remove the
+      // light jets.
+      {"mv", twoD(mv1_axis, mv1c_axis,
+		  [](const Jet& j) -> double {return j.mv1;},
+		  [](const Jet& j) -> double {return 1.0 - j.mv1c;},
+		  {"mv1", "mv1c"}, 0)},
+    };
+    return registry;
+  }
+
+  const HistDef& lookUp(const Registry& registry, const std::string& name) {
+    auto def = registry.find(name);
+    if (def == registry.end()) {
+      throw std::invalid_argument("no histogram called " + name);
+    }
+    return def->second;
+  }
+
+  std::vector<FilledHist> buildHists(const Registry& registry,
+				     const std::vector<std::string>& names) {
+    std::vector<FilledHist> hists;
+    for (const auto& name: names) {
+      const HistDef& def = lookUp(registry, name);
+      hists.emplace_back(name, new CompactHist(def.axes, def.flags),
+			 def.x, def.y);
+    }
+    return hists;
+  }
+
+  void fillHists(std::vector<FilledHist>& hists, const Jet& jet,
+		 double weight) {
+    for (auto& filled: hists) {
+      if (filled.y) {
+	filled.hist->fill({filled.x(jet), filled.y(jet)}, weight);
+      } else {
+	filled.hist->fill(filled.x(jet), weight);
+      }
+    }
+  }
+
+  void addHists(std::vector<FilledHist>& hists,
+		const std::vector<FilledHist>& other) {
+    for (size_t idx = 0; idx < hists.size(); idx++) {
+      hists.at(idx).hist->add(*other.at(idx).hist);
+    }
+  }
+
+  void writeHists(const std::vector<FilledHist>& hists, H5::CommonFG& fg) {
+    for (const auto& filled: hists) {
+      filled.hist->writeTo(fg, filled.name);
+    }
+  }
+}
 
-BtagHists::BtagHists() :
-  m_mv1(0),
-  m_mv1c(0),
-  m_mvb(0),
-  m_gaia_anti_light(0),
-  m_gaia_anti_charm(0),
-  m_gaia_gr1(0),
-  m_mv2c00(0),
-  m_mv2c10(0),
-  m_mv2c20(0),
-  m_jfc_anti_light(0),
-  m_jfc_anti_charm(0),
-  m_jfit_anti_light(0),
-  m_jfit_anti_charm(0)
+FilledHist::FilledHist(const std::string& name_, CompactHist* hist_,
+		       Value x_, Value y_):
+  name(name_),
+  hist(hist_),
+  x(x_),
+  y(y_)
 {
-  using namespace hist;
-  unsigned hflag = hist::eat_nan;
-  const Axis mv1_axis = {"x", N_BINS, 0.0, 1.0, ""};
-  const Axis mv2_axis = {"x", N_BINS, -1.0, 1.0, ""};
-  const Axis gaia_axis = {"x", N_BINS, GAIA_LOW, GAIA_HIGH, ""};
-
-  m_mv1 = new Histogram({mv1_axis}, hflag);
-  m_mv1c = new Histogram({mv1_axis}, hflag);
-  m_mvb = new Histogram({mv2_axis}, hflag);
-  m_gaia_anti_light = new Histogram({gaia_axis}, hflag);
-  m_gaia_anti_charm = new Histogram({gaia_axis}, hflag);
-  m_gaia_gr1 = new Histogram({gaia_axis}, hflag);
-  m_mv2c00 = new Histogram({mv2_axis}, hflag);
-  m_mv2c10 = new Histogram({mv2_axis}, hflag);
-  m_mv2c20 = new Histogram({mv2_axis}, hflag);
-  m_jfc_anti_light = new Histogram({gaia_axis}, hflag);
-  m_jfc_anti_charm = new Histogram({gaia_axis}, hflag);
-  m_jfit_anti_light = new Histogram({gaia_axis}, hflag);
-  m_jfit_anti_charm = new Histogram({gaia_axis}, hflag);
 }
 
-BtagHists::~BtagHists() {
-  delete m_mv1;
-  delete m_mv1c;
-  delete m_mvb;
-  delete m_gaia_anti_light;
-  delete m_gaia_anti_charm;
-  delete m_gaia_gr1;
-  delete m_mv2c00;
-  delete m_mv2c10;
-  delete m_mv2c20;
-  delete m_jfc_anti_light;
-  delete m_jfc_anti_charm;
-  delete m_jfit_anti_light;
-  delete m_jfit_anti_charm;
+std::set<std::string> requiredInputs(const HistSpec& spec) {
+  std::set<std::string> inputs;
+  for (const auto& name: spec.btag) {
+    const auto& needed = lookUp(btagRegistry(), name).inputs;
+    inputs.insert(needed.begin(), needed.end());
+  }
+  for (const auto& name: spec.ctag) {
+    const auto& needed = lookUp(ctagRegistry(), name).inputs;
+    inputs.insert(needed.begin(), needed.end());
+  }
+  return inputs;
+}
+
+// ======== btag hists ==============
+
+BtagHists::BtagHists(const std::vector<std::string>& names):
+  m_hists(buildHists(btagRegistry(), names))
+{
 }
 
 void BtagHists::fill(const Jet& jet, double weight) {
-  m_mv1->fill(jet.mv1, weight);
-  m_mv1c->fill(jet.mv1c, weight);
-  m_mvb->fill(jet.mvb, weight);
-  m_gaia_anti_light->fill(btagAntiU(jet.gaia), weight);
-  m_gaia_anti_charm->fill(btagAntiC(jet.gaia), weight);
-  m_gaia_gr1->fill(gr1(jet.gaia), weight);
-  m_mv2c00->fill(jet.mv2c00, weight);
-  m_mv2c10->fill(jet.mv2c10, weight);
-  m_mv2c20->fill(jet.mv2c20, weight);
-  m_jfc_anti_light->fill(btagAntiU(jet.jfc), weight);
-  m_jfc_anti_charm->fill(btagAntiC(jet.jfc), weight);
-  m_jfit_anti_light->fill(btagAntiU(jet.jfit), weight);
-  m_jfit_anti_charm->fill(btagAntiC(jet.jfit), weight);
+  fillHists(m_hists, jet, weight);
+}
+
+void BtagHists::add(const BtagHists& other) {
+  addHists(m_hists, other.m_hists);
 }
 
 void BtagHists::writeTo(H5::CommonFG& fg) {
-  m_mv1->write_to(fg, "mv1");
-  m_mv1c->write_to(fg, "mv1c");
-  m_mvb->write_to(fg, "mvb");
-  m_gaia_anti_light->write_to(fg, "gaiaAntiU");
-  m_gaia_anti_charm->write_to(fg, "gaiaAntiC");
-  m_gaia_gr1->write_to(fg, "gaiaGr1");
-  m_mv2c00->write_to(fg, "mv2c00");
-  m_mv2c10->write_to(fg, "mv2c10");
-  m_mv2c20->write_to(fg, "mv2c20");
-  m_jfc_anti_light->write_to(fg, "jfcAntiU");
-  m_jfc_anti_charm->write_to(fg, "jfcAntiC");
-  m_jfit_anti_light->write_to(fg, "jfitAntiU");
-  m_jfit_anti_charm->write_to(fg, "jfitAntiC");
+  writeHists(m_hists, fg);
 }
 
 // ======== charm tag hists ==============
 
-CtagHists::CtagHists() :
-  m_gaia(0),
-  m_jfc(0),
-  m_jfit(0),
-  m_gaia_c(0),
-  m_gaia_btag(0)
+CtagHists::CtagHists(const std::vector<std::string>& names):
+  m_hists(buildHists(ctagRegistry(), names))
 {
-  using namespace hist;
-  unsigned hflag = hist::eat_nan;
-  const Axis gaia_axis = {"x", N_2AX_BINS, GAIA_LOW, GAIA_HIGH, ""};
-
-  Axis gaia_anti_b = gaia_axis;
-  gaia_anti_b.name = "antiB";
-  Axis gaia_anti_u = gaia_axis;
-  gaia_anti_u.name = "antiU";
-  Axis gaia_anti_c = gaia_axis;
-  gaia_anti_c.name = "antiC";
-
-  m_gaia = new Histogram({gaia_anti_u, gaia_anti_b}, hflag);
-  m_jfc = new Histogram({gaia_anti_u, gaia_anti_b}, hflag);
-  m_jfit = new Histogram({gaia_anti_u, gaia_anti_b}, hflag);
-  m_gaia_c = new Histogram(N_BINS, 0.0, 1.0, "", hflag);
-  m_gaia_btag = new Histogram({gaia_anti_u, gaia_anti_c}, hflag);
-
-  // The (obviously terrible) combination of MV1 and MV1c
-  m_fabtag = new Histogram({
-      { "mv1" , N_2AX_BINS, 0.0, 1.0},
-      { "mv1c", N_2AX_BINS, 0.0, 1.0}
-    });
 }
 
-CtagHists::~CtagHists() {
-  delete m_gaia;
-  delete m_jfc;
-  delete m_jfit;
-  delete m_gaia_c;
-  delete m_fabtag;
-  delete m_gaia_btag;
+void CtagHists::fill(const Jet& jet, double weight) {
+  fillHists(m_hists, jet, weight);
 }
 
-void CtagHists::fill(const Jet& jet, double weight) {
-  m_gaia->fill({ctagAntiU(jet.gaia), ctagAntiB(jet.gaia)}, weight);
-  m_jfc->fill({ctagAntiU(jet.jfc), ctagAntiB(jet.jfc)}, weight);
-  m_jfit->fill({ctagAntiU(jet.jfit), ctagAntiB(jet.jfit)}, weight);
-  m_gaia_c->fill(jet.gaia.pc, weight);
-  m_gaia_btag->fill({btagAntiU(jet.gaia), btagAntiC(jet.gaia)}, weight);
-
-  // use (1 - mv1c) to select c and light jets. Then use mv1 to remove
-  // the light jets.
-  m_fabtag->fill({jet.mv1, 1.0 - jet.mv1c}, weight);
+void CtagHists::add(const CtagHists& other) {
+  addHists(m_hists, other.m_hists);
 }
 
 void CtagHists::writeTo(H5::CommonFG& fg) {
-  m_gaia->write_to(fg, "gaia");
-  m_jfc->write_to(fg, "jfc");
-  m_jfit->write_to(fg, "jfit");
-  m_gaia_c->write_to(fg, "gaiaC");
-  m_gaia_btag->write_to(fg, "gaiaBtag");
-  m_fabtag->write_to(fg, "mv");
+  writeHists(m_hists, fg);
 }
 
 
 // ============ flavored hists ================
 
-FlavoredHists::FlavoredHists(unsigned flags):
-  m_pt_btag(12)
+FlavoredHists::FlavoredHists(const HistSpec& spec):
+  m_btag(spec.btag),
+  m_ctag(spec.ctag)
 {
-  static_assert(std::numeric_limits<double>::has_infinity, "no infinity");
-  const std::vector<double> pt_bins_gev{
-    0, 20, 30, 40, 50, 60, 75, 90, 110, 150, 200, 600,
-      std::numeric_limits<double>::infinity()};
-  // upper_bound should never pick the bin with upper edge 20
+  // upper_bound should never pick the bin with the lowest edge
   size_t bin = -1;
-  for (auto pt: pt_bins_gev) {
+  for (auto pt: spec.pt_bins) {
     m_pt_bins[pt * 1e3] = bin;
     bin++;
   }
+  for (bin = 1; bin < spec.pt_bins.size(); bin++) {
+    m_pt_btag.emplace_back(spec.btag);
+  }
 }
 
 void FlavoredHists::fill(const Jet& jet, double weight) {
   m_btag.fill(jet, weight);
   m_ctag.fill(jet, weight);
   auto pt_itr = m_pt_bins.upper_bound(jet.pt);
-  if (pt_itr != m_pt_bins.end()) {
+  if (pt_itr != m_pt_bins.end() && pt_itr->second < m_pt_btag.size()) {
     m_pt_btag.at(pt_itr->second).fill(jet, weight);
   }
 }
 
+void FlavoredHists::add(const FlavoredHists& other) {
+  m_btag.add(other.m_btag);
+  m_ctag.add(other.m_ctag);
+  for (size_t bin = 0; bin < m_pt_btag.size(); bin++) {
+    m_pt_btag.at(bin).add(other.m_pt_btag.at(bin));
+  }
+}
+
 void FlavoredHists::writeTo(H5::CommonFG& fg) {
   H5::Group btag_group(fg.createGroup("btag"));
   H5::Group all_pt(btag_group.createGroup("all"));
@@ -221,9 +284,11 @@ void FlavoredHists::writeTo(H5::CommonFG& fg) {
 
 // ====== JetPerfHists (top level) =======
 
-JetPerfHists::JetPerfHists(unsigned flags):
-  m_flavors(4)
+JetPerfHists::JetPerfHists(const HistSpec& spec, unsigned flags)
 {
+  for (int flavor = 0; flavor < 4; flavor++) {
+    m_flavors.emplace_back(spec);
+  }
 }
 
 JetPerfHists::~JetPerfHists()
@@ -234,6 +299,12 @@ void JetPerfHists::fill(const Jet& jet, double weight) {
   m_flavors.at(static_cast<int>(jet.truth_label)).fill(jet, weight);
 }
 
+void JetPerfHists::add(const JetPerfHists& other) {
+  for (size_t flavor = 0; flavor < m_flavors.size(); flavor++) {
+    m_flavors.at(flavor).add(other.m_flavors.at(flavor));
+  }
+}
+
 void JetPerfHists::writeTo(H5::CommonFG& fg) {
   for (Flavor flavor: {Flavor::B, Flavor::C, Flavor::U, Flavor::T}) {
     std::string name = flavorString(flavor);
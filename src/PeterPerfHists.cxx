@@ -1,6 +1,7 @@
 #include "PeterPerfHists.hh"
 #include "Jet.hh"
 #include "Histogram.hh"
+#include "writeChunked.hh"
 
 #include "H5Cpp.h"
 
@@ -44,9 +45,13 @@ namespace peter {
       m_fail->fill(pt, weight);
     }
   }
+  void PtEfficiency::add(const PtEfficiency& other) {
+    *m_pass += *other.m_pass;
+    *m_fail += *other.m_fail;
+  }
   void PtEfficiency::writeTo(H5::CommonFG& fg) {
-    m_pass->write_to(fg, "pass");
-    m_fail->write_to(fg, "fail");
+    writeChunked(*m_pass, fg, "pass");
+    writeChunked(*m_fail, fg, "fail");
   }
 
   // ====================== All hists ========================
@@ -81,9 +86,15 @@ namespace peter {
     m_jfc_efficiency.fill(jet.pt, jet.jfc, weight);
   }
 
+  void Hists::add(const Hists& other) {
+    *m_jfc += *other.m_jfc;
+    *m_jfit += *other.m_jfit;
+    m_jfc_efficiency.add(other.m_jfc_efficiency);
+  }
+
   void Hists::writeTo(H5::CommonFG& fg) {
-    m_jfc->write_to(fg, "jfc");
-    m_jfit->write_to(fg, "jfit");
+    writeChunked(*m_jfc, fg, "jfc");
+    writeChunked(*m_jfit, fg, "jfit");
     H5::Group eff_group(fg.createGroup("efficiency"));
     m_jfc_efficiency.writeTo(eff_group);
   }
@@ -103,6 +114,12 @@ namespace peter {
     m_flavors.at(static_cast<int>(jet.truth_label)).fill(jet, weight);
   }
 
+  void FlavoredHists::add(const FlavoredHists& other) {
+    for (size_t flavor = 0; flavor < m_flavors.size(); flavor++) {
+      m_flavors.at(flavor).add(other.m_flavors.at(flavor));
+    }
+  }
+
   void FlavoredHists::writeTo(H5::CommonFG& fg) {
     for (Flavor flavor: {Flavor::B, Flavor::C, Flavor::U, Flavor::T}) {
       std::string name = flavorString(flavor);
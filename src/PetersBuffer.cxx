@@ -50,6 +50,14 @@ int PetersBuffer::entry() const {
   return m_entry;
 }
 
+long long PetersBuffer::bytesRead() const {
+  return m_chain->bytes_read();
+}
+
+long long PetersBuffer::readCalls() const {
+  return m_chain->read_calls();
+}
+
 void PetersBuffer::saveSetBranches(const std::string& file_name) {
   std::ofstream out_file(file_name);
   for (auto br_name: m_chain->get_all_branch_names()) {
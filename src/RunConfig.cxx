@@ -2,11 +2,52 @@
 #include "jtag.hh"
 
 #include <cstdlib>
+#include <cstdio>
+#include <climits>
 
 void usage(std::string call) {
-  printf("usage: %s [-h] [-t] [-o <out file>] <root file>...\n",
-	 call.c_str());
+  printf("usage: %s [-h] [-t] [-j <threads>] [-c <hist spec>]"
+	 " [-o <out file>]\n"
+	 "       [--first-entry <n>] [--n-entries <n>] [--shard <i>/<n>]"
+	 " <root file>...\n", call.c_str());
 }
+namespace {
+  int intArg(int narg, char* argv[], int& pos) {
+    char* end = 0;
+    long value = pos + 1 < narg ? std::strtol(argv[pos + 1], &end, 10) : -1;
+    if (pos + 1 >= narg || *end != '\0' || value < 0 || value > INT_MAX) {
+      printf("error: %s must be followed by a number >= 0\n", argv[pos]);
+      std::exit(-1);
+    }
+    pos++;
+    return value;
+  }
+  int threadsArg(int narg, char* argv[], int& pos) {
+    char* end = 0;
+    long value = pos + 1 < narg ? std::strtol(argv[pos + 1], &end, 10) : -1;
+    if (pos + 1 >= narg || *end != '\0' || value < 1 || value > INT_MAX) {
+      printf("error: -j must be followed by a number of threads\n");
+      std::exit(-1);
+    }
+    pos++;
+    return value;
+  }
+  void setShard(int narg, char* argv[], int& pos, EntrySelection& entries) {
+    int shard = -1;
+    int n_shards = -1;
+    char extra = 0;
+    if (pos + 1 >= narg ||
+	sscanf(argv[pos + 1], "%i/%i%c", &shard, &n_shards, &extra) != 2 ||
+	n_shards < 1 || shard < 0 || shard >= n_shards) {
+      printf("error: --shard must be followed by <i>/<n>, with 0 <= i < n\n");
+      std::exit(-1);
+    }
+    pos++;
+    entries.shard = shard;
+    entries.n_shards = n_shards;
+  }
+}
+
 void help() {
   const char* help =
     "\n"
@@ -17,6 +58,15 @@ void help() {
     " -h for help\n"
     " -t for test mode\n"
     " -o to set output file (defaults to test.h5)\n"
+    " -j to fill with this many threads (defaults to 1)\n"
+    " -c to fill only the histograms listed in this file (see HistSpec.hh)\n"
+    " --first-entry to start from this entry of the chain (defaults to 0)\n"
+    " --n-entries to run over at most this many entries\n"
+    " --shard <i>/<n> to split those entries into n pieces and run over\n"
+    "   piece i (counting from 0). The pieces never overlap.\n"
+    "\n"
+    "The entry range and input files are saved as attributes of the\n"
+    "output file.\n"
     "\n"
     "When in 'test mode', will print more diagnostics, run over fewer events\n"
     "and save all the used branches in required_branches.txt\n";
@@ -25,21 +75,37 @@ void help() {
 
 RunConfig::RunConfig(int narg, char* argv[]):
   out_name("test.h5"),
-  flags(0)
+  flags(0),
+  n_threads(1)
 {
   if (narg == 1) {
     usage(argv[0]);
     std::exit(1);
   }
   for (int pos = 1; pos < narg; pos++) {
-    if (argv[pos][0] == '-') {
-      if (strchr(argv[pos],'t')) flags |= jtag::test;
-      if (strchr(argv[pos],'h')) {
+    if (strncmp(argv[pos], "--", 2) == 0) {
+      std::string opt(argv[pos]);
+      if (opt == "--first-entry") {
+	entries.first_entry = intArg(narg, argv, pos);
+      } else if (opt == "--n-entries") {
+	entries.n_entries = intArg(narg, argv, pos);
+      } else if (opt == "--shard") {
+	setShard(narg, argv, pos, entries);
+      } else {
+	usage(argv[0]);
+	printf("error: unknown option %s\n", argv[pos]);
+	std::exit(-1);
+      }
+    } else if (argv[pos][0] == '-') {
+      // the options can take values, which moves pos past this one
+      const char* opt = argv[pos];
+      if (strchr(opt,'t')) flags |= jtag::test;
+      if (strchr(opt,'h')) {
 	usage(argv[0]);
 	help();
 	std::exit(1);
       }
-      if (strchr(argv[pos], 'o')) {
+      if (strchr(opt, 'o')) {
 	if (pos + 1 < narg) {
 	  pos++;
 	  out_name = argv[pos];
@@ -48,6 +114,18 @@ RunConfig::RunConfig(int narg, char* argv[]):
 	  std::exit(-1);
 	}
       }
+      if (strchr(opt, 'c')) {
+	if (pos + 1 < narg) {
+	  pos++;
+	  hist_spec = argv[pos];
+	} else {
+	  printf("error: -c must be followed by a histogram spec file\n");
+	  std::exit(-1);
+	}
+      }
+      if (strchr(opt, 'j')) {
+	n_threads = threadsArg(narg, argv, pos);
+      }
     } else {
       files.push_back(argv[pos]);
     }
@@ -2,13 +2,18 @@
 #include "TChain.h"
 #include "TFile.h"
 #include "TError.h"
+#include "TTreeCache.h"
 #include <sstream>
 
 
 SmartChain::SmartChain(std::string tree_name):
   TChain(tree_name.c_str()),
-  m_tree_name(tree_name)
+  m_tree_name(tree_name),
+  m_closed_bytes(0),
+  m_closed_calls(0)
 {
+  SetCacheSize(chain::CACHE_SIZE);
+  TTreeCache::SetLearnEntries(chain::CACHE_LEARN_ENTRIES);
 }
 
 int SmartChain::add(std::string file_name, long long nentries) {
@@ -28,8 +33,34 @@ std::vector<std::string> SmartChain::get_all_branch_names() const {
   return m_set_branches;
 }
 
+Long64_t SmartChain::LoadTree(Long64_t entry) {
+  // the chain deletes each file when it moves on to the next one, so
+  // keep its counters first
+  TFile* old_file = fFile;
+  long long old_bytes = old_file ? old_file->GetBytesRead() : 0;
+  long long old_calls = old_file ? old_file->GetReadCalls() : 0;
+  Long64_t local_entry = TChain::LoadTree(entry);
+  if (old_file && fFile != old_file) {
+    m_closed_bytes += old_bytes;
+    m_closed_calls += old_calls;
+  }
+  return local_entry;
+}
+
+long long SmartChain::bytes_read() const {
+  return m_closed_bytes + (fFile ? fFile->GetBytesRead() : 0);
+}
+
+long long SmartChain::read_calls() const {
+  return m_closed_calls + (fFile ? fFile->GetReadCalls() : 0);
+}
+
 void SmartChain::SetBranchAddressPrivate(std::string name, void* branch) {
   check_for_dup(name);
+  // only the branches we set are read, everything else is turned off
+  if (m_set_branches.empty()) {
+    TChain::SetBranchStatus("*", 0);
+  }
   m_set_branch_set.insert(name);
   m_set_branches.push_back(name);
 
@@ -3,13 +3,29 @@
 #include "TROOT.h"
 #include <fstream> // ofstream
 
+TagVectors::TagVectors():
+  pu(0), pc(0), pb(0)
+{
+}
+
 void TagVectors::set(SmartChain* chain, std::string prefix) {
   chain->SetBranch(prefix + "pu", &pu);
   chain->SetBranch(prefix + "pc", &pc);
   chain->SetBranch(prefix + "pb", &pb);
 }
 
-TreeBuffer::TreeBuffer(const std::vector<std::string>& files) :
+TreeBuffer::TreeBuffer(const std::vector<std::string>& files,
+		       const std::set<std::string>& inputs) :
+  jet_pt(0),
+  jet_eta(0),
+  jet_MV1(0),
+  jet_MV1c(0),
+  jet_MV2c00(0),
+  jet_MV2c10(0),
+  jet_MV2c20(0),
+  jet_MVb(0),
+  jet_flavor_truth_label(0),
+  jet_gaia_isValid(0),
   m_chain(0),
   m_entry(0)
 {
@@ -28,17 +44,22 @@ TreeBuffer::TreeBuffer(const std::vector<std::string>& files) :
   std::string fw = "flavor_weight_";
   m_chain->SetBranch(jc + "pt",                  &jet_pt);
   m_chain->SetBranch(jc + "eta",                 &jet_eta);
-  m_chain->SetBranch(jc + fw + "MV1", 		 &jet_MV1);
-  m_chain->SetBranch(jc + fw + "MV1c", 		 &jet_MV1c);
-  m_chain->SetBranch(jc + fw + "MV2c00", 	 &jet_MV2c00);
-  m_chain->SetBranch(jc + fw + "MV2c10", 	 &jet_MV2c10);
-  m_chain->SetBranch(jc + fw + "MV2c20",	 &jet_MV2c20);
-  m_chain->SetBranch(jc + fw + "MVb",		 &jet_MVb);
   m_chain->SetBranch(jc + "flavor_truth_label",	 &jet_flavor_truth_label);
-  gaia.set(m_chain, jc + fc + "gaia_");
-  jfit.set(m_chain, jc + fc + "jfit_");
-  jfc.set(m_chain, jc + fc + "jfitc_");
-  m_chain->SetBranch(jc +  fc + "gaia_isValid",  &jet_gaia_isValid);
+  auto used = [&inputs](const std::string& input) {
+    return inputs.count(input) > 0;
+  };
+  if (used("mv1")) m_chain->SetBranch(jc + fw + "MV1", &jet_MV1);
+  if (used("mv1c")) m_chain->SetBranch(jc + fw + "MV1c", &jet_MV1c);
+  if (used("mv2c00")) m_chain->SetBranch(jc + fw + "MV2c00", &jet_MV2c00);
+  if (used("mv2c10")) m_chain->SetBranch(jc + fw + "MV2c10", &jet_MV2c10);
+  if (used("mv2c20")) m_chain->SetBranch(jc + fw + "MV2c20", &jet_MV2c20);
+  if (used("mvb")) m_chain->SetBranch(jc + fw + "MVb", &jet_MVb);
+  if (used("gaia")) {
+    gaia.set(m_chain, jc + fc + "gaia_");
+    m_chain->SetBranch(jc +  fc + "gaia_isValid",  &jet_gaia_isValid);
+  }
+  if (used("jfit")) jfit.set(m_chain, jc + fc + "jfit_");
+  if (used("jfc")) jfc.set(m_chain, jc + fc + "jfitc_");
 }
 
 TreeBuffer::~TreeBuffer() {
@@ -57,6 +78,14 @@ int TreeBuffer::entry() const {
   return m_entry;
 }
 
+long long TreeBuffer::bytesRead() const {
+  return m_chain->bytes_read();
+}
+
+long long TreeBuffer::readCalls() const {
+  return m_chain->read_calls();
+}
+
 void TreeBuffer::saveSetBranches(const std::string& file_name) {
   std::ofstream out_file(file_name);
   for (auto br_name: m_chain->get_all_branch_names()) {
@@ -2,43 +2,94 @@
 #include "TreeBuffer.hh"
 #include "Jet.hh"
 #include "JetPerfHists.hh"
+#include "EventLoop.hh"
 #include "misc_func.hh"
+#include "writeRunInfo.hh"
 #include "jtag.hh"
 
 #include "H5Cpp.h"
 
 #include <vector>
 #include <string>
+#include <memory>
+#include <algorithm>
 #include <cmath>
 #include <stdexcept>
 
+namespace {
+  void fillEntries(TreeBuffer& buffer, JetPerfHists& hists, EntryRange);
+}
+
 int buildHists(std::vector<std::string> files, std::string out_name,
-	       unsigned flags){
+	       unsigned flags, int n_threads, const HistSpec& spec,
+	       const EntrySelection& entries){
   const bool test = (flags & jtag::test);
   if (exists(out_name)) throw std::runtime_error(out_name + " exists");
 
-  TreeBuffer buffer(files);
-  JetPerfHists hists;
-
-  int test_events = std::min(int(100), buffer.size());
-  const int n_events = test ? test_events: buffer.size();
-  int total_jets = 0;
-  if (test) printf("starting loop on %i events\n", n_events);
-  for (int event = 0; event < n_events; event++) {
-    buffer.getEntry(event);
-    const int n_jets = buffer.jet_pt->size();
-    total_jets += n_jets;
-    for (int jidx = 0; jidx < n_jets; jidx++) {
-      Jet jet(buffer, jidx);
-      if (jet.pt < 20e3 || std::abs(jet.eta) > 2.5) continue;
-      hists.fill(jet, 1.0);
-    }
+  // each thread gets its own buffer (i.e. TChain) and histograms. The
+  // buffers open files, which ROOT wants done from one thread.
+  if (n_threads > 1) enableRootThreads();
+  // only read the branches the requested histograms need
+  const auto inputs = requiredInputs(spec);
+  std::vector<std::unique_ptr<TreeBuffer> > buffers;
+  buffers.emplace_back(new TreeBuffer(files, inputs));
+
+  const int n_total = buffers.at(0)->size();
+  EntryRange range = selectEntries(n_total, entries);
+  if (test) range.end = std::min(range.end, range.begin + 100);
+  const int n_events = range.end - range.begin;
+  n_threads = std::max(1, std::min(n_threads, n_events));
+  std::vector<std::unique_ptr<JetPerfHists> > hists;
+  for (int thread = 0; thread < n_threads; thread++) {
+    if (thread > 0) buffers.emplace_back(new TreeBuffer(files, inputs));
+    hists.emplace_back(new JetPerfHists(spec, flags));
+  }
+
+  if (test) printf("starting loop on %i events (%i to %i), %i thread(s)\n",
+		   n_events, range.begin, range.end, n_threads);
+  auto ranges = splitEntries(range, n_threads);
+  std::vector<std::function<void()> > jobs;
+  for (int thread = 0; thread < n_threads; thread++) {
+    TreeBuffer& buffer = *buffers.at(thread);
+    JetPerfHists& thread_hists = *hists.at(thread);
+    EntryRange range = ranges.at(thread);
+    jobs.push_back([&buffer, &thread_hists, range]() {
+	fillEntries(buffer, thread_hists, range);
+      });
   }
-  if (test) buffer.saveSetBranches("required_branches.txt");
+  runThreads(jobs);
+  // the weights are all 1, so the sums don't depend on the order
+  for (int thread = 1; thread < n_threads; thread++) {
+    hists.at(0)->add(*hists.at(thread));
+  }
+
+  long long bytes = 0;
+  long long calls = 0;
+  for (const auto& buffer: buffers) {
+    bytes += buffer->bytesRead();
+    calls += buffer->readCalls();
+  }
+  printIoStats(bytes, calls, n_events);
+  if (test) buffers.at(0)->saveSetBranches("required_branches.txt");
   if (test) printf("done event loop, saving\n");
   H5::H5File out_file(out_name.c_str(), H5F_ACC_EXCL);
-  hists.writeTo(out_file);
+  hists.at(0)->writeTo(out_file);
+  writeRunInfo(out_file, files, n_total, range, entries);
 
   return 0;
 }
 
+namespace {
+  void fillEntries(TreeBuffer& buffer, JetPerfHists& hists,
+		   EntryRange range) {
+    for (int event = range.begin; event < range.end; event++) {
+      buffer.getEntry(event);
+      const int n_jets = buffer.jet_pt->size();
+      for (int jidx = 0; jidx < n_jets; jidx++) {
+	Jet jet(buffer, jidx);
+	if (jet.pt < 20e3 || std::abs(jet.eta) > 2.5) continue;
+	hists.fill(jet, 1.0);
+      }
+    }
+  }
+}
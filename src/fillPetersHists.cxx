@@ -2,45 +2,93 @@
 #include "PetersBuffer.hh"
 #include "Jet.hh"
 #include "PeterPerfHists.hh"
+#include "EventLoop.hh"
 #include "misc_func.hh"
+#include "writeRunInfo.hh"
 #include "jtag.hh"
 
 #include "H5Cpp.h"
 
 #include <vector>
 #include <string>
+#include <memory>
+#include <algorithm>
 #include <cmath>
 #include <stdexcept>
 
+namespace {
+  void fillEntries(PetersBuffer& buffer, peter::FlavoredHists& hists,
+		   EntryRange);
+}
+
 int fillPetersHists(std::vector<std::string> files, std::string out_name,
-	       unsigned flags){
+		    unsigned flags, int n_threads,
+		    const EntrySelection& entries){
   const bool test = (flags & jtag::test);
   if (exists(out_name)) throw std::runtime_error(out_name + " exists");
 
-  PetersBuffer buffer(files);
-  peter::FlavoredHists hists(flags);
-
-  int test_events = std::min(int(100), buffer.size());
-  const int n_events = test ? test_events: buffer.size();
-  int total_jets = 0;
-  if (test) printf("starting loop on %i events\n", n_events);
-  for (int event = 0; event < n_events; event++) {
-    buffer.getEntry(event);
-    const int n_jets = buffer.n_jets;
-    total_jets += n_jets;
-    for (int jidx = 0; jidx < n_jets; jidx++) {
-      Jet jet(buffer, jidx);
-      float abs_eta = std::abs(jet.eta);
-      bool ok_jvf = jet.jvf > 0.5 || abs_eta > 2.4 || jet.pt > 50e3;
-      if (jet.pt < 20e3 || abs_eta > 2.5 || !ok_jvf) continue;
-      hists.fill(jet, 1.0);
-    }
+  // one buffer and set of histograms per thread, see buildHists
+  if (n_threads > 1) enableRootThreads();
+  std::vector<std::unique_ptr<PetersBuffer> > buffers;
+  buffers.emplace_back(new PetersBuffer(files));
+
+  const int n_total = buffers.at(0)->size();
+  EntryRange range = selectEntries(n_total, entries);
+  if (test) range.end = std::min(range.end, range.begin + 100);
+  const int n_events = range.end - range.begin;
+  n_threads = std::max(1, std::min(n_threads, n_events));
+  std::vector<std::unique_ptr<peter::FlavoredHists> > hists;
+  for (int thread = 0; thread < n_threads; thread++) {
+    if (thread > 0) buffers.emplace_back(new PetersBuffer(files));
+    hists.emplace_back(new peter::FlavoredHists(flags));
+  }
+
+  if (test) printf("starting loop on %i events (%i to %i), %i thread(s)\n",
+		   n_events, range.begin, range.end, n_threads);
+  auto ranges = splitEntries(range, n_threads);
+  std::vector<std::function<void()> > jobs;
+  for (int thread = 0; thread < n_threads; thread++) {
+    PetersBuffer& buffer = *buffers.at(thread);
+    peter::FlavoredHists& thread_hists = *hists.at(thread);
+    EntryRange range = ranges.at(thread);
+    jobs.push_back([&buffer, &thread_hists, range]() {
+	fillEntries(buffer, thread_hists, range);
+      });
   }
-  if (test) buffer.saveSetBranches("required_branches.txt");
+  runThreads(jobs);
+  for (int thread = 1; thread < n_threads; thread++) {
+    hists.at(0)->add(*hists.at(thread));
+  }
+
+  long long bytes = 0;
+  long long calls = 0;
+  for (const auto& buffer: buffers) {
+    bytes += buffer->bytesRead();
+    calls += buffer->readCalls();
+  }
+  printIoStats(bytes, calls, n_events);
+  if (test) buffers.at(0)->saveSetBranches("required_branches.txt");
   if (test) printf("done event loop, saving\n");
   H5::H5File out_file(out_name.c_str(), H5F_ACC_EXCL);
-  hists.writeTo(out_file);
+  hists.at(0)->writeTo(out_file);
+  writeRunInfo(out_file, files, n_total, range, entries);
 
   return 0;
 }
 
+namespace {
+  void fillEntries(PetersBuffer& buffer, peter::FlavoredHists& hists,
+		   EntryRange range) {
+    for (int event = range.begin; event < range.end; event++) {
+      buffer.getEntry(event);
+      const int n_jets = buffer.n_jets;
+      for (int jidx = 0; jidx < n_jets; jidx++) {
+	Jet jet(buffer, jidx);
+	float abs_eta = std::abs(jet.eta);
+	bool ok_jvf = jet.jvf > 0.5 || abs_eta > 2.4 || jet.pt > 50e3;
+	if (jet.pt < 20e3 || abs_eta > 2.5 || !ok_jvf) continue;
+	hists.fill(jet, 1.0);
+      }
+    }
+  }
+}
@@ -2,6 +2,7 @@
 
 #include <string>
 #include <fstream>
+#include <cstdio>
 
 bool exists(const std::string& file_name) {
   std::ifstream file(file_name.c_str(), std::ios::binary);
@@ -16,3 +17,10 @@ bool exists(const std::string& file_name) {
 std::string red(const std::string& st) {
   return "\033[31;1m" + st + "\033[m";
 }
+
+void printIoStats(long long bytes, long long calls, int n_events) {
+  double per_event = n_events > 0 ? double(bytes) / n_events : 0;
+  printf("read %.1f MB in %lli calls (%.1f kB, %.2f calls per event)\n",
+	 bytes / 1e6, calls, per_event / 1e3,
+	 n_events > 0 ? double(calls) / n_events : 0);
+}
@@ -1,8 +1,12 @@
 #include "buildHists.hh"
 #include "RunConfig.hh"
+#include "HistSpec.hh"
 
 int main(int narg, char* argv[]) {
   RunConfig config(narg, argv);
-  return buildHists(config.files, config.out_name, config.flags);
+  HistSpec spec;
+  if (!config.hist_spec.empty()) spec = readHistSpec(config.hist_spec);
+  return buildHists(config.files, config.out_name, config.flags,
+		    config.n_threads, spec, config.entries);
 }
 
@@ -1,7 +1,14 @@
 #include "fillPetersHists.hh"
 #include "RunConfig.hh"
 
+#include <cstdio>
+
 int main(int narg, char* argv[]) {
   RunConfig config(narg, argv);
-  return fillPetersHists(config.files, config.out_name, config.flags);
+  if (!config.hist_spec.empty()) {
+    printf("error: -c isn't supported for peter's ntuples\n");
+    return -1;
+  }
+  return fillPetersHists(config.files, config.out_name, config.flags,
+			  config.n_threads, config.entries);
 }
@@ -0,0 +1,74 @@
+#include "writeChunked.hh"
+#include "Histogram.hh"
+
+#include "H5Cpp.h"
+
+#include <cmath>
+#include <algorithm>
+#include <vector>
+
+namespace {
+  std::vector<hsize_t> chunkShape(const std::vector<hsize_t>& dims);
+  void copyAttributes(const H5::DataSet& source, H5::DataSet& target);
+}
+
+void writeChunked(const Histogram& hist, H5::CommonFG& fg,
+		  const std::string& name) {
+  using namespace H5;
+  // ndhist only writes contiguous datasets, so the histogram goes to a
+  // file that lives in memory first and is copied over from there
+  FileAccPropList in_memory;
+  in_memory.setCore(1 << 20, false);
+  H5File scratch("scratch.h5", H5F_ACC_TRUNC,
+		 FileCreatPropList::DEFAULT, in_memory);
+  hist.write_to(scratch, name);
+  DataSet source = scratch.openDataSet(name);
+  DataType type = source.getDataType();
+  DataSpace space = source.getSpace();
+
+  std::vector<hsize_t> dims(space.getSimpleExtentNdims());
+  space.getSimpleExtentDims(dims.data());
+  std::vector<hsize_t> chunks = chunkShape(dims);
+  DSetCreatPropList params;
+  params.setChunk(chunks.size(), chunks.data());
+  params.setShuffle();
+  params.setDeflate(chunk::DEFLATE);
+  DataSet target = fg.createDataSet(name, type, space, params);
+
+  std::vector<char> buffer(space.getSimpleExtentNpoints() * type.getSize());
+  source.read(buffer.data(), type);
+  target.write(buffer.data(), type);
+  copyAttributes(source, target);
+}
+
+namespace {
+  // square-ish chunks with at most chunk::ELEMENTS entries
+  std::vector<hsize_t> chunkShape(const std::vector<hsize_t>& dims) {
+    std::vector<hsize_t> chunks;
+    if (dims.empty()) return chunks;
+    hsize_t edge = std::pow(chunk::ELEMENTS, 1.0 / dims.size());
+    for (auto dim: dims) {
+      chunks.push_back(std::max<hsize_t>(1, std::min(dim, edge)));
+    }
+    return chunks;
+  }
+
+  void copyAttributes(const H5::DataSet& source, H5::DataSet& target) {
+    using namespace H5;
+    for (int idx = 0; idx < source.getNumAttrs(); idx++) {
+      Attribute attr = source.openAttribute(unsigned(idx));
+      DataType type = attr.getDataType();
+      DataSpace space = attr.getSpace();
+      std::vector<char> buffer(
+	space.getSimpleExtentNpoints() * type.getSize());
+      attr.read(type, buffer.data());
+      Attribute copy = target.createAttribute(attr.getName(), type, space);
+      copy.write(type, buffer.data());
+      bool vlen_string = (type.getClass() == H5T_STRING &&
+			  H5Tis_variable_str(type.getId()) > 0);
+      if (type.getClass() == H5T_VLEN || vlen_string) {
+	DataSet::vlenReclaim(buffer.data(), type, space);
+      }
+    }
+  }
+}
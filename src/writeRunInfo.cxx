@@ -0,0 +1,44 @@
+#include "writeRunInfo.hh"
+
+#include "H5Cpp.h"
+
+namespace {
+  void writeScalar(H5::Group& group, const std::string& name,
+		   long long value);
+}
+
+void writeRunInfo(H5::H5File& file, const std::vector<std::string>& files,
+		  int n_total, EntryRange range, const EntrySelection& sel) {
+  using namespace H5;
+  Group root = file.openGroup("/");
+
+  std::vector<const char*> names;
+  for (const auto& name: files) names.push_back(name.c_str());
+  StrType str_type(PredType::C_S1, H5T_VARIABLE);
+  hsize_t n_files = names.size();
+  DataSpace files_space(1, &n_files);
+  Attribute files_attr = root.createAttribute(
+    "input_files", str_type, files_space);
+  files_attr.write(str_type, names.data());
+
+  long long ranges[1][2] = { {range.begin, range.end} };
+  hsize_t ranges_dims[2] = {1, 2};
+  DataSpace ranges_space(2, ranges_dims);
+  Attribute ranges_attr = root.createAttribute(
+    "entry_ranges", PredType::NATIVE_LLONG, ranges_space);
+  ranges_attr.write(PredType::NATIVE_LLONG, ranges);
+
+  writeScalar(root, "chain_entries", n_total);
+  writeScalar(root, "shard", sel.shard);
+  writeScalar(root, "n_shards", sel.n_shards);
+}
+
+namespace {
+  void writeScalar(H5::Group& group, const std::string& name,
+		   long long value) {
+    using namespace H5;
+    Attribute attr = group.createAttribute(
+      name, PredType::NATIVE_LLONG, DataSpace(H5S_SCALAR));
+    attr.write(PredType::NATIVE_LLONG, &value);
+  }
+}